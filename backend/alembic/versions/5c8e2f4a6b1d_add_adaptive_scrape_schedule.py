@@ -0,0 +1,33 @@
+"""Add adaptive scrape schedule columns to product_sources
+
+Revision ID: 5c8e2f4a6b1d
+Revises: 4b1a8c7d3e2f
+Create Date: 2025-11-08 10:15:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c8e2f4a6b1d'
+down_revision: Union[str, None] = '4b1a8c7d3e2f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing sources start with next_scrape_at = NULL, i.e. due on the next cycle
+    op.add_column('product_sources', sa.Column('next_scrape_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('product_sources', sa.Column('scrape_interval_seconds', sa.Integer(), nullable=True))
+    op.add_column('product_sources', sa.Column('unchanged_scrapes', sa.Integer(), nullable=True))
+    op.create_index(op.f('ix_product_sources_next_scrape_at'), 'product_sources', ['next_scrape_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_product_sources_next_scrape_at'), table_name='product_sources')
+    op.drop_column('product_sources', 'unchanged_scrapes')
+    op.drop_column('product_sources', 'scrape_interval_seconds')
+    op.drop_column('product_sources', 'next_scrape_at')
@@ -0,0 +1,33 @@
+# backend/alembic/versions/6d3f1a9b2c4e_add_aggregation_watermarks.py
+"""Add aggregation watermarks table
+
+Revision ID: 6d3f1a9b2c4e
+Revises: 5c8e2f4a6b1d
+Create Date: 2025-11-10 14:05:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6d3f1a9b2c4e'
+down_revision: Union[str, None] = '5c8e2f4a6b1d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # No rows are seeded: the first run starts from the oldest remaining data
+    op.create_table('aggregation_watermarks',
+        sa.Column('job_name', sa.String(length=50), nullable=False),
+        sa.Column('watermark', sa.Date(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('job_name')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('aggregation_watermarks')
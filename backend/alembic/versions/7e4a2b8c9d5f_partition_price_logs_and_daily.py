@@ -0,0 +1,172 @@
+# backend/alembic/versions/7e4a2b8c9d5f_partition_price_logs_and_daily.py
+"""Partition price_logs and price_history_daily by month
+
+Revision ID: 7e4a2b8c9d5f
+Revises: 6d3f1a9b2c4e
+Create Date: 2025-11-12 11:20:00.000000
+
+"""
+from datetime import date, datetime, timedelta, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7e4a2b8c9d5f'
+down_revision: Union[str, None] = '6d3f1a9b2c4e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Partitions are created up to this many months past the current one
+MONTHS_AHEAD = 3
+
+PRICE_LOG_COLUMNS = "id, product_source_id, price_cents, currency, availability, in_stock, scraped_at, avg_review_sentiment"
+DAILY_COLUMNS = "id, product_source_id, day, min_cents, max_cents, avg_cents, last_cents, currency, samples"
+
+
+def _next_month(month: date) -> date:
+    return (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _create_monthly_partitions(table: str, first: date, timestamp_key: bool):
+    last = datetime.now(timezone.utc).date().replace(day=1)
+    for _ in range(MONTHS_AHEAD):
+        last = _next_month(last)
+
+    month = first.replace(day=1)
+    while month <= last:
+        upper = _next_month(month)
+        if timestamp_key:
+            # timestamptz bounds are pinned to UTC midnight
+            lower_bound, upper_bound = f"'{month:%Y-%m-%d} 00:00:00+00'", f"'{upper:%Y-%m-%d} 00:00:00+00'"
+        else:
+            lower_bound, upper_bound = f"'{month:%Y-%m-%d}'", f"'{upper:%Y-%m-%d}'"
+        op.execute(f"CREATE TABLE {table}_p{month:%Y%m} PARTITION OF {table} FOR VALUES FROM ({lower_bound}) TO ({upper_bound})")
+        month = upper
+    op.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    today = datetime.now(timezone.utc).date()
+
+    # --- 1. price_logs, partitioned by scraped_at ---
+    # Keep the id sequence alive when the old table is dropped
+    op.execute("ALTER SEQUENCE price_logs_id_seq OWNED BY NONE")
+    op.execute("""
+        CREATE TABLE price_logs_partitioned (
+            id INTEGER NOT NULL DEFAULT nextval('price_logs_id_seq'),
+            product_source_id INTEGER NOT NULL,
+            price_cents INTEGER NOT NULL,
+            currency VARCHAR(3),
+            availability VARCHAR(50),
+            in_stock BOOLEAN,
+            scraped_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+            avg_review_sentiment FLOAT
+        ) PARTITION BY RANGE (scraped_at)
+    """)
+    oldest = conn.execute(sa.text("SELECT min(scraped_at) FROM price_logs")).scalar()
+    first = oldest.astimezone(timezone.utc).date() if oldest else today
+    _create_monthly_partitions("price_logs_partitioned", first, timestamp_key=True)
+
+    op.execute(f"""
+        INSERT INTO price_logs_partitioned ({PRICE_LOG_COLUMNS})
+        SELECT id, product_source_id, price_cents, currency, availability, in_stock,
+               COALESCE(scraped_at, now()), avg_review_sentiment
+        FROM price_logs
+    """)
+    op.execute("DROP TABLE price_logs")
+    op.execute("ALTER TABLE price_logs_partitioned RENAME TO price_logs")
+    _rename_partitions(conn, "price_logs_partitioned", "price_logs")
+    op.execute("ALTER SEQUENCE price_logs_id_seq OWNED BY price_logs.id")
+
+    op.create_primary_key('price_logs_pkey', 'price_logs', ['id', 'scraped_at'])
+    op.create_unique_constraint('_product_source_scraped_at_uc', 'price_logs', ['product_source_id', 'scraped_at'])
+    op.create_foreign_key(
+        'price_logs_product_source_id_fkey', 'price_logs', 'product_sources',
+        ['product_source_id'], ['id'], ondelete='CASCADE'
+    )
+    op.create_index(op.f('ix_price_logs_id'), 'price_logs', ['id'], unique=False)
+    op.create_index(op.f('ix_price_logs_scraped_at'), 'price_logs', ['scraped_at'], unique=False)
+
+    # --- 2. price_history_daily, partitioned by day ---
+    op.execute("ALTER SEQUENCE price_history_daily_id_seq OWNED BY NONE")
+    op.execute("""
+        CREATE TABLE price_history_daily_partitioned (
+            id INTEGER NOT NULL DEFAULT nextval('price_history_daily_id_seq'),
+            product_source_id INTEGER NOT NULL,
+            day DATE NOT NULL,
+            min_cents INTEGER NOT NULL,
+            max_cents INTEGER NOT NULL,
+            avg_cents INTEGER NOT NULL,
+            last_cents INTEGER NOT NULL,
+            currency VARCHAR(3),
+            samples INTEGER
+        ) PARTITION BY RANGE (day)
+    """)
+    oldest_day = conn.execute(sa.text("SELECT min(day) FROM price_history_daily")).scalar()
+    _create_monthly_partitions("price_history_daily_partitioned", oldest_day or today, timestamp_key=False)
+
+    op.execute(f"""
+        INSERT INTO price_history_daily_partitioned ({DAILY_COLUMNS})
+        SELECT {DAILY_COLUMNS} FROM price_history_daily
+    """)
+    op.execute("DROP TABLE price_history_daily")
+    op.execute("ALTER TABLE price_history_daily_partitioned RENAME TO price_history_daily")
+    _rename_partitions(conn, "price_history_daily_partitioned", "price_history_daily")
+    op.execute("ALTER SEQUENCE price_history_daily_id_seq OWNED BY price_history_daily.id")
+
+    op.create_primary_key('price_history_daily_pkey', 'price_history_daily', ['id', 'day'])
+    op.create_unique_constraint('_daily_product_source_day_uc', 'price_history_daily', ['product_source_id', 'day'])
+    op.create_foreign_key(
+        'price_history_daily_product_source_id_fkey', 'price_history_daily', 'product_sources',
+        ['product_source_id'], ['id'], ondelete='CASCADE'
+    )
+    op.create_index(op.f('ix_price_history_daily_day'), 'price_history_daily', ['day'], unique=False)
+    op.create_index(op.f('ix_price_history_daily_id'), 'price_history_daily', ['id'], unique=False)
+
+
+def _rename_partitions(conn, old_prefix: str, new_prefix: str):
+    children = conn.execute(sa.text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = CAST(:parent AS regclass)"
+    ), {"parent": new_prefix}).fetchall()
+    for (name,) in children:
+        if name.startswith(old_prefix):
+            op.execute(f"ALTER TABLE {name} RENAME TO {new_prefix}{name[len(old_prefix):]}")
+
+
+def downgrade() -> None:
+    # Back to plain tables; the data is copied, the partitions go with their parent
+    op.execute("ALTER SEQUENCE price_logs_id_seq OWNED BY NONE")
+    op.execute("CREATE TABLE price_logs_plain (LIKE price_logs INCLUDING DEFAULTS)")
+    op.execute(f"INSERT INTO price_logs_plain ({PRICE_LOG_COLUMNS}) SELECT {PRICE_LOG_COLUMNS} FROM price_logs")
+    op.execute("DROP TABLE price_logs")
+    op.execute("ALTER TABLE price_logs_plain RENAME TO price_logs")
+    op.execute("ALTER SEQUENCE price_logs_id_seq OWNED BY price_logs.id")
+    op.execute("ALTER TABLE price_logs ALTER COLUMN scraped_at DROP NOT NULL")
+    op.create_primary_key('price_logs_pkey', 'price_logs', ['id'])
+    op.create_unique_constraint('_product_source_scraped_at_uc', 'price_logs', ['product_source_id', 'scraped_at'])
+    op.create_foreign_key(
+        'price_logs_product_source_id_fkey', 'price_logs', 'product_sources',
+        ['product_source_id'], ['id'], ondelete='CASCADE'
+    )
+    op.create_index(op.f('ix_price_logs_id'), 'price_logs', ['id'], unique=False)
+    op.create_index(op.f('ix_price_logs_scraped_at'), 'price_logs', ['scraped_at'], unique=False)
+
+    op.execute("ALTER SEQUENCE price_history_daily_id_seq OWNED BY NONE")
+    op.execute("CREATE TABLE price_history_daily_plain (LIKE price_history_daily INCLUDING DEFAULTS)")
+    op.execute(f"INSERT INTO price_history_daily_plain ({DAILY_COLUMNS}) SELECT {DAILY_COLUMNS} FROM price_history_daily")
+    op.execute("DROP TABLE price_history_daily")
+    op.execute("ALTER TABLE price_history_daily_plain RENAME TO price_history_daily")
+    op.execute("ALTER SEQUENCE price_history_daily_id_seq OWNED BY price_history_daily.id")
+    op.create_primary_key('price_history_daily_pkey', 'price_history_daily', ['id'])
+    op.create_unique_constraint('_daily_product_source_day_uc', 'price_history_daily', ['product_source_id', 'day'])
+    op.create_foreign_key(
+        'price_history_daily_product_source_id_fkey', 'price_history_daily', 'product_sources',
+        ['product_source_id'], ['id'], ondelete='CASCADE'
+    )
+    op.create_index(op.f('ix_price_history_daily_day'), 'price_history_daily', ['day'], unique=False)
+    op.create_index(op.f('ix_price_history_daily_id'), 'price_history_daily', ['id'], unique=False)
@@ -0,0 +1,52 @@
+# backend/alembic/versions/8a5c3d7e1f2b_add_price_history_hourly.py
+"""Add hourly price history rollup
+
+Revision ID: 8a5c3d7e1f2b
+Revises: 7e4a2b8c9d5f
+Create Date: 2025-11-14 16:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a5c3d7e1f2b'
+down_revision: Union[str, None] = '7e4a2b8c9d5f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('price_history_hourly',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('product_source_id', sa.Integer(), nullable=False),
+    sa.Column('hour', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('min_cents', sa.Integer(), nullable=False),
+    sa.Column('max_cents', sa.Integer(), nullable=False),
+    sa.Column('avg_cents', sa.Integer(), nullable=False),
+    sa.Column('last_cents', sa.Integer(), nullable=False),
+    sa.Column('currency', sa.String(length=3), nullable=True),
+    sa.Column('samples', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['product_source_id'], ['product_sources.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('product_source_id', 'hour', name='_hourly_product_source_hour_uc')
+    )
+    op.create_index(op.f('ix_price_history_hourly_hour'), 'price_history_hourly', ['hour'], unique=False)
+    op.create_index(op.f('ix_price_history_hourly_id'), 'price_history_hourly', ['id'], unique=False)
+
+    # The hourly job tracks an instant rather than a date
+    op.add_column('aggregation_watermarks', sa.Column('watermark_at', sa.DateTime(timezone=True), nullable=True))
+    op.alter_column('aggregation_watermarks', 'watermark', existing_type=sa.Date(), nullable=True)
+
+
+def downgrade() -> None:
+    op.execute("DELETE FROM aggregation_watermarks WHERE watermark IS NULL")
+    op.alter_column('aggregation_watermarks', 'watermark', existing_type=sa.Date(), nullable=False)
+    op.drop_column('aggregation_watermarks', 'watermark_at')
+
+    op.drop_index(op.f('ix_price_history_hourly_id'), table_name='price_history_hourly')
+    op.drop_index(op.f('ix_price_history_hourly_hour'), table_name='price_history_hourly')
+    op.drop_table('price_history_hourly')
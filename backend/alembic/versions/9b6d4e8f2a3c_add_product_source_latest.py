@@ -0,0 +1,53 @@
+# backend/alembic/versions/9b6d4e8f2a3c_add_product_source_latest.py
+"""Add product_source_latest table
+
+Revision ID: 9b6d4e8f2a3c
+Revises: 8a5c3d7e1f2b
+Create Date: 2025-11-17 10:05:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b6d4e8f2a3c'
+down_revision: Union[str, None] = '8a5c3d7e1f2b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('product_source_latest',
+    sa.Column('product_source_id', sa.Integer(), nullable=False),
+    sa.Column('price_cents', sa.Integer(), nullable=False),
+    sa.Column('currency', sa.String(length=3), nullable=True),
+    sa.Column('availability', sa.String(length=50), nullable=True),
+    sa.Column('in_stock', sa.Boolean(), nullable=True),
+    sa.Column('avg_review_sentiment', sa.Float(), nullable=True),
+    sa.Column('scraped_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('previous_price_cents', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['product_source_id'], ['product_sources.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('product_source_id')
+    )
+    op.create_index(op.f('ix_product_source_latest_scraped_at'), 'product_source_latest', ['scraped_at'], unique=False)
+
+    # Backfill from the newest two logs of every source
+    op.execute("""
+        INSERT INTO product_source_latest
+            (product_source_id, price_cents, currency, availability, in_stock,
+             avg_review_sentiment, scraped_at, previous_price_cents)
+        SELECT DISTINCT ON (product_source_id)
+            product_source_id, price_cents, currency, availability, in_stock,
+            avg_review_sentiment, scraped_at,
+            lead(price_cents) OVER (PARTITION BY product_source_id ORDER BY scraped_at DESC)
+        FROM price_logs
+        ORDER BY product_source_id, scraped_at DESC
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_product_source_latest_scraped_at'), table_name='product_source_latest')
+    op.drop_table('product_source_latest')
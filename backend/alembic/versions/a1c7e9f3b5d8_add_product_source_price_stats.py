@@ -0,0 +1,96 @@
+# backend/alembic/versions/a1c7e9f3b5d8_add_product_source_price_stats.py
+"""Add product_source_price_stats table
+
+Revision ID: a1c7e9f3b5d8
+Revises: 9b6d4e8f2a3c
+Create Date: 2025-11-18 09:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a1c7e9f3b5d8'
+down_revision: Union[str, None] = '9b6d4e8f2a3c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('product_source_price_stats',
+    sa.Column('product_source_id', sa.Integer(), nullable=False),
+    sa.Column('min_cents', sa.Integer(), nullable=False),
+    sa.Column('min_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('max_cents', sa.Integer(), nullable=False),
+    sa.Column('max_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('min_30d_cents', sa.Integer(), nullable=True),
+    sa.Column('sum_30d_cents', sa.BigInteger(), nullable=False, server_default='0'),
+    sa.Column('samples_30d', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('window_start', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['product_source_id'], ['product_sources.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('product_source_id')
+    )
+
+    # All-time extremes from every tier. Rolled-up rows are dated by their bucket start.
+    op.execute("""
+        WITH points AS (
+            SELECT product_source_id, price_cents AS lo, price_cents AS hi, scraped_at AS at FROM price_logs
+            UNION ALL
+            SELECT product_source_id, min_cents, max_cents, hour FROM price_history_hourly
+            UNION ALL
+            SELECT product_source_id, min_cents, max_cents, day::timestamptz FROM price_history_daily
+            UNION ALL
+            SELECT product_source_id, min_cents, max_cents, month::timestamptz FROM price_history_monthly
+        ),
+        lows AS (
+            SELECT DISTINCT ON (product_source_id) product_source_id, lo, at
+            FROM points ORDER BY product_source_id, lo, at
+        ),
+        highs AS (
+            SELECT DISTINCT ON (product_source_id) product_source_id, hi, at
+            FROM points ORDER BY product_source_id, hi DESC, at
+        )
+        INSERT INTO product_source_price_stats (product_source_id, min_cents, min_at, max_cents, max_at)
+        SELECT lows.product_source_id, lows.lo, lows.at, highs.hi, highs.at
+        FROM lows JOIN highs USING (product_source_id)
+    """)
+
+    # Trailing 30 days: hourly rows before the hourly watermark, raw logs after it
+    op.execute("""
+        WITH bounds AS (
+            SELECT date_trunc('hour', now() - interval '30 days') AS window_start,
+                   coalesce(
+                       (SELECT watermark_at FROM aggregation_watermarks WHERE job_name = 'hourly'),
+                       date_trunc('hour', now() - interval '30 days')
+                   ) AS hourly_end
+        ),
+        parts AS (
+            SELECT h.product_source_id, min(h.min_cents) AS min_cents,
+                   sum(h.avg_cents::bigint * h.samples) AS sum_cents, sum(h.samples) AS samples
+            FROM price_history_hourly h, bounds
+            WHERE h.hour >= bounds.window_start AND h.hour < bounds.hourly_end
+            GROUP BY h.product_source_id
+            UNION ALL
+            SELECT p.product_source_id, min(p.price_cents), sum(p.price_cents::bigint), count(*)
+            FROM price_logs p, bounds
+            WHERE p.scraped_at >= greatest(bounds.window_start, bounds.hourly_end)
+            GROUP BY p.product_source_id
+        ),
+        window_stats AS (
+            SELECT product_source_id, min(min_cents) AS min_cents, sum(sum_cents) AS sum_cents, sum(samples) AS samples
+            FROM parts GROUP BY product_source_id
+        )
+        UPDATE product_source_price_stats s
+        SET min_30d_cents = w.min_cents, sum_30d_cents = w.sum_cents, samples_30d = w.samples,
+            window_start = bounds.window_start
+        FROM window_stats w, bounds
+        WHERE s.product_source_id = w.product_source_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('product_source_price_stats')
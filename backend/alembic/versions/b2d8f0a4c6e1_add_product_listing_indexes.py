@@ -0,0 +1,32 @@
+# backend/alembic/versions/b2d8f0a4c6e1_add_product_listing_indexes.py
+"""Add indexes for the keyset products listing
+
+Revision ID: b2d8f0a4c6e1
+Revises: a1c7e9f3b5d8
+Create Date: 2025-11-18 14:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b2d8f0a4c6e1'
+down_revision: Union[str, None] = 'a1c7e9f3b5d8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Per-product lookups of sources (lowest current price, source filter, cascades)
+    op.create_index(op.f('ix_product_sources_product_id'), 'product_sources', ['product_id'], unique=False)
+    op.create_index('ix_product_sources_source_id_product_id', 'product_sources', ['source_id', 'product_id'], unique=False)
+    op.create_index('ix_products_lower_brand_id', 'products', [sa.text('lower(brand)'), 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_products_lower_brand_id', table_name='products')
+    op.drop_index('ix_product_sources_source_id_product_id', table_name='product_sources')
+    op.drop_index(op.f('ix_product_sources_product_id'), table_name='product_sources')
@@ -0,0 +1,44 @@
+# backend/alembic/versions/c3e9a1b5d7f2_add_watchlist_alert_threshold.py
+"""Add indexed alert threshold to watchlists
+
+Revision ID: c3e9a1b5d7f2
+Revises: b2d8f0a4c6e1
+Create Date: 2025-11-19 11:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e9a1b5d7f2'
+down_revision: Union[str, None] = 'b2d8f0a4c6e1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('watchlists', sa.Column('alert_threshold_cents', sa.Integer(), nullable=True))
+    op.add_column('watchlists', sa.Column('last_alerted_cents', sa.Integer(), nullable=True))
+
+    # Thresholds are stored in rupees inside alert_rules; anything non-numeric is left without an alert
+    op.execute("""
+        UPDATE watchlists
+        SET alert_threshold_cents = round((alert_rules->>'threshold')::numeric * 100)::int
+        WHERE CASE WHEN alert_rules->>'threshold' ~ '^[0-9]+(\\.[0-9]+)?$'
+                   THEN (alert_rules->>'threshold')::numeric > 0
+                   ELSE false END
+    """)
+
+    op.create_index(
+        'ix_watchlists_product_threshold', 'watchlists', ['product_id', 'alert_threshold_cents'],
+        unique=False, postgresql_where=sa.text('alert_threshold_cents IS NOT NULL')
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_watchlists_product_threshold', table_name='watchlists')
+    op.drop_column('watchlists', 'last_alerted_cents')
+    op.drop_column('watchlists', 'alert_threshold_cents')
@@ -1,11 +1,13 @@
 # backend/app/api/cron.py
-from fastapi import APIRouter, Depends, BackgroundTasks
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, BackgroundTasks
 # --- 1. Import SessionLocal AND Source model ---
-from ..database import get_db, SessionLocal
+from ..database import SessionLocal
 from ..models import ProductSource, Source
+from ..config import settings
+from sqlalchemy import or_
+from datetime import datetime, timezone
 from ..utils.scraper_queue import (
-    enqueue_scrape, 
+    enqueue_scrape_batches, 
     enqueue_alert_check, 
     enqueue_sales_discovery, 
     enqueue_aggregation
@@ -22,20 +24,30 @@ def run_all_scrapes():
         
         # --- THIS IS THE "MEESHO SOUVENIR" FIX ---
         # We join with the Source table and filter out 'meesho.com'
-        all_product_sources = db.query(ProductSource).join(
+        # Only sources that are due (per the worker's adaptive schedule) are picked,
+        # read through the next_scrape_at index, most overdue first.
+        now = datetime.now(timezone.utc)
+        all_product_sources = db.query(
+            ProductSource.url, ProductSource.product_id, ProductSource.id, Source.domain
+        ).join(
             Source, ProductSource.source_id == Source.id
         ).filter(
-            Source.domain != 'meesho.com'
-        ).all()
+            Source.domain != 'meesho.com',
+            or_(ProductSource.next_scrape_at == None, ProductSource.next_scrape_at <= now)
+        ).order_by(
+            ProductSource.next_scrape_at.asc().nullsfirst()
+        ).limit(settings.SCRAPE_DUE_LIMIT).all()
         # --- END OF FIX ---
         
         # This print statement will now appear in your backend logs
-        print(f"Found {len(all_product_sources)} products to re-scrape. (Ignoring meesho.com)")
-        for ps in all_product_sources:
-            try:
-                enqueue_scrape(ps.url, ps.product_id, ps.id)
-            except Exception as e:
-                print(f"Failed to enqueue scrape job for {ps.url}: {e}")
+        print(f"Found {len(all_product_sources)} due products to re-scrape. (Ignoring meesho.com)")
+        # One batch job per domain chunk, all written in a single Redis pipeline
+        items = [(ps.url, ps.product_id, ps.id, ps.domain) for ps in all_product_sources]
+        try:
+            job_ids = enqueue_scrape_batches(items)
+            print(f"Enqueued {len(job_ids)} scrape batch jobs.")
+        except Exception as e:
+            print(f"Failed to enqueue scrape batches: {e}")
 
 def run_sales_discovery():
     """Function to be run in the background to find sales."""
@@ -62,7 +74,7 @@ def run_data_aggregation():
         print(f"Failed to enqueue data aggregation job: {e}")
 
 @router.post("/trigger-scrapes")
-async def trigger_scrapes(background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+async def trigger_scrapes(background_tasks: BackgroundTasks):
     """
     This endpoint is called by the cron job service.
     It adds scraping, alert checking, sales, AND aggregation to the background.
@@ -1,10 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from urllib.parse import urlparse
-from ..database import get_db
+import json
+from datetime import datetime, timezone
+from ..database import get_async_db
 # Corrected Imports
-from ..schemas.product import ProductCreate, ProductResponse, ProductDetail, ProductWithHistorySchema, ProductReplace
+from ..schemas.product import ProductCreate, ProductResponse, ProductDetail, ProductWithHistorySchema, ProductReplace, ProductPage
 from ..schemas.price import PriceHistory
 from ..schemas.extension import ProductDataFromExtension
 from ..crud import products as crud_products
@@ -13,6 +17,9 @@ from ..models import Product, Source, ProductSource, PriceLog, ScamScore, Seller
 from ..crud import watchlist as crud_watchlist
 from ..schemas.watchlist import WatchlistCreate
 from ..utils.scraper_queue import enqueue_scrape, enqueue_scam_check
+from ..utils.history_cache import HistoryLookup, invalidate_product, invalidate_all
+from ..utils.export_stream import stream_export
+from ..utils.columnar_export import iter_record_batches, stream_columnar
 from typing import Literal # Import Literal
 
 RangeOption = Literal["1h", "6h", "24h", "7d", "30d", "90d", "1y", "all"]
@@ -20,27 +27,35 @@ RangeOption = Literal["1h", "6h", "24h", "7d", "30d", "90d", "1y", "all"]
 router = APIRouter()
 
 
+async def _scam_score_for(db: AsyncSession, domain: str) -> Optional[ScamScore]:
+    return (await db.execute(select(ScamScore).where(ScamScore.domain == domain))).scalars().first()
+
+
+async def _source_for(db: AsyncSession, domain: str) -> Optional[Source]:
+    return (await db.execute(select(Source).where(Source.domain == domain))).scalars().first()
+
+
 @router.post("/add-from-extension")
-async def add_product_from_extension(product_data: ProductDataFromExtension, db: Session = Depends(get_db)):
+async def add_product_from_extension(product_data: ProductDataFromExtension, db: AsyncSession = Depends(get_async_db)):
     parsed_url = urlparse(product_data.url)
     domain = parsed_url.netloc.replace('www.', '')
 
     try:
-        existing_scam_score = db.query(ScamScore).filter(ScamScore.domain == domain).first()
+        existing_scam_score = await _scam_score_for(db, domain)
         if not existing_scam_score:
             enqueue_scam_check(domain)
     except Exception as e:
         print(f"Failed to enqueue scam check job for {domain}: {e}")
 
-    source = db.query(Source).filter(Source.domain == domain).first()
+    source = await _source_for(db, domain)
     if not source:
         source = Source(domain=domain, site_name=domain.split('.')[0].title())
         db.add(source)
-        db.commit()
-        db.refresh(source)
+        await db.commit()
+        await db.refresh(source)
 
     marketplace_name = domain.split('.')[0].title()
-    seller = crud_products.get_or_create_seller(
+    seller = await crud_products.get_or_create_seller(
         db,
         marketplace=marketplace_name,
         seller_name=product_data.brand or "Unknown", # Use brand as fallback
@@ -55,8 +70,8 @@ async def add_product_from_extension(product_data: ProductDataFromExtension, db:
         image_url=product_data.imageUrl
     )
     db.add(new_product)
-    db.commit()
-    db.refresh(new_product)
+    await db.commit()
+    await db.refresh(new_product)
 
     product_source = ProductSource(
         product_id=new_product.id,
@@ -65,8 +80,8 @@ async def add_product_from_extension(product_data: ProductDataFromExtension, db:
         url=product_data.url
     )
     db.add(product_source)
-    db.commit()
-    db.refresh(product_source)
+    await db.commit()
+    await db.refresh(product_source)
 
     price_log = PriceLog(
         product_source_id=product_source.id,
@@ -75,8 +90,10 @@ async def add_product_from_extension(product_data: ProductDataFromExtension, db:
         in_stock=True
     )
     db.add(price_log)
-    db.commit()
-    db.refresh(new_product)
+    await crud_prices.upsert_latest_price(db, price_log)
+    await crud_prices.upsert_price_stats(db, price_log)
+    await db.commit()
+    await db.refresh(new_product)
 
     # --- "MEESHO SOUVENIR" FIX (FOR EXTENSION) ---
     if "meesho.com" not in domain:
@@ -94,33 +111,35 @@ async def add_product_from_extension(product_data: ProductDataFromExtension, db:
 
 
 @router.post("/track", response_model=ProductResponse)
-async def track_product(product: ProductCreate, db: Session = Depends(get_db)):
-    existing_product_source = db.query(ProductSource).filter(ProductSource.url == product.url).first()
+async def track_product(product: ProductCreate, db: AsyncSession = Depends(get_async_db)):
+    existing_product_source = (await db.execute(
+        select(ProductSource).where(ProductSource.url == product.url)
+    )).scalars().first()
     if existing_product_source:
         print(f"URL already tracked: {product.url}")
-        return existing_product_source.product
+        return await db.get(Product, existing_product_source.product_id)
 
-    db_product = crud_products.create_product(db, product)
+    db_product = await crud_products.create_product(db, product)
     parsed_url = urlparse(product.url)
     domain = parsed_url.netloc.replace('www.', '')
 
     try:
-        existing_scam_score = db.query(ScamScore).filter(ScamScore.domain == domain).first()
+        existing_scam_score = await _scam_score_for(db, domain)
         if not existing_scam_score:
             enqueue_scam_check(domain)
     except Exception as e:
         print(f"Failed to enqueue scam check job for {domain}: {e}")
 
-    source = db.query(Source).filter(Source.domain == domain).first()
+    source = await _source_for(db, domain)
     if not source:
         site_name = domain.split('.')[0].title()
         source = Source(domain=domain, site_name=site_name, trust_score=50.0)
         db.add(source)
-        db.commit()
-        db.refresh(source)
+        await db.commit()
+        await db.refresh(source)
 
     marketplace_name = domain.split('.')[0].title()
-    seller = crud_products.get_or_create_seller(
+    seller = await crud_products.get_or_create_seller(
         db,
         marketplace=marketplace_name,
         seller_name=product.brand or "Unknown", # Use brand as fallback
@@ -135,7 +154,7 @@ async def track_product(product: ProductCreate, db: Session = Depends(get_db)):
         url=product.url
     )
     db.add(product_source)
-    db.commit()
+    await db.commit()
 
     # --- "MEESHO SOUVENIR" FIX (FOR APP) ---
     if "meesho.com" not in domain:
@@ -151,45 +170,63 @@ async def track_product(product: ProductCreate, db: Session = Depends(get_db)):
     return db_product
 
 
-@router.get("/export", response_model=List[ProductWithHistorySchema])
-async def export_all_data(db: Session = Depends(get_db)):
-    # ... (same as before)
-    try:
-        all_products = crud_products.get_products(db, skip=0, limit=10000)
-        export_data = []
-
-        for product in all_products:
-            product_dict = {column.name: getattr(product, column.name) for column in product.__table__.columns}
-            history_data = crud_prices.get_flexible_price_history(db, product.id, range_option="all")
-            history_list = [
-                {
-                    "date": item["date"],
-                    "price": item["price"],
-                    "source": item["source"]
-                }
-                for item in history_data
-            ]
-            product_with_history = {**product_dict, "price_history": history_list}
-            export_data.append(product_with_history)
-
-        return export_data
+@router.get("/export")
+async def export_all_data(
+    format: Literal["ndjson", "csv"] = Query("ndjson", description="ndjson: one product with its history per line; csv: one row per price point"),
+    gzip: bool = Query(False, description="Gzip the stream"),
+):
+    """Streams every product with its full price history. Memory stays flat whatever the data size."""
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    filename = f"pricetrackr_export_{datetime.now(timezone.utc):%Y-%m-%d}.{format}"
+    if gzip:
+        media_type = "application/gzip"
+        filename += ".gz"
+
+    return StreamingResponse(
+        stream_export(format, gzip=gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
-    except Exception as e:
-        print(f"Error exporting data: {e}")
-        raise HTTPException(status_code=500, detail="Failed to export data.")
+
+@router.get("/export/history")
+async def export_price_history(
+    format: Literal["parquet", "arrow"] = Query("parquet", description="parquet file or Arrow IPC stream"),
+    tiers: List[Literal["raw", "hourly", "daily", "monthly"]] = Query(["raw", "daily", "monthly"], description="History tables to include"),
+    start: Optional[datetime] = Query(None, description="Only rows at or after this time"),
+    end: Optional[datetime] = Query(None, description="Only rows before this time"),
+    product_id: Optional[List[int]] = Query(None, description="Limit to these products (repeatable)"),
+):
+    """
+    Columnar bulk download of price history joined to product, source and seller,
+    one flat row per price point or rollup bucket (see the `tier` column).
+    Encoded batch by batch straight from the database cursor.
+    """
+    extension, media_type = {
+        "parquet": ("parquet", "application/vnd.apache.parquet"),
+        "arrow": ("arrows", "application/vnd.apache.arrow.stream"),
+    }[format]
+    filename = f"pricetrackr_history_{datetime.now(timezone.utc):%Y-%m-%d}.{extension}"
+
+    batches = iter_record_batches(tiers, start=start, end=end, product_ids=product_id)
+    return StreamingResponse(
+        stream_columnar(format, batches),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 
 @router.get("/{product_id}", response_model=ProductDetail)
-async def get_product(product_id: int, db: Session = Depends(get_db)):
+async def get_product(product_id: int, db: AsyncSession = Depends(get_async_db)):
     # ... (same as before)
-    result = crud_products.get_product_with_prices(db, product_id)
+    result = await crud_products.get_product_with_prices(db, product_id)
     if not result:
         raise HTTPException(status_code=404, detail="Product not found")
 
     product_obj = result["product"]
     prices = result["prices"]
-    lowest_price = crud_prices.get_lowest_price(db, product_id)
-    is_watchlisted_flag = crud_watchlist.is_in_watchlist(db, product_id=product_id)
+    lowest_price = result["lowest_ever_price"]
+    is_watchlisted_flag = await crud_watchlist.is_in_watchlist(db, product_id=product_id)
     product_dict = {column.name: getattr(product_obj, column.name) for column in product_obj.__table__.columns}
 
     return {
@@ -200,36 +237,58 @@ async def get_product(product_id: int, db: Session = Depends(get_db)):
     }
 
 
-@router.get("/", response_model=List[ProductResponse])
-async def list_products(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    # ... (same as before)
-    products = crud_products.get_products(db, skip=skip, limit=limit)
-    return products
+@router.get("/", response_model=ProductPage)
+async def list_products(
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[int] = Query(None, description="next_cursor of the previous page"),
+    source: Optional[str] = Query(None, description="Source domain, e.g. amazon.in"),
+    brand: Optional[str] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    in_stock: Optional[bool] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Products newest first, filtered server-side, one keyset page at a time."""
+    items, next_cursor = await crud_products.get_products(
+        db,
+        limit=limit,
+        cursor=cursor,
+        source=source,
+        brand=brand,
+        min_price=min_price,
+        max_price=max_price,
+        in_stock=in_stock
+    )
+    return {"items": items, "next_cursor": next_cursor}
 
 
 @router.get("/{product_id}/history", response_model=List[PriceHistory])
 async def get_price_history(
     product_id: int, 
     range: RangeOption = Query("30d", description="Time range for history (e.g., 7d, 1y, all)"),
-    db: Session = Depends(get_db)
+    max_points: Optional[int] = Query(None, ge=10, le=10000, description="Downsample to about this many points (LTTB, split across sellers)"),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    # ... (same as before)
-    history_data = crud_prices.get_flexible_price_history(db, product_id, range_option=range)
-    return [
-        PriceHistory(
-            date=item["date"],
-            price=item["price"],
-            source=item["source"]
-        )
+    # Served from Redis until the worker publishes a PRICE_UPDATE for this product
+    lookup = await HistoryLookup(product_id, range, max_points).load()
+    if lookup.cached is not None:
+        return Response(content=lookup.cached, media_type="application/json")
+
+    history_data = await crud_prices.get_flexible_price_history(db, product_id, range_option=range, max_points=max_points)
+    body = json.dumps([
+        {"date": item["date"], "price": item["price"], "source": item["source"]}
         for item in history_data
-    ]
+    ]).encode()
+    await lookup.fill(body)
+    return Response(content=body, media_type="application/json")
 
 
 @router.delete("/all", status_code=status.HTTP_200_OK)
-async def delete_all_tracked_products(db: Session = Depends(get_db)):
+async def delete_all_tracked_products(db: AsyncSession = Depends(get_async_db)):
     # ... (same as before)
     try:
-        deleted_count = crud_products.delete_all_products(db)
+        deleted_count = await crud_products.delete_all_products(db)
+        await invalidate_all()
         return {"message": f"Successfully deleted {deleted_count} products."}
     except Exception as e:
         print(f"Error deleting all products: {e}")
@@ -237,23 +296,25 @@ async def delete_all_tracked_products(db: Session = Depends(get_db)):
 
 
 @router.delete("/{product_id}", status_code=status.HTTP_200_OK)
-async def delete_product(product_id: int, db: Session = Depends(get_db)):
+async def delete_product(product_id: int, db: AsyncSession = Depends(get_async_db)):
     # ... (same as before)
-    success = crud_products.delete_product(db, product_id)
+    success = await crud_products.delete_product(db, product_id)
     if not success:
         raise HTTPException(status_code=404, detail="Product not found")
+    await invalidate_product(product_id)
     return {"message": "Product deleted successfully"}
 
 
 @router.post("/replace", response_model=ProductResponse)
 async def replace_product(
     payload: ProductReplace, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # ... (same as before)
     print(f"Replacing product {payload.old_product_id} with new URL: {payload.new_url}")
 
-    delete_success = crud_products.delete_product(db, payload.old_product_id)
+    delete_success = await crud_products.delete_product(db, payload.old_product_id)
+    await invalidate_product(payload.old_product_id)
     if not delete_success:
         print(f"Warning: Could not find old product {payload.old_product_id} to delete. Proceeding to add new one.")
 
@@ -272,31 +333,29 @@ async def replace_product(
         raise HTTPException(status_code=500, detail="Failed to track the new replacement product.")
 
 @router.post("/cleanup-orphans", status_code=status.HTTP_200_OK)
-async def cleanup_orphaned_product_sources(db: Session = Depends(get_db)):
+async def cleanup_orphaned_product_sources(db: AsyncSession = Depends(get_async_db)):
     # ... (same as before)
     print("Running orphan cleanup job...")
 
-    valid_product_ids_query = db.query(Product.id).all()
+    valid_product_ids_query = (await db.execute(select(Product.id))).all()
     valid_product_ids = {pid[0] for pid in valid_product_ids_query}
 
     if not valid_product_ids:
         print("No valid products found. Deleting all product sources.")
-        deleted_count_result = db.execute(ProductSource.__table__.delete())
+        deleted_count_result = await db.execute(ProductSource.__table__.delete())
         deleted_count = deleted_count_result.rowcount
     else:
-        orphaned_sources_query = db.query(ProductSource).filter(
-            ProductSource.product_id.notin_(valid_product_ids)
-        )
-        orphaned_sources = orphaned_sources_query.all()
+        orphaned_filter = ProductSource.product_id.notin_(valid_product_ids)
+        orphaned_sources = (await db.execute(select(ProductSource.id).where(orphaned_filter))).all()
         deleted_count = len(orphaned_sources)
 
         if deleted_count > 0:
             print(f"Found {deleted_count} orphaned product sources. Deleting them...")
-            orphaned_sources_query.delete(synchronize_session=False)
+            await db.execute(delete(ProductSource).where(orphaned_filter).execution_options(synchronize_session=False))
         else:
             print("No orphaned product sources found. Database is clean.")
 
-    db.commit()
+    await db.commit()
 
     return {
         "message": "Orphan cleanup complete.",
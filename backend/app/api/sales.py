@@ -1,12 +1,12 @@
 from fastapi import APIRouter, Depends, Query, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime, timezone
-from ..database import get_db
+from ..database import get_async_db
 from ..schemas.sale import SaleCreate, SaleResponse
 from ..crud import sales as crud_sales
 from ..models import Sale
-from sqlalchemy import or_
+from sqlalchemy import or_, select
 
 router = APIRouter()
 
@@ -15,38 +15,38 @@ router = APIRouter()
 async def get_sales(
     region: Optional[str] = None, 
     status: Optional[str] = Query(None, enum=["ongoing", "upcoming"]),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get active sales, with optional filtering by region and status (ongoing/upcoming)"""
-    query = db.query(Sale).filter(Sale.is_active == True)
+    query = select(Sale).where(Sale.is_active == True)
     
     if region:
-        query = query.filter(Sale.region == region)
+        query = query.where(Sale.region == region)
 
     if status:
         now = datetime.now(timezone.utc)
         if status == "ongoing":
-            query = query.filter(
+            query = query.where(
                 or_(Sale.start_date == None, Sale.start_date <= now),
                 or_(Sale.end_date == None, Sale.end_date >= now)
             )
         elif status == "upcoming":
-            query = query.filter(Sale.start_date > now)
+            query = query.where(Sale.start_date > now)
             
-    return query.all()
+    return (await db.execute(query)).scalars().all()
 
 
 @router.post("/", response_model=SaleResponse)
-async def create_sale(sale: SaleCreate, db: Session = Depends(get_db)):
+async def create_sale(sale: SaleCreate, db: AsyncSession = Depends(get_async_db)):
     """Create a new sale entry"""
-    db_sale = crud_sales.create_sale(db, sale)
+    db_sale = await crud_sales.create_sale(db, sale)
     return db_sale
 
 @router.delete("/all", status_code=status.HTTP_200_OK)
-async def delete_all_tracked_sales(db: Session = Depends(get_db)):
+async def delete_all_tracked_sales(db: AsyncSession = Depends(get_async_db)):
     """Deletes all sales from the database."""
     try:
-        deleted_count = crud_sales.delete_all_sales(db)
+        deleted_count = await crud_sales.delete_all_sales(db)
         return {"message": f"Successfully deleted {deleted_count} sales."}
     except Exception as e:
         print(f"Error deleting all sales: {e}")
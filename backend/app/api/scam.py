@@ -1,15 +1,16 @@
 from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
-from ..database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import get_async_db
 from ..models import ScamScore
 
 router = APIRouter()
 
 
 @router.get("/check")
-async def check_scam(domain: str = Query(...), db: Session = Depends(get_db)):
+async def check_scam(domain: str = Query(...), db: AsyncSession = Depends(get_async_db)):
     """Check scam score for a domain"""
-    scam_score = db.query(ScamScore).filter(ScamScore.domain == domain).first()
+    scam_score = (await db.execute(select(ScamScore).where(ScamScore.domain == domain))).scalars().first()
     
     if not scam_score:
         # Default safe score if not in database
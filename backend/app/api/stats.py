@@ -1,58 +1,36 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from ..database import get_db
-from ..models import Product, Sale, PriceLog, ProductSource
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import get_async_db
+from ..models import Product, Sale, PriceLog, ProductSourceLatest, PriceHistoryDaily, PriceHistoryMonthly
 from ..schemas.stats import SpaceInfo
+from ..utils.scraper_queue import redis_conn, scraper_queue, get_dedup_stats
+from ..utils.history_cache import get_cache_stats
+from ..utils.websocket import manager, read_replica_metrics
 from sqlalchemy import func, desc, select, cast, Date
 from datetime import datetime, timedelta, timezone
 
 router = APIRouter()
 
 @router.get("/dashboard")
-async def get_dashboard_stats(db: Session = Depends(get_db)):
+async def get_dashboard_stats(db: AsyncSession = Depends(get_async_db)):
     """Get statistics for the main dashboard."""
     
-    total_products = db.query(Product).count()
-    active_deals = db.query(Sale).filter(Sale.is_active == True).count()
+    total_products = await db.scalar(select(func.count(Product.id)))
+    active_deals = await db.scalar(select(func.count(Sale.id)).where(Sale.is_active == True))
     
     # --- THIS IS THE NEW, CORRECTED LOGIC FOR PRICE DROPS ---
     
-    # 1. Define "today"
-    today = datetime.now(timezone.utc).date()
+    # 1. Define "today" (UTC)
+    today_start = datetime.combine(datetime.now(timezone.utc).date(), datetime.min.time(), tzinfo=timezone.utc)
 
-    # 2. Create a subquery to rank prices for each product source
-    price_rank_sq = select(
-        PriceLog.product_source_id,
-        PriceLog.price_cents,
-        cast(PriceLog.scraped_at, Date).label("scraped_date"),
-        func.row_number().over(
-            partition_by=PriceLog.product_source_id,
-            order_by=desc(PriceLog.scraped_at)
-        ).label("rn")
-    ).alias("price_rank")
-
-    # 3. Create a query to get the latest (rn=1) and previous (rn=2) price
-    latest_price_q = select(
-        price_rank_sq.c.product_source_id,
-        price_rank_sq.c.price_cents,
-        price_rank_sq.c.scraped_date
-    ).where(price_rank_sq.c.rn == 1).alias("latest_price")
-    
-    prev_price_q = select(
-        price_rank_sq.c.product_source_id,
-        price_rank_sq.c.price_cents
-    ).where(price_rank_sq.c.rn == 2).alias("prev_price")
-
-    # 4. Join them and count where the latest price is from today AND is less than the previous price
-    price_drops_query = select(func.count()).select_from(latest_price_q).join(
-        prev_price_q,
-        latest_price_q.c.product_source_id == prev_price_q.c.product_source_id
-    ).where(
-        latest_price_q.c.scraped_date == today,
-        latest_price_q.c.price_cents < prev_price_q.c.price_cents
+    # 2. A drop is a source whose latest price, scraped today, is below the one before it.
+    #    product_source_latest keeps both, so this is a range scan on its scraped_at index.
+    price_drops_query = select(func.count()).select_from(ProductSourceLatest).where(
+        ProductSourceLatest.scraped_at >= today_start,
+        ProductSourceLatest.price_cents < ProductSourceLatest.previous_price_cents
     )
     
-    price_drops = db.execute(price_drops_query).scalar_one() or 0
+    price_drops = (await db.execute(price_drops_query)).scalar_one() or 0
     
     # --- END OF NEW LOGIC ---
 
@@ -65,22 +43,41 @@ async def get_dashboard_stats(db: Session = Depends(get_db)):
 
 
 @router.get("/space", response_model=SpaceInfo)
-async def get_space_info(db: Session = Depends(get_db)):
+async def get_space_info(db: AsyncSession = Depends(get_async_db)):
     """Get statistics for storage space and item counts."""
-    tracked_items = db.query(Product).count()
+    tracked_items = await db.scalar(select(func.count(Product.id)))
     
     # Count from all price tables for a total
-    raw_points = db.query(func.count(PriceLog.id)).scalar()
-    daily_points = db.query(func.count("id")).select_from(
-        db.query(ProductSource).join(ProductSource.price_history_daily).subquery()
-    ).scalar()
-    monthly_points = db.query(func.count("id")).select_from(
-        db.query(ProductSource).join(ProductSource.price_history_monthly).subquery()
-    ).scalar()
+    raw_points = await db.scalar(select(func.count(PriceLog.id)))
+    daily_points = await db.scalar(select(func.count(PriceHistoryDaily.id)))
+    monthly_points = await db.scalar(select(func.count(PriceHistoryMonthly.id)))
 
     price_points = (raw_points or 0) + (daily_points or 0) + (monthly_points or 0)
     
     return {
         "tracked_items": tracked_items,
         "price_points": price_points
-    }
\ No newline at end of file
+    }
+
+
+@router.get("/scraping")
+async def get_scraping_stats():
+    """Queue depth, enqueue dedup counters and the counters the workers publish."""
+    raw_worker_metrics = redis_conn.hgetall("worker_metrics")
+    return {
+        "queue_length": scraper_queue.count,
+        "dedup": get_dedup_stats(),
+        "worker_metrics": {k.decode(): int(v) for k, v in raw_worker_metrics.items()},
+    }
+
+
+@router.get("/cache")
+async def get_history_cache_stats():
+    """Hit ratio and latency of the price history cache."""
+    return await get_cache_stats()
+
+
+@router.get("/websocket")
+async def get_websocket_stats():
+    """Fan-out stats of the process serving this request, and the last report from every replica."""
+    return {"this_replica": manager.stats(), "replicas": await read_replica_metrics()}
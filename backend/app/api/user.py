@@ -1,9 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Header
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 from typing import Optional
 
-from ..database import get_db
+from ..database import get_async_db
 from ..schemas.user_schema import UserCreate, UserResponse, UserLogin, Token, PushSubscriptionCreate
 from ..crud import user as user_crud
 from ..crud import watchlist as crud_watchlist
@@ -15,18 +15,18 @@ from ..utils.dependencies import get_current_user # Dependency to get logged-in
 router = APIRouter()
 
 @router.post("/register", response_model=UserResponse)
-async def register_user(user: UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     # ... (register endpoint remains the same)
-    db_user = user_crud.get_user_by_email(db, email=user.email)
+    db_user = await user_crud.get_user_by_email(db, email=user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
-    new_user = user_crud.create_user(db=db, user=user)
+    new_user = await user_crud.create_user(db=db, user=user)
     return new_user
 
 @router.post("/login", response_model=Token)
-async def login_for_access_token(user_credentials: UserLogin, db: Session = Depends(get_db)):
+async def login_for_access_token(user_credentials: UserLogin, db: AsyncSession = Depends(get_async_db)):
     # ... (login endpoint remains the same)
-    user = user_crud.get_user_by_email(db, email=user_credentials.email)
+    user = await user_crud.get_user_by_email(db, email=user_credentials.email)
     if not user or not auth.verify_password(user_credentials.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -44,7 +44,7 @@ async def login_for_access_token(user_credentials: UserLogin, db: Session = Depe
 async def merge_anonymous_data(
     anonymous_id: str = Header(..., alias="X-Anonymous-ID"),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # ... (merge endpoint remains the same)
     if not current_user:
@@ -52,7 +52,7 @@ async def merge_anonymous_data(
     if not anonymous_id:
         raise HTTPException(status_code=400, detail="Anonymous ID is required")
     user_identifier = current_user.email
-    merged_count = crud_watchlist.merge_watchlist(db, anonymous_id, user_identifier)
+    merged_count = await crud_watchlist.merge_watchlist(db, anonymous_id, user_identifier)
     return {
         "message": "Data merged successfully",
         "merged_items": merged_count
@@ -62,7 +62,7 @@ async def merge_anonymous_data(
 async def update_push_subscription(
     subscription: PushSubscriptionCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Save or remove a push notification subscription for the logged-in user.
@@ -72,22 +72,22 @@ async def update_push_subscription(
         raise HTTPException(status_code=401, detail="Authentication required")
     
     current_user.push_subscription = subscription.subscription
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
+    await db.refresh(current_user)
     return current_user
 
 # --- ADD THIS NEW ENDPOINT ---
 @router.delete("/me", status_code=status.HTTP_200_OK)
 async def delete_current_user(
     current_user: User = Depends(get_current_user), # Ensures user is logged in
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Deletes the currently authenticated user."""
     if not current_user:
         # This shouldn't happen if the dependency works correctly, but good practice
         raise HTTPException(status_code=401, detail="Authentication required")
 
-    success = user_crud.delete_user(db, user_id=current_user.id)
+    success = await user_crud.delete_user(db, user_id=current_user.id)
 
     if not success:
         # Should ideally not happen if user exists, maybe DB error?
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, Header
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from ..database import get_db
+from ..database import get_async_db
 from ..schemas.watchlist import WatchlistCreate, WatchlistResponse, WatchlistUpdate
 from ..crud import watchlist as crud_watchlist
 from ..utils.dependencies import get_current_user
@@ -26,30 +26,27 @@ async def get_user_identifier(
 async def add_to_watchlist(
     watchlist: WatchlistCreate, 
     identifier: str = Depends(get_user_identifier), # Use new dependency
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Add product to watchlist for either anonymous or logged-in user"""
 
     watchlist.user_id = identifier # Set the user_id on the item
 
-    if crud_watchlist.is_in_watchlist(db, watchlist.product_id, user_id=identifier):
-        item = db.query(crud_watchlist.Watchlist).filter(
-            crud_watchlist.Watchlist.product_id == watchlist.product_id,
-            crud_watchlist.Watchlist.user_id == identifier
-        ).first()
+    item = await crud_watchlist.get_watchlist_item(db, watchlist.product_id, user_id=identifier)
+    if item:
         return item
 
-    db_watchlist = crud_watchlist.create_watchlist_item(db, watchlist)
+    db_watchlist = await crud_watchlist.create_watchlist_item(db, watchlist)
     return db_watchlist
 
 
 @router.get("/", response_model=List[WatchlistResponse])
 async def get_watchlist(
     identifier: str = Depends(get_user_identifier), # Use new dependency
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get user's watchlist (anonymous or logged-in)"""
-    items = crud_watchlist.get_watchlist(db, identifier)
+    items = await crud_watchlist.get_watchlist(db, identifier)
     return items
 
 
@@ -58,10 +55,10 @@ async def update_watchlist_alert(
     watchlist_id: int, 
     watchlist: WatchlistUpdate, 
     identifier: str = Depends(get_user_identifier), # Add dependency
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update alert rules for a watchlist item"""
-    item_to_update = db.query(crud_watchlist.Watchlist).filter(crud_watchlist.Watchlist.id == watchlist_id).first()
+    item_to_update = await db.get(crud_watchlist.Watchlist, watchlist_id)
 
     if not item_to_update:
         raise HTTPException(status_code=404, detail="Watchlist item not found")
@@ -69,7 +66,7 @@ async def update_watchlist_alert(
     if item_to_update.user_id != identifier:
         raise HTTPException(status_code=403, detail="Not authorized to update this item")
 
-    updated_item = crud_watchlist.update_watchlist_item(db, watchlist_id, watchlist)
+    updated_item = await crud_watchlist.update_watchlist_item(db, watchlist_id, watchlist)
     return updated_item
 
 
@@ -77,10 +74,10 @@ async def update_watchlist_alert(
 async def remove_from_watchlist(
     watchlist_id: int, 
     identifier: str = Depends(get_user_identifier), # Add dependency
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Remove item from watchlist"""
-    item_to_delete = db.query(crud_watchlist.Watchlist).filter(crud_watchlist.Watchlist.id == watchlist_id).first()
+    item_to_delete = await db.get(crud_watchlist.Watchlist, watchlist_id)
 
     if not item_to_delete:
         raise HTTPException(status_code=404, detail="Watchlist item not found")
@@ -88,7 +85,7 @@ async def remove_from_watchlist(
     if item_to_delete.user_id != identifier:
         raise HTTPException(status_code=403, detail="Not authorized to delete this item")
 
-    success = crud_watchlist.delete_watchlist_item(db, watchlist_id)
+    success = await crud_watchlist.delete_watchlist_item(db, watchlist_id)
     if not success:
         raise HTTPException(status_code=404, detail="Item not found")
     return {"message": "Removed from watchlist"}
\ No newline at end of file
@@ -0,0 +1,46 @@
+# backend/app/crud/export.py
+from sqlalchemy.orm import Session
+from typing import Any, Dict, Iterator, List, Tuple
+from ..models import Product
+from .prices import history_subquery, tier_ends_from_rows, TIER_ENDS_QUERY
+
+# Rows fetched per round trip from the server-side cursors
+EXPORT_BATCH_SIZE = 2000
+
+PRODUCT_COLUMNS = [column.name for column in Product.__table__.columns]
+
+
+def iter_products_with_history(db: Session, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+    """
+    Yields (product, price_history) for every product, in id order.
+
+    Two set-based queries are streamed side by side through server-side cursors:
+    products ordered by id, and the full tiered history of all products ordered
+    by (product_id, date). Only one product's history is held at a time.
+    """
+    products = db.query(*Product.__table__.columns).order_by(Product.id).execution_options(
+        yield_per=batch_size
+    )
+    history = history_subquery(tier_ends_from_rows(db.execute(TIER_ENDS_QUERY).all()), "all")
+    points = iter(
+        db.query(history).order_by(history.c.product_id, history.c.date).execution_options(
+            yield_per=batch_size
+        )
+    )
+
+    point = next(points, None)
+    for product in products:
+        # History rows of products deleted mid-export (no product row) are skipped
+        while point is not None and point.product_id < product.id:
+            point = next(points, None)
+
+        product_history = []
+        while point is not None and point.product_id == product.id:
+            product_history.append({
+                "date": point.date.isoformat(),
+                "price": point.price_cents / 100,
+                "source": point.seller_name or "Unknown Seller"
+            })
+            point = next(points, None)
+
+        yield dict(zip(PRODUCT_COLUMNS, product)), product_history
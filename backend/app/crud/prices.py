@@ -1,180 +1,265 @@
 # backend/app/crud/prices.py
-from sqlalchemy.orm import Session
-from sqlalchemy import desc, func, cast, Date, union_all, DateTime # <-- IMPORT ADDED HERE
-from typing import List, Dict, Any, Literal
-from datetime import datetime, timedelta, timezone # <-- This imports 'datetime'
-from ..models import PriceLog, ProductSource, Seller, PriceHistoryDaily, PriceHistoryMonthly
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy import desc, func, cast, case, select, Date, union_all, DateTime # <-- IMPORT ADDED HERE
+from typing import List, Dict, Any, Literal, Optional
+from collections import defaultdict
+import numpy as np
+from datetime import date, datetime, time, timedelta, timezone # <-- This imports 'datetime'
+from ..models import (
+    PriceLog, ProductSource, ProductSourceLatest, ProductSourcePriceStats, Seller,
+    PriceHistoryHourly, PriceHistoryDaily, PriceHistoryMonthly, AggregationWatermark
+)
 from ..schemas.price import PriceLogCreate
+from ..utils.downsample import downsample
 
 # Type for range parameter
 RangeOption = Literal["1h", "6h", "24h", "7d", "30d", "90d", "1y", "all"]
 
-def create_price_log(db: Session, price: PriceLogCreate) -> PriceLog:
+async def upsert_latest_price(db: AsyncSession, price_log: PriceLog):
+    """
+    Mirrors a new PriceLog into product_source_latest (same transaction, so the
+    caller commits). The old price moves to previous_price_cents.
+    """
+    values = {
+        column: getattr(price_log, column)
+        for column in ('product_source_id', 'price_cents', 'currency', 'availability', 'in_stock', 'avg_review_sentiment')
+        if getattr(price_log, column) is not None  # unset fields fall back to the column defaults
+    }
+    stmt = insert(ProductSourceLatest).values(**values, scraped_at=func.now())
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=['product_source_id'],
+        set_={
+            'previous_price_cents': ProductSourceLatest.price_cents,
+            'price_cents': stmt.excluded.price_cents,
+            'currency': stmt.excluded.currency,
+            'availability': stmt.excluded.availability,
+            'in_stock': stmt.excluded.in_stock,
+            'avg_review_sentiment': stmt.excluded.avg_review_sentiment,
+            'scraped_at': stmt.excluded.scraped_at
+        },
+        where=ProductSourceLatest.scraped_at <= stmt.excluded.scraped_at
+    ))
+
+
+async def upsert_price_stats(db: AsyncSession, price_log: PriceLog):
+    """
+    Folds a new PriceLog into product_source_price_stats. Same statement as the
+    worker's; the caller commits.
+    """
+    price = price_log.price_cents
+    stmt = insert(ProductSourcePriceStats).values(
+        product_source_id=price_log.product_source_id,
+        min_cents=price, min_at=func.now(),
+        max_cents=price, max_at=func.now(),
+        min_30d_cents=price, sum_30d_cents=price, samples_30d=1
+    )
+    stats = ProductSourcePriceStats
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=['product_source_id'],
+        set_={
+            'min_at': case((stmt.excluded.min_cents < stats.min_cents, stmt.excluded.min_at), else_=stats.min_at),
+            'min_cents': func.least(stats.min_cents, stmt.excluded.min_cents),
+            'max_at': case((stmt.excluded.max_cents > stats.max_cents, stmt.excluded.max_at), else_=stats.max_at),
+            'max_cents': func.greatest(stats.max_cents, stmt.excluded.max_cents),
+            # LEAST ignores NULL, so an empty window simply takes the new price
+            'min_30d_cents': func.least(stats.min_30d_cents, stmt.excluded.min_30d_cents),
+            'sum_30d_cents': stats.sum_30d_cents + stmt.excluded.sum_30d_cents,
+            'samples_30d': stats.samples_30d + 1,
+            'updated_at': func.now()
+        }
+    ))
+
+
+async def create_price_log(db: AsyncSession, price: PriceLogCreate) -> PriceLog:
     db_price = PriceLog(**price.model_dump())
     db.add(db_price)
-    db.commit()
-    db.refresh(db_price)
+    await upsert_latest_price(db, db_price)
+    await upsert_price_stats(db, db_price)
+    await db.commit()
+    await db.refresh(db_price)
     return db_price
 
 
-def get_lowest_price(db: Session, product_id: int):
+def product_price_stats():
+    """Per-product rollup of product_source_price_stats: one row per product, all in cents."""
+    stats = ProductSourcePriceStats
+    return select(
+        ProductSource.product_id.label("product_id"),
+        func.min(stats.min_cents).label("min_cents"),
+        func.max(stats.max_cents).label("max_cents"),
+        func.min(stats.min_30d_cents).label("min_30d_cents"),
+        (func.sum(stats.sum_30d_cents) / func.nullif(func.sum(stats.samples_30d), 0)).label("avg_30d_cents")
+    ).join(
+        stats, stats.product_source_id == ProductSource.id
+    ).group_by(ProductSource.product_id)
+
+
+async def get_lowest_price(db: AsyncSession, product_id: int):
     """Get the lowest price ever recorded for a product across all sources"""
-    
-    # We need to check all three tables
-    raw_q = db.query(func.min(PriceLog.price_cents)).join(ProductSource).filter(
-        ProductSource.product_id == product_id
-    )
-    daily_q = db.query(func.min(PriceHistoryDaily.min_cents)).join(ProductSource).filter(
-        ProductSource.product_id == product_id
-    )
-    monthly_q = db.query(func.min(PriceHistoryMonthly.min_cents)).join(ProductSource).filter(
+    lowest_cents = await db.scalar(select(func.min(ProductSourcePriceStats.min_cents)).join(
+        ProductSource, ProductSourcePriceStats.product_source_id == ProductSource.id
+    ).where(
         ProductSource.product_id == product_id
-    )
-    
-    results = [q.scalar() for q in [raw_q, daily_q, monthly_q] if q.scalar() is not None]
-    
-    if not results:
-        return None
-        
-    lowest_cents = min(results)
+    ))
     return lowest_cents / 100 if lowest_cents else None
 
 
-def get_flexible_price_history(db: Session, product_id: int, range_option: RangeOption = "30d") -> List[Dict[str, Any]]:
+# How far back each range reaches, and the coarsest tier it may start from
+RANGE_WINDOWS = {
+    "1h": (timedelta(hours=1), "raw"),
+    "6h": (timedelta(hours=6), "raw"),
+    "24h": (timedelta(hours=24), "raw"),
+    "7d": (timedelta(days=7), "hourly"),
+    "30d": (timedelta(days=30), "hourly"),
+    "90d": (timedelta(days=90), "daily"),
+    "1y": (timedelta(days=365), "daily"),
+    "all": (None, "monthly"),
+}
+
+# Coarse to fine. Each tier covers the time up to its watermark, the next tier picks up from there.
+TIERS = ("monthly", "daily", "hourly", "raw")
+
+
+def _utc_midnight(d: date) -> datetime:
+    return datetime.combine(d, time.min, tzinfo=timezone.utc)
+
+
+# The aggregation watermarks, read by both the async API and the sync exports
+TIER_ENDS_QUERY = select(
+    AggregationWatermark.job_name, AggregationWatermark.watermark, AggregationWatermark.watermark_at
+)
+
+
+def tier_ends_from_rows(rows) -> Dict[str, datetime]:
     """
-    Get price history for a product, automatically selecting the
-    best aggregation table (raw, daily, monthly) based on the range.
+    Turns the TIER_ENDS_QUERY rows into, per rollup tier, the instant up to
+    which that tier is complete. Tiers that never ran are left out.
     """
-    
-    now = datetime.now(timezone.utc)
-    from_dt = now - timedelta(days=30) # Default
-    
-    query_table = PriceLog
-    date_column = PriceLog.scraped_at
-    price_column = PriceLog.price_cents
-    
-    # 1. Determine date range and which table to query
-    if range_option == "1h":
-        from_dt = now - timedelta(hours=1)
-    elif range_option == "6h":
-        from_dt = now - timedelta(hours=6)
-    elif range_option == "24h":
-        from_dt = now - timedelta(hours=24)
-    elif range_option == "7d":
-        from_dt = now - timedelta(days=7)
-    elif range_option == "30d":
-        from_dt = now - timedelta(days=30)
-    elif range_option == "90d":
-        from_dt = now - timedelta(days=90)
-        query_table = PriceHistoryDaily
-        date_column = PriceHistoryDaily.day
-        price_column = PriceHistoryDaily.avg_cents
-    elif range_option == "1y":
-        from_dt = now - timedelta(days=365)
-        query_table = PriceHistoryDaily # Daily is fine for 1 year
-        date_column = PriceHistoryDaily.day
-        price_column = PriceHistoryDaily.avg_cents
-    elif range_option == "all":
-        # For "all", we query and union all three tables
-        return get_full_price_history(db, product_id)
-
-    # 2. Build the query for the selected table
-    
-    # Base query
-    query = db.query(
+    ends = {}
+    for job_name, watermark, watermark_at in rows:
+        if job_name == "monthly" and watermark:
+            next_month = (watermark.replace(day=28) + timedelta(days=4)).replace(day=1)
+            ends["monthly"] = _utc_midnight(next_month)
+        elif job_name == "daily" and watermark:
+            ends["daily"] = _utc_midnight(watermark + timedelta(days=1))
+        elif job_name == "hourly" and watermark_at:
+            ends["hourly"] = watermark_at
+    return ends
+
+
+async def get_tier_ends(db: AsyncSession) -> Dict[str, datetime]:
+    return tier_ends_from_rows((await db.execute(TIER_ENDS_QUERY)).all())
+
+
+def _tier_query(tier: str, product_id: Optional[int], lower: Optional[datetime], upper: Optional[datetime]):
+    """One tier's points in [lower, upper), for one product or all of them, shaped so tiers can be unioned."""
+    if tier == "monthly":
+        table, key = PriceHistoryMonthly, PriceHistoryMonthly.month
+        date_column, price_column = cast(PriceHistoryMonthly.month, DateTime), PriceHistoryMonthly.avg_cents
+        lower = lower and lower.date().replace(day=1)
+        upper = upper and upper.date()
+    elif tier == "daily":
+        table, key = PriceHistoryDaily, PriceHistoryDaily.day
+        date_column, price_column = cast(PriceHistoryDaily.day, DateTime), PriceHistoryDaily.avg_cents
+        lower = lower and lower.date()
+        upper = upper and upper.date()
+    elif tier == "hourly":
+        table, key = PriceHistoryHourly, PriceHistoryHourly.hour
+        date_column, price_column = PriceHistoryHourly.hour, PriceHistoryHourly.avg_cents
+    else:
+        table, key = PriceLog, PriceLog.scraped_at
+        date_column, price_column = PriceLog.scraped_at, PriceLog.price_cents
+
+    query = select(
         date_column.label("date"),
         price_column.label("price_cents"),
         ProductSource.id.label("source_id"),
-        Seller.seller_name.label("seller_name")
+        Seller.seller_name.label("seller_name"),
+        ProductSource.product_id.label("product_id")
     ).join(
-        ProductSource, query_table.product_source_id == ProductSource.id
+        ProductSource, table.product_source_id == ProductSource.id
     ).join(
         Seller, ProductSource.seller_id == Seller.id, isouter=True # Left join to seller
-    ).filter(
-        ProductSource.product_id == product_id,
-        date_column >= from_dt
-    ).order_by(
-        date_column.asc()
     )
-    
-    results = query.all()
-    
-    # 3. Format the results
-    return [
-        {
-            "date": r.date.isoformat(),
-            "price": r.price_cents / 100,
-            "source": r.seller_name or "Unknown Seller"
-        }
-        for r in results
-    ]
+    if product_id is not None:
+        query = query.where(ProductSource.product_id == product_id)
+    if lower is not None:
+        query = query.where(key >= lower)
+    if upper is not None:
+        query = query.where(key < upper)
+    return query
 
 
-def get_full_price_history(db: Session, product_id: int) -> List[Dict[str, Any]]:
+def history_subquery(tier_ends: Dict[str, datetime], range_option: RangeOption, product_id: Optional[int] = None):
     """
-    Queries and unions all three tables (monthly, daily, raw)
-    to get the entire price history for a product.
+    The tiers a range reads, chained at the watermarks (see get_tier_ends) and
+    unioned into one subquery (date, price_cents, source_id, seller_name, product_id).
+    Without product_id it covers every product.
     """
-    print("Running get_full_price_history (Union all tables)")
-    
-    # Define date cutoffs
+    window, coarsest = RANGE_WINDOWS.get(range_option, RANGE_WINDOWS["30d"])
     now = datetime.now(timezone.utc)
-    thirty_days_ago = now - timedelta(days=30)
-    one_year_ago = now - timedelta(days=365)
+    cursor = now - window if window else None
 
-    # Query 1: Monthly data (older than 1 year)
-    monthly_q = db.query(
-        cast(PriceHistoryMonthly.month, DateTime).label("date"), # <-- Error was here
-        PriceHistoryMonthly.avg_cents.label("price_cents"),
-        ProductSource.id.label("source_id"),
-        Seller.seller_name.label("seller_name")
-    ).join(
-        ProductSource, PriceHistoryMonthly.product_source_id == ProductSource.id
-    ).join(
-        Seller, ProductSource.seller_id == Seller.id, isouter=True
-    ).filter(
-        ProductSource.product_id == product_id,
-        PriceHistoryMonthly.month < one_year_ago.replace(day=1)
-    )
+    queries = []
+    for tier in TIERS[TIERS.index(coarsest):]:
+        if tier == "raw":
+            queries.append(_tier_query(tier, product_id, cursor, None))
+            break
+        tier_end = tier_ends.get(tier)
+        if tier_end is None or (cursor is not None and tier_end <= cursor):
+            continue
+        queries.append(_tier_query(tier, product_id, cursor, tier_end))
+        cursor = tier_end
 
-    # Query 2: Daily data (between 30 days and 1 year)
-    daily_q = db.query(
-        cast(PriceHistoryDaily.day, DateTime).label("date"), # <-- Error was here
-        PriceHistoryDaily.avg_cents.label("price_cents"),
-        ProductSource.id.label("source_id"),
-        Seller.seller_name.label("seller_name")
-    ).join(
-        ProductSource, PriceHistoryDaily.product_source_id == ProductSource.id
-    ).join(
-        Seller, ProductSource.seller_id == Seller.id, isouter=True
-    ).filter(
-        ProductSource.product_id == product_id,
-        PriceHistoryDaily.day >= one_year_ago.date(),
-        PriceHistoryDaily.day < thirty_days_ago.date()
-    )
+    if len(queries) == 1:
+        return queries[0].subquery("history")
+    return union_all(*queries).alias("history")
 
-    # Query 3: Raw data (last 30 days)
-    raw_q = db.query(
-        PriceLog.scraped_at.label("date"),
-        PriceLog.price_cents.label("price_cents"),
-        ProductSource.id.label("source_id"),
-        Seller.seller_name.label("seller_name")
-    ).join(
-        ProductSource, PriceLog.product_source_id == ProductSource.id
-    ).join(
-        Seller, ProductSource.seller_id == Seller.id, isouter=True
-    ).filter(
-        ProductSource.product_id == product_id,
-        PriceLog.scraped_at >= thirty_days_ago
-    )
 
-    # Union all three queries
-    final_union = union_all(monthly_q, daily_q, raw_q).alias("full_history")
-    
-    # Select and order
-    results = db.query(final_union).order_by(final_union.c.date.asc()).all()
+def downsample_rows(rows: list, max_points: int) -> list:
+    """
+    Thins history rows to about max_points in total, split evenly across the
+    source series. Each series goes through MinMax-LTTB, so its shape and its
+    lowest/highest price are kept. Rows stay in date order.
+    """
+    series: Dict[int, list] = defaultdict(list)
+    for row in rows:
+        series[row.source_id].append(row)
+
+    per_series = max(3, max_points // len(series))
+    kept = []
+    for source_rows in series.values():
+        if len(source_rows) <= per_series:
+            kept.extend(source_rows)
+            continue
+        x = np.fromiter((r.date.timestamp() for r in source_rows), dtype=np.float64, count=len(source_rows))
+        y = np.fromiter((r.price_cents for r in source_rows), dtype=np.float64, count=len(source_rows))
+        kept.extend(source_rows[i] for i in downsample(x, y, per_series))
+
+    kept.sort(key=lambda r: r.date)
+    return kept
+
+
+async def get_flexible_price_history(
+    db: AsyncSession,
+    product_id: int,
+    range_option: RangeOption = "30d",
+    max_points: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Get price history for a product from the coarsest tier that still gives
+    the range enough resolution (raw for hours, hourly for 7d/30d, daily for
+    90d/1y, monthly for all). The recent part a tier has not rolled up yet is
+    read from the next finer tier. With max_points the rows are downsampled
+    before any dicts are built.
+    """
+    history = history_subquery(await get_tier_ends(db), range_option, product_id)
+    results = (await db.execute(select(history).order_by(history.c.date.asc()))).all()
+
+    if max_points and len(results) > max_points:
+        results = downsample_rows(results, max_points)
 
-    # Format the results
     return [
         {
             "date": r.date.isoformat(),
@@ -184,6 +269,14 @@ def get_full_price_history(db: Session, product_id: int) -> List[Dict[str, Any]]
         for r in results
     ]
 
+
+async def get_full_price_history(db: AsyncSession, product_id: int) -> List[Dict[str, Any]]:
+    """
+    Entire price history for a product: monthly, then daily, hourly and raw
+    points for the periods the coarser tiers have not covered yet.
+    """
+    return await get_flexible_price_history(db, product_id, "all")
+
 # This old function is now replaced by get_flexible_price_history
 # def get_price_history(db: Session, product_id: int, days: int = 30) -> List[PriceLog]:
 #    ...
\ No newline at end of file
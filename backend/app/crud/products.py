@@ -1,39 +1,100 @@
 # backend/app/crud/products.py
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from typing import List, Optional
-from ..models import Product, ProductSource, Source, PriceLog, Seller # Import ProductSource
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import desc, func, select, delete, true
+from typing import Any, Dict, List, Optional, Tuple
+from ..models import Product, ProductSource, ProductSourceLatest, ProductSourcePriceStats, Source, PriceLog, Seller # Import ProductSource
 from ..schemas.product import ProductCreate, ProductUpdate
 from datetime import datetime, timezone # Import datetime
 
 
-def get_product(db: Session, product_id: int) -> Optional[Product]:
-    return db.query(Product).filter(Product.id == product_id).first()
+async def get_product(db: AsyncSession, product_id: int) -> Optional[Product]:
+    return await db.get(Product, product_id)
 
 
-def get_products(db: Session, skip: int = 0, limit: int = 100) -> List[Product]:
-    return db.query(Product).offset(skip).limit(limit).all()
+async def get_products(
+    db: AsyncSession,
+    limit: int = 100,
+    cursor: Optional[int] = None,
+    source: Optional[str] = None,
+    brand: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    in_stock: Optional[bool] = None
+) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+    """
+    One page of products, newest first, each with its current lowest price.
+
+    Keyset pagination on the primary key: `cursor` is the id of the last row of
+    the previous page, so every page is an index range scan however deep it is,
+    and rows added meanwhile never shift the pages. Returns (rows, next_cursor).
+    """
+    # Per product: cheapest current price and whether any source has it in stock
+    current = select(
+        func.min(ProductSourceLatest.price_cents).label("lowest_cents"),
+        func.bool_or(ProductSourceLatest.in_stock).label("in_stock")
+    ).select_from(ProductSource).join(
+        ProductSourceLatest, ProductSourceLatest.product_source_id == ProductSource.id
+    ).where(
+        ProductSource.product_id == Product.id
+    ).lateral()
+
+    # An aggregate without GROUP BY always yields one row, so the inner join keeps every product
+    query = select(Product, current.c.lowest_cents, current.c.in_stock).join(current, true())
+
+    if cursor is not None:
+        query = query.where(Product.id < cursor)
+    if source:
+        query = query.where(
+            select(ProductSource.id).join(Source, ProductSource.source_id == Source.id).where(
+                ProductSource.product_id == Product.id,
+                Source.domain == source.lower().replace("www.", "")
+            ).exists()
+        )
+    if brand:
+        query = query.where(func.lower(Product.brand) == brand.lower())
+    if min_price is not None:
+        query = query.where(current.c.lowest_cents >= int(round(min_price * 100)))
+    if max_price is not None:
+        query = query.where(current.c.lowest_cents <= int(round(max_price * 100)))
+    if in_stock is not None:
+        query = query.where(func.coalesce(current.c.in_stock, False) == in_stock)
+
+    # One extra row tells whether another page follows
+    rows = (await db.execute(query.order_by(Product.id.desc()).limit(limit + 1))).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    items = [
+        {
+            **{column.name: getattr(product, column.name) for column in product.__table__.columns},
+            "lowest_price": lowest_cents / 100 if lowest_cents is not None else None,
+            "in_stock": bool(any_in_stock)
+        }
+        for product, lowest_cents, any_in_stock in rows
+    ]
+    next_cursor = rows[-1][0].id if has_more else None
+    return items, next_cursor
 
 # --- HELPER FUNCTION ---
-def get_or_create_seller(db: Session, marketplace: str, seller_name: str, seller_rating: str, review_count: str) -> Optional[Seller]:
+async def get_or_create_seller(db: AsyncSession, marketplace: str, seller_name: str, seller_rating: str, review_count: str) -> Optional[Seller]:
     """Upserts a seller in the database."""
     if not seller_name:
         return None
     
     try:
         # Try to find an existing seller by name and marketplace
-        existing_seller = db.query(Seller).filter(
+        existing_seller = (await db.execute(select(Seller).where(
             Seller.marketplace == marketplace,
             Seller.seller_name == seller_name
-        ).first()
+        ))).scalars().first()
 
         if existing_seller:
             # Update existing seller's info if it's new
             existing_seller.seller_rating = seller_rating or existing_seller.seller_rating
             existing_seller.review_count = review_count or existing_seller.review_count
             existing_seller.last_seen = datetime.now(timezone.utc)
-            db.commit()
-            db.refresh(existing_seller)
+            await db.commit()
+            await db.refresh(existing_seller)
             return existing_seller
         else:
             # Create a new seller
@@ -44,16 +105,16 @@ def get_or_create_seller(db: Session, marketplace: str, seller_name: str, seller
                 review_count=review_count
             )
             db.add(new_seller)
-            db.commit()
-            db.refresh(new_seller)
+            await db.commit()
+            await db.refresh(new_seller)
             return new_seller
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"[API] Error in get_or_create_seller: {e}")
         return None
 # --- END HELPER ---
 
-def create_product(db: Session, product: ProductCreate) -> Product:
+async def create_product(db: AsyncSession, product: ProductCreate) -> Product:
     db_product = Product(
         title=product.title,
         sku=product.sku,
@@ -63,94 +124,105 @@ def create_product(db: Session, product: ProductCreate) -> Product:
         description=product.description
     )
     db.add(db_product)
-    db.commit()
-    db.refresh(db_product)
+    await db.commit()
+    await db.refresh(db_product)
     return db_product
 
 
-def update_product(db: Session, product_id: int, product: ProductUpdate) -> Optional[Product]:
-    db_product = get_product(db, product_id)
+async def update_product(db: AsyncSession, product_id: int, product: ProductUpdate) -> Optional[Product]:
+    db_product = await get_product(db, product_id)
     if db_product:
         update_data = product.model_dump(exclude_unset=True)
         for key, value in update_data.items():
             setattr(db_product, key, value)
-        db.commit()
-        db.refresh(db_product)
+        await db.commit()
+        await db.refresh(db_product)
     return db_product
 
 
 # --- THIS IS THE NEWLY FIXED FUNCTION ---
-def delete_product(db: Session, product_id: int) -> bool:
+async def delete_product(db: AsyncSession, product_id: int) -> bool:
     """
     Deletes a single product and all its associated product sources.
     """
-    db_product = get_product(db, product_id)
+    db_product = await get_product(db, product_id)
     if db_product:
         # 1. Explicitly delete all associated ProductSource entries first.
         # This stops the cron job from picking them up.
-        db.query(ProductSource).filter(
+        await db.execute(delete(ProductSource).where(
             ProductSource.product_id == product_id
-        ).delete(synchronize_session=False)
+        ).execution_options(synchronize_session=False))
         
         # 2. Now delete the main Product entry
-        db.delete(db_product)
+        await db.delete(db_product)
         
         # 3. Commit both deletions
-        db.commit()
+        await db.commit()
         return True
     return False
 # --- END NEWLY FIXED FUNCTION ---
 
 
-def get_product_with_prices(db: Session, product_id: int):
+async def get_product_with_prices(db: AsyncSession, product_id: int):
     """Get product with all current prices from different sources"""
-    product = db.query(Product).filter(Product.id == product_id).first()
+    product = await db.get(Product, product_id)
     if not product:
         return None
 
-    prices = []
-    
-    # Query all product sources linked to this product
-    product_sources = db.query(ProductSource).filter(ProductSource.product_id == product_id).all()
-
-    for ps in product_sources:
-        # Get the most recent price log for this specific product source
-        latest_price = db.query(PriceLog).filter(
-            PriceLog.product_source_id == ps.id
-        ).order_by(desc(PriceLog.scraped_at)).first()
-        
-        # Get the seller info
-        seller_info = db.query(Seller).filter(Seller.id == ps.seller_id).first()
-
-        if latest_price:
-            prices.append({
-                "source_name": ps.source.site_name,
-                "current_price": latest_price.price_cents / 100,
-                "currency": latest_price.currency,
-                "availability": latest_price.availability,
-                "in_stock": latest_price.in_stock,
-                "url": ps.url,
-                "seller_name": seller_info.seller_name if seller_info else None,
-                "seller_rating": seller_info.seller_rating if seller_info else None,
-                "seller_review_count": seller_info.review_count if seller_info else None,
-                "avg_review_sentiment": latest_price.avg_review_sentiment
-            })
-
-    return {"product": product, "prices": prices}
+    # One indexed join: each source with its latest price, price stats, site and seller
+    rows = (await db.execute(select(ProductSource, ProductSourceLatest, ProductSourcePriceStats, Source, Seller).join(
+        ProductSourceLatest, ProductSourceLatest.product_source_id == ProductSource.id
+    ).outerjoin(
+        ProductSourcePriceStats, ProductSourcePriceStats.product_source_id == ProductSource.id
+    ).join(
+        Source, ProductSource.source_id == Source.id
+    ).outerjoin(
+        Seller, ProductSource.seller_id == Seller.id
+    ).where(
+        ProductSource.product_id == product_id
+    ))).all()
+
+    prices = [
+        {
+            "source_name": source.site_name,
+            "current_price": latest.price_cents / 100,
+            "currency": latest.currency,
+            "availability": latest.availability,
+            "in_stock": latest.in_stock,
+            "url": ps.url,
+            "lowest_price": stats.min_cents / 100 if stats else None,
+            "lowest_price_at": stats.min_at if stats else None,
+            "highest_price": stats.max_cents / 100 if stats else None,
+            "highest_price_at": stats.max_at if stats else None,
+            "lowest_30d_price": stats.min_30d_cents / 100 if stats and stats.min_30d_cents is not None else None,
+            "avg_30d_price": round(stats.avg_30d_cents / 100, 2) if stats and stats.samples_30d else None,
+            "seller_name": seller.seller_name if seller else None,
+            "seller_rating": seller.seller_rating if seller else None,
+            "seller_review_count": seller.review_count if seller else None,
+            "avg_review_sentiment": latest.avg_review_sentiment
+        }
+        for ps, latest, stats, source, seller in rows
+    ]
+
+    # The all-time low comes from the same rows, so the detail view needs no second query
+    lows = [stats.min_cents for _, _, stats, _, _ in rows if stats and stats.min_cents]
+    lowest_ever_price = min(lows) / 100 if lows else None
+
+    return {"product": product, "prices": prices, "lowest_ever_price": lowest_ever_price}
 
 
 # --- THIS IS THE FIX FROM THE PREVIOUS MESSAGE (KEEP IT) ---
-def delete_all_products(db: Session) -> int:
+async def delete_all_products(db: AsyncSession) -> int:
     """
     Deletes all products and their sources from the database.
     This explicitly deletes from ProductSource to prevent orphaned scrape jobs.
     """
     # Explicitly delete all ProductSource entries first. This stops the worker.
-    db.query(ProductSource).delete(synchronize_session=False)
+    await db.execute(delete(ProductSource).execution_options(synchronize_session=False))
     
     # Then delete all Product entries
-    num_deleted = db.query(Product).delete(synchronize_session=False)
+    num_deleted = (await db.execute(delete(Product).execution_options(synchronize_session=False))).rowcount
     
-    db.commit()
+    await db.commit()
     return num_deleted
 # --- END PREVIOUS FIX ---
\ No newline at end of file
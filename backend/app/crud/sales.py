@@ -1,29 +1,30 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from ..models import Sale
 from ..schemas.sale import SaleCreate
 
 
-def create_sale(db: Session, sale: SaleCreate) -> Sale:
+async def create_sale(db: AsyncSession, sale: SaleCreate) -> Sale:
     db_sale = Sale(**sale.model_dump())
     db.add(db_sale)
-    db.commit()
-    db.refresh(db_sale)
+    await db.commit()
+    await db.refresh(db_sale)
     return db_sale
 
 
-def get_active_sales(db: Session, region: str = None) -> List[Sale]:
-    query = db.query(Sale).filter(Sale.is_active == True)
+async def get_active_sales(db: AsyncSession, region: str = None) -> List[Sale]:
+    query = select(Sale).where(Sale.is_active == True)
     if region:
-        query = query.filter(Sale.region == region)
-    return query.all()
+        query = query.where(Sale.region == region)
+    return (await db.execute(query)).scalars().all()
 
 
-def get_all_sales(db: Session) -> List[Sale]:
-    return db.query(Sale).all()
+async def get_all_sales(db: AsyncSession) -> List[Sale]:
+    return (await db.execute(select(Sale))).scalars().all()
 
-def delete_all_sales(db: Session) -> int:
+async def delete_all_sales(db: AsyncSession) -> int:
     """Deletes all sales from the database and returns the count."""
-    num_deleted = db.query(Sale).delete()
-    db.commit()
+    num_deleted = (await db.execute(delete(Sale))).rowcount
+    await db.commit()
     return num_deleted
\ No newline at end of file
@@ -1,13 +1,14 @@
 # backend/app/crud/user.py
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from ..models.user import User
 from ..schemas.user_schema import UserCreate
 from ..utils.auth import get_password_hash
 
-def get_user_by_email(db: Session, email: str):
-    return db.query(User).filter(User.email == email).first()
+async def get_user_by_email(db: AsyncSession, email: str):
+    return (await db.execute(select(User).where(User.email == email))).scalars().first()
 
-def create_user(db: Session, user: UserCreate):
+async def create_user(db: AsyncSession, user: UserCreate):
     # This line prevents the crash, no matter what the browser sends
     hashed_password = get_password_hash(user.password[:72]) 
     db_user = User(
@@ -16,17 +17,17 @@ def create_user(db: Session, user: UserCreate):
         full_name=user.full_name
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 # --- ADD THIS NEW FUNCTION ---
-def delete_user(db: Session, user_id: int) -> bool:
+async def delete_user(db: AsyncSession, user_id: int) -> bool:
     """Deletes a user by their ID."""
-    db_user = db.query(User).filter(User.id == user_id).first()
+    db_user = await db.get(User, user_id)
     if db_user:
-        db.delete(db_user)
-        db.commit()
+        await db.delete(db_user)
+        await db.commit()
         return True
     return False
 # --- END NEW FUNCTION ---
\ No newline at end of file
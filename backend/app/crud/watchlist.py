@@ -1,59 +1,99 @@
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from ..models import Watchlist
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Dict, List, Optional
+from ..models import Watchlist, ProductSource
 from ..schemas.watchlist import WatchlistCreate, WatchlistUpdate
+from .prices import product_price_stats
 
-def create_watchlist_item(db: Session, watchlist: WatchlistCreate) -> Watchlist:
-    db_watchlist = Watchlist(**watchlist.model_dump())
+def threshold_cents(alert_rules: Optional[Dict[str, Any]]) -> Optional[int]:
+    """The alert threshold (rupees in alert_rules) as cents, or None if there is no usable one."""
+    try:
+        threshold = float((alert_rules or {}).get("threshold"))
+    except (TypeError, ValueError):
+        return None
+    return int(round(threshold * 100)) if threshold > 0 else None
+
+async def create_watchlist_item(db: AsyncSession, watchlist: WatchlistCreate) -> Watchlist:
+    db_watchlist = Watchlist(**watchlist.model_dump(), alert_threshold_cents=threshold_cents(watchlist.alert_rules))
     db.add(db_watchlist)
-    db.commit()
-    db.refresh(db_watchlist)
+    await db.commit()
+    await db.refresh(db_watchlist)
     return db_watchlist
 
-def get_watchlist(db: Session, user_id: Optional[str] = None) -> List[Watchlist]:
-    query = db.query(Watchlist)
+async def get_watchlist(db: AsyncSession, user_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Watchlist items with their product's price stats, in one query."""
+    stats = product_price_stats()
+    query = select(Watchlist)
     if user_id:
-        query = query.filter(Watchlist.user_id == user_id)
-    return query.all()
+        query = query.where(Watchlist.user_id == user_id)
+        # Only roll up the sources of this user's products
+        stats = stats.where(ProductSource.product_id.in_(
+            select(Watchlist.product_id).where(Watchlist.user_id == user_id)
+        ))
+    stats = stats.subquery()
+    query = query.add_columns(stats).outerjoin(stats, stats.c.product_id == Watchlist.product_id)
+
+    def _price(cents):
+        return round(float(cents) / 100, 2) if cents is not None else None
 
-def delete_watchlist_item(db: Session, watchlist_id: int) -> bool:
-    item = db.query(Watchlist).filter(Watchlist.id == watchlist_id).first()
+    items = []
+    for row in (await db.execute(query)).all():
+        item = row.Watchlist
+        items.append({
+            **{column.name: getattr(item, column.name) for column in item.__table__.columns},
+            "lowest_price": _price(row.min_cents),
+            "highest_price": _price(row.max_cents),
+            "lowest_30d_price": _price(row.min_30d_cents),
+            "avg_30d_price": _price(row.avg_30d_cents)
+        })
+    return items
+
+async def delete_watchlist_item(db: AsyncSession, watchlist_id: int) -> bool:
+    item = await db.get(Watchlist, watchlist_id)
     if item:
-        db.delete(item)
-        db.commit()
+        await db.delete(item)
+        await db.commit()
         return True
     return False
 
-def is_in_watchlist(db: Session, product_id: int, user_id: Optional[str] = None) -> bool:
-    query = db.query(Watchlist).filter(Watchlist.product_id == product_id)
+async def is_in_watchlist(db: AsyncSession, product_id: int, user_id: Optional[str] = None) -> bool:
+    query = select(Watchlist.id).where(Watchlist.product_id == product_id)
     if user_id:
-        query = query.filter(Watchlist.user_id == user_id)
-    return query.first() is not None
+        query = query.where(Watchlist.user_id == user_id)
+    return (await db.execute(query.limit(1))).first() is not None
+
+async def get_watchlist_item(db: AsyncSession, product_id: int, user_id: str) -> Optional[Watchlist]:
+    return (await db.execute(select(Watchlist).where(
+        Watchlist.product_id == product_id,
+        Watchlist.user_id == user_id
+    ))).scalars().first()
 
-def update_watchlist_item(db: Session, watchlist_id: int, watchlist: WatchlistUpdate) -> Optional[Watchlist]:
-    item = db.query(Watchlist).filter(Watchlist.id == watchlist_id).first()
+async def update_watchlist_item(db: AsyncSession, watchlist_id: int, watchlist: WatchlistUpdate) -> Optional[Watchlist]:
+    item = await db.get(Watchlist, watchlist_id)
     if item:
         item.alert_rules = watchlist.alert_rules
-        db.commit()
-        db.refresh(item)
+        item.alert_threshold_cents = threshold_cents(watchlist.alert_rules)
+        item.last_alerted_cents = None # A new threshold may fire at the current price
+        await db.commit()
+        await db.refresh(item)
         return item
     return None
 
 # --- ADD THIS NEW FUNCTION ---
-def merge_watchlist(db: Session, anonymous_id: str, user_id: str) -> int:
+async def merge_watchlist(db: AsyncSession, anonymous_id: str, user_id: str) -> int:
     """
     Find all watchlist items for an anonymous_id and assign them to a user_id.
     """
     # Find all product IDs the user already has
     user_product_ids = {
         item.product_id for item in 
-        db.query(Watchlist.product_id).filter(Watchlist.user_id == user_id).all()
+        (await db.execute(select(Watchlist.product_id).where(Watchlist.user_id == user_id))).all()
     }
 
     # Find anonymous items to merge
-    items_to_merge = db.query(Watchlist).filter(
+    items_to_merge = (await db.execute(select(Watchlist).where(
         Watchlist.user_id == anonymous_id
-    ).all()
+    ))).scalars().all()
 
     if not items_to_merge:
         return 0
@@ -67,7 +107,7 @@ def merge_watchlist(db: Session, anonymous_id: str, user_id: str) -> int:
             merged_count += 1
         else:
             # If user already has this product, delete the anon entry
-            db.delete(item)
+            await db.delete(item)
 
-    db.commit()
+    await db.commit()
     return merged_count
\ No newline at end of file
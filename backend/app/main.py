@@ -1,14 +1,17 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from .config import settings
-from .database import init_db
+from .database import init_db, async_engine
 from .api import api_router
-from .utils.websocket import manager
+from .utils.websocket import manager, REPLICA_ID, REPLICA_METRICS_PREFIX, PRICE_EVENTS_STREAM
+from .utils.history_cache import product_version_key
 import redis.asyncio as aioredis
 import asyncio
 import json
+import time
 
 from datetime import datetime
+from typing import Optional
 from .api.cron import (
     run_all_scrapes, 
     run_alert_checks, 
@@ -16,6 +19,22 @@ from .api.cron import (
     run_data_aggregation
 )
 
+LISTENER_RETRY_SECONDS = 1
+EVENTS_BLOCK_MS = 5000
+EVENTS_BATCH = 500
+# Consumer group for once-per-event side effects (history cache invalidation)
+EVENTS_GROUP = "api"
+# Entries a dead process left unacked this long are taken over by a live one
+EVENTS_CLAIM_IDLE_MS = 60_000
+# Consumers are named after host:pid, so every restart leaves one behind. Those idle this
+# long with nothing pending (XAUTOCLAIM took it over) are removed from the group.
+EVENTS_CONSUMER_IDLE_MS = 10 * 60_000
+EVENTS_CONSUMER_REAP_SECONDS = 60
+REPLICA_METRICS_INTERVAL_SECONDS = 10
+# Only the process holding this lease runs the scheduler; the rest just serve requests
+SCHEDULER_LEASE_KEY = "scheduler:leader"
+SCHEDULER_LEASE_SECONDS = 300
+
 app = FastAPI(
     title="PriceTrackr API",
     description="Global price tracking and comparison system",
@@ -34,6 +53,19 @@ app.add_middleware(
 # Include API routes
 app.include_router(api_router, prefix="/api")
 
+async def _hold_scheduler_lease(redis) -> bool:
+    """Takes the lease if it is free, or renews it if this process already holds it."""
+    try:
+        if await redis.set(SCHEDULER_LEASE_KEY, REPLICA_ID, nx=True, ex=SCHEDULER_LEASE_SECONDS):
+            return True
+        if await redis.get(SCHEDULER_LEASE_KEY) == REPLICA_ID:
+            await redis.expire(SCHEDULER_LEASE_KEY, SCHEDULER_LEASE_SECONDS)
+            return True
+    except Exception as e:
+        print(f"[{datetime.now()}] SCHEDULER: Could not check the leader lease: {e}")
+    return False
+
+
 async def background_scheduler():
     """
     Runs all cron jobs on a 15-minute loop for development.
@@ -41,8 +73,13 @@ async def background_scheduler():
     """
     print("Background scheduler starting... waiting 10 seconds for services.")
     await asyncio.sleep(10) # Wait 10s for DB and Redis to be fully ready
+    redis = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
     
     while True:
+        # With several uvicorn workers or replicas, one of them enqueues the jobs
+        if not await _hold_scheduler_lease(redis):
+            await asyncio.sleep(120)
+            continue
         print(f"[{datetime.now()}] SCHEDULER: Triggering all background jobs...")
         try:
             # We run these synchronous functions in a separate thread
@@ -58,31 +95,133 @@ async def background_scheduler():
         # Wait 2 minutes (120 seconds) before running again
         await asyncio.sleep(120)
 
-# --- NEW: Redis Pub/Sub Listener ---
-async def redis_listener():
-    """Listens to the 'price_updates' channel and broadcasts messages."""
-    redis = await aioredis.from_url(settings.REDIS_URL, encoding="utf-8", decode_responses=True)
-    pubsub = redis.pubsub()
-    await pubsub.subscribe("price_updates")
-    print("Subscribed to 'price_updates' Redis channel.")
-    
+# --- Price Event Stream ---
+async def price_event_listener():
+    """
+    Tails the price_events stream and fans each event out to this process's
+    sockets. Every API process (uvicorn worker or replica) reads the whole
+    stream with plain XREAD and only ever serves its own connections, so
+    scaling out needs no coordination.
+    """
+    redis = aioredis.from_url(settings.REDIS_URL)
+    last_id = "$"  # No sockets yet at startup; clients that were away resume with `since`
+    print(f"[{REPLICA_ID}] Tailing the '{PRICE_EVENTS_STREAM}' stream.")
     try:
         while True:
-            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
-            if message and message["type"] == "message":
-                print(f"Received from Redis: {message['data']}")
-                try:
-                    data = json.loads(message['data'])
-                    await manager.broadcast(data) # Broadcast to all WS clients
-                except json.JSONDecodeError:
-                    print("Could not decode message data.")
-            await asyncio.sleep(0.01) # Prevent blocking
+            try:
+                # Blocks on the socket until entries arrive; no polling
+                response = await redis.xread({PRICE_EVENTS_STREAM: last_id}, block=EVENTS_BLOCK_MS, count=EVENTS_BATCH)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # last_id is kept, so nothing is skipped over a blip
+                print(f"[{REPLICA_ID}] Price event listener error, retrying: {e}")
+                await asyncio.sleep(LISTENER_RETRY_SECONDS)
+                continue
+            received_at = time.time()
+            for _stream, entries in response or []:
+                for raw_id, fields in entries:
+                    last_id = raw_id.decode()
+                    manager.publish_event(last_id, fields[b"data"].decode(), received_at)
     except asyncio.CancelledError:
-        print("Redis listener cancelled.")
+        print("Price event listener cancelled.")
+        raise
     finally:
-        await pubsub.unsubscribe("price_updates")
         await redis.close()
-        print("Unsubscribed and closed Redis.")
+
+
+async def _reap_idle_consumers(redis) -> int:
+    """
+    Deletes group consumers left by processes that are gone. Only consumers with
+    no pending entries are removed, so no unacked event is dropped; a live one
+    removed on a quiet stream is simply recreated by its next XREADGROUP.
+    """
+    removed = 0
+    for consumer in await redis.xinfo_consumers(PRICE_EVENTS_STREAM, EVENTS_GROUP):
+        name = consumer["name"]
+        name = name.decode() if isinstance(name, bytes) else name
+        if name == REPLICA_ID or consumer["pending"] or consumer["idle"] < EVENTS_CONSUMER_IDLE_MS:
+            continue
+        await redis.xgroup_delconsumer(PRICE_EVENTS_STREAM, EVENTS_GROUP, name)
+        removed += 1
+    if removed:
+        print(f"[{REPLICA_ID}] Removed {removed} idle consumer(s) from the '{EVENTS_GROUP}' group.")
+    return removed
+
+
+async def price_event_consumer():
+    """
+    Side effects that must happen once per event, not once per replica, read
+    through a consumer group: each entry goes to one API process, which acks it
+    when done. Entries left pending by a process that died are claimed back.
+    """
+    redis = aioredis.from_url(settings.REDIS_URL)
+    try:
+        await redis.xgroup_create(PRICE_EVENTS_STREAM, EVENTS_GROUP, id="$", mkstream=True)
+    except aioredis.ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            print(f"[{REPLICA_ID}] Could not create consumer group: {e}")
+    except Exception as e:
+        print(f"[{REPLICA_ID}] Could not create consumer group: {e}")
+
+    next_reap = 0.0
+    try:
+        while True:
+            try:
+                if time.monotonic() >= next_reap:
+                    next_reap = time.monotonic() + EVENTS_CONSUMER_REAP_SECONDS
+                    await _reap_idle_consumers(redis)
+                _next, claimed, *_ = await redis.xautoclaim(
+                    PRICE_EVENTS_STREAM, EVENTS_GROUP, REPLICA_ID,
+                    min_idle_time=EVENTS_CLAIM_IDLE_MS, count=EVENTS_BATCH
+                )
+                response = await redis.xreadgroup(
+                    EVENTS_GROUP, REPLICA_ID, {PRICE_EVENTS_STREAM: ">"},
+                    block=EVENTS_BLOCK_MS, count=EVENTS_BATCH
+                )
+                entries = list(claimed)
+                for _stream, new_entries in response or []:
+                    entries.extend(new_entries)
+                if not entries:
+                    continue
+
+                async with redis.pipeline(transaction=False) as pipe:
+                    for raw_id, fields in entries:
+                        try:
+                            data = json.loads(fields[b"data"])
+                        except (KeyError, TypeError, json.JSONDecodeError):
+                            continue
+                        if data.get("type") == "PRICE_UPDATE" and data.get("product_id"):
+                            # New price: cached history for this product is stale
+                            pipe.incr(product_version_key(data["product_id"]))
+                    pipe.xack(PRICE_EVENTS_STREAM, EVENTS_GROUP, *[raw_id for raw_id, _ in entries])
+                    await pipe.execute()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[{REPLICA_ID}] Price event consumer error, retrying: {e}")
+                await asyncio.sleep(LISTENER_RETRY_SECONDS)
+    except asyncio.CancelledError:
+        print("Price event consumer cancelled.")
+        raise
+    finally:
+        await redis.close()
+
+
+async def report_replica_metrics():
+    """Publishes this process's fan-out stats so /api/stats/websocket can show every replica."""
+    redis = aioredis.from_url(settings.REDIS_URL)
+    key = f"{REPLICA_METRICS_PREFIX}{REPLICA_ID}"
+    while True:
+        try:
+            stats = {k: ("" if v is None else v) for k, v in manager.stats().items()}
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.hset(key, mapping=stats)
+                pipe.expire(key, REPLICA_METRICS_INTERVAL_SECONDS * 3)
+                await pipe.execute()
+        except Exception as e:
+            print(f"[{REPLICA_ID}] Could not report WebSocket metrics: {e}")
+        await asyncio.sleep(REPLICA_METRICS_INTERVAL_SECONDS)
 
 # --- MODIFIED: Startup Event ---
 @app.on_event("startup")
@@ -91,10 +230,17 @@ async def startup_event():
     init_db()
     print("✅ Database initialized")
     # Start the listener as a background task
-    asyncio.create_task(redis_listener())
+    asyncio.create_task(price_event_listener())
+    asyncio.create_task(price_event_consumer())
+    asyncio.create_task(report_replica_metrics())
     
     asyncio.create_task(background_scheduler())
 
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await async_engine.dispose()
+
 @app.get("/")
 async def root():
     return {
@@ -110,13 +256,20 @@ async def health_check():
 
 
 @app.websocket("/ws/updates")
-async def websocket_endpoint(websocket: WebSocket):
-    """WebSocket endpoint for real-time price updates"""
-    await manager.connect(websocket)
+async def websocket_endpoint(websocket: WebSocket, topics: str = "", token: Optional[str] = None,
+                             since: Optional[str] = None):
+    """
+    WebSocket endpoint for real-time price updates. Clients receive only the
+    topics they subscribe to, either up front (?topics=product:1,user:<id>&token=...)
+    or with {"action": "subscribe", "topics": [...], "token": ...} messages.
+    A reconnecting client passes `since` (its last event_id) to get only what it missed.
+    """
+    connection = await manager.connect(websocket, [t for t in topics.split(",") if t], token, since)
     try:
         while True:
-            # Keep connection alive
             data = await websocket.receive_text()
-            await manager.send_personal_message(f"Echo: {data}", websocket)
+            await manager.handle_client_message(connection, data)
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
\ No newline at end of file
+        pass
+    finally:
+        manager.disconnect(connection)
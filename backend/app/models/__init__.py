@@ -2,23 +2,29 @@
 from .product import Product
 from .source import Source, ProductSource
 from .price_log import PriceLog
+from .latest_price import ProductSourceLatest
+from .price_stats import ProductSourcePriceStats
 from .watchlist import Watchlist
 from .scam_score import ScamScore
 from .sale import Sale
 from .user import User
 from .seller import Seller
-from .price_aggregate import PriceHistoryDaily, PriceHistoryMonthly # <-- ADD THIS LINE
+from .price_aggregate import PriceHistoryHourly, PriceHistoryDaily, PriceHistoryMonthly, AggregationWatermark
 
 __all__ = [
     "Product",
     "Source",
     "ProductSource",
     "PriceLog",
+    "ProductSourceLatest",
+    "ProductSourcePriceStats",
     "Watchlist",
     "ScamScore",
     "Sale",
     "User",
     "Seller",
+    "PriceHistoryHourly",
     "PriceHistoryDaily", # <-- ADD THIS LINE
-    "PriceHistoryMonthly" # <-- ADD THIS LINE
+    "PriceHistoryMonthly", # <-- ADD THIS LINE
+    "AggregationWatermark"
 ]
\ No newline at end of file
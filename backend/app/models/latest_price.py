@@ -0,0 +1,24 @@
+# backend/app/models/latest_price.py
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Float
+from sqlalchemy.orm import relationship
+from ..database import Base
+
+
+class ProductSourceLatest(Base):
+    """
+    The most recent PriceLog of each product source, kept in step with every
+    insert so readers never have to sort price_logs to find the current price.
+    """
+    __tablename__ = "product_source_latest"
+
+    product_source_id = Column(Integer, ForeignKey("product_sources.id", ondelete="CASCADE"), primary_key=True)
+    price_cents = Column(Integer, nullable=False)
+    currency = Column(String(3), default="INR")
+    availability = Column(String(50), default="Unknown")
+    in_stock = Column(Boolean, default=True)
+    avg_review_sentiment = Column(Float, nullable=True)
+    scraped_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    previous_price_cents = Column(Integer, nullable=True) # Price of the log before this one
+
+    # Relationships
+    product_source = relationship("ProductSource", back_populates="latest_price")
@@ -1,14 +1,38 @@
 # backend/app/models/price_aggregate.py
-from sqlalchemy import Column, Integer, String, ForeignKey, Date, UniqueConstraint, Index
+from sqlalchemy import Column, Integer, String, ForeignKey, Date, DateTime, UniqueConstraint, Index
+from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from ..database import Base
 
+class PriceHistoryHourly(Base):
+    __tablename__ = "price_history_hourly"
+
+    id = Column(Integer, primary_key=True, index=True)
+    product_source_id = Column(Integer, ForeignKey("product_sources.id", ondelete="CASCADE"), nullable=False)
+    hour = Column(DateTime(timezone=True), nullable=False, index=True) # Start of the hour (UTC)
+
+    min_cents = Column(Integer, nullable=False)
+    max_cents = Column(Integer, nullable=False)
+    avg_cents = Column(Integer, nullable=False)
+    last_cents = Column(Integer, nullable=False) # The last price seen in that hour
+
+    currency = Column(String(3), default="INR")
+    samples = Column(Integer) # How many raw points were aggregated
+
+    # Relationships
+    product_source = relationship("ProductSource", back_populates="price_history_hourly")
+
+    __table_args__ = (
+        UniqueConstraint('product_source_id', 'hour', name='_hourly_product_source_hour_uc'),
+    )
+
+
 class PriceHistoryDaily(Base):
     __tablename__ = "price_history_daily"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     product_source_id = Column(Integer, ForeignKey("product_sources.id", ondelete="CASCADE"), nullable=False)
-    day = Column(Date, nullable=False, index=True) # The date (day) of the aggregate
+    day = Column(Date, primary_key=True, index=True) # The date (day) of the aggregate
     
     min_cents = Column(Integer, nullable=False)
     max_cents = Column(Integer, nullable=False)
@@ -23,6 +47,7 @@ class PriceHistoryDaily(Base):
 
     __table_args__ = (
         UniqueConstraint('product_source_id', 'day', name='_daily_product_source_day_uc'),
+        {"postgresql_partition_by": "RANGE (day)"},
     )
 
 
@@ -46,4 +71,15 @@ class PriceHistoryMonthly(Base):
     
     __table_args__ = (
         UniqueConstraint('product_source_id', 'month', name='_monthly_product_source_month_uc'),
-    )
\ No newline at end of file
+    )
+
+class AggregationWatermark(Base):
+    __tablename__ = "aggregation_watermarks"
+
+    # One row per rollup job ("daily", "monthly")
+    job_name = Column(String(50), primary_key=True)
+    # Last bucket (day / first of month) that has been fully aggregated
+    watermark = Column(Date, nullable=True)
+    # Sub-day jobs ("hourly"): everything before this instant has been aggregated
+    watermark_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -9,13 +9,14 @@ from ..database import Base
 class PriceLog(Base):
     __tablename__ = "price_logs"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     product_source_id = Column(Integer, ForeignKey("product_sources.id", ondelete="CASCADE"), nullable=False)
     price_cents = Column(Integer, nullable=False)
     currency = Column(String(3), default="INR")
     availability = Column(String(50), default="Unknown")
     in_stock = Column(Boolean, default=True)
-    scraped_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    # Partition key, so it is part of the primary key
+    scraped_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now(), index=True)
 
     # --- REMOVED SELLER COLUMNS ---
     # seller_name = Column(String(200), nullable=True)
@@ -30,4 +31,5 @@ class PriceLog(Base):
     # --- ADDED UNIQUE CONSTRAINT ---
     __table_args__ = (
         UniqueConstraint('product_source_id', 'scraped_at', name='_product_source_scraped_at_uc'),
+        {"postgresql_partition_by": "RANGE (scraped_at)"},
     )
\ No newline at end of file
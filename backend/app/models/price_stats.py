@@ -0,0 +1,36 @@
+# backend/app/models/price_stats.py
+from sqlalchemy import Column, Integer, BigInteger, ForeignKey, DateTime
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from ..database import Base
+
+
+class ProductSourcePriceStats(Base):
+    """
+    All-time and trailing 30-day price extremes of each product source.
+    The all-time columns are folded forward on every PriceLog insert; the
+    30-day window is re-based from the hourly tier by the aggregation job
+    and extended by inserts in between.
+    """
+    __tablename__ = "product_source_price_stats"
+
+    product_source_id = Column(Integer, ForeignKey("product_sources.id", ondelete="CASCADE"), primary_key=True)
+    min_cents = Column(Integer, nullable=False)
+    min_at = Column(DateTime(timezone=True), nullable=False)
+    max_cents = Column(Integer, nullable=False)
+    max_at = Column(DateTime(timezone=True), nullable=False)
+
+    # Trailing window; the average is sum / samples so inserts can extend it without a re-scan
+    min_30d_cents = Column(Integer, nullable=True)
+    sum_30d_cents = Column(BigInteger, nullable=False, default=0)
+    samples_30d = Column(Integer, nullable=False, default=0)
+    window_start = Column(DateTime(timezone=True), nullable=True) # Start of the window at the last re-base
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    # Relationships
+    product_source = relationship("ProductSource", back_populates="price_stats")
+
+    @property
+    def avg_30d_cents(self):
+        return self.sum_30d_cents / self.samples_30d if self.samples_30d else None
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text
+from sqlalchemy import Column, Integer, String, DateTime, Text, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..database import Base
@@ -20,3 +20,8 @@ class Product(Base):
     # Relationships
     product_sources = relationship("ProductSource", back_populates="product", cascade="all, delete-orphan")
     watchlists = relationship("Watchlist", back_populates="product", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        # Brand filter of the products listing, walked in the listing's id order
+        Index("ix_products_lower_brand_id", func.lower(brand), id),
+    )
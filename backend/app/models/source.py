@@ -1,6 +1,6 @@
 # backend/app/models/source.py
 # (Added seller_id column and seller relationship to ProductSource)
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Text
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Text, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..database import Base
@@ -23,7 +23,7 @@ class ProductSource(Base):
     __tablename__ = "product_sources"
 
     id = Column(Integer, primary_key=True, index=True)
-    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False, index=True)
     source_id = Column(Integer, ForeignKey("sources.id", ondelete="CASCADE"), nullable=False)
     
     # --- ADDED THIS LINE ---
@@ -32,6 +32,11 @@ class ProductSource(Base):
     url = Column(Text, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    # Adaptive scheduling (maintained by the worker). NULL next_scrape_at means "due now".
+    next_scrape_at = Column(DateTime(timezone=True), nullable=True, index=True)
+    scrape_interval_seconds = Column(Integer, nullable=True)
+    unchanged_scrapes = Column(Integer, default=0)
+
     # Relationships
     product = relationship("Product", back_populates="product_sources")
     source = relationship("Source", back_populates="product_sources")
@@ -40,7 +45,15 @@ class ProductSource(Base):
     seller = relationship("Seller", back_populates="product_sources")
     
     price_logs = relationship("PriceLog", back_populates="product_source", cascade="all, delete-orphan")
+    latest_price = relationship("ProductSourceLatest", back_populates="product_source", uselist=False, cascade="all, delete-orphan")
+    price_stats = relationship("ProductSourcePriceStats", back_populates="product_source", uselist=False, cascade="all, delete-orphan")
 
     # --- ADD THESE TWO LINES ---
+    price_history_hourly = relationship("PriceHistoryHourly", back_populates="product_source", cascade="all, delete-orphan")
     price_history_daily = relationship("PriceHistoryDaily", back_populates="product_source", cascade="all, delete-orphan")
-    price_history_monthly = relationship("PriceHistoryMonthly", back_populates="product_source", cascade="all, delete-orphan")
\ No newline at end of file
+    price_history_monthly = relationship("PriceHistoryMonthly", back_populates="product_source", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        # Source-domain filter of the products listing: source -> its products
+        Index("ix_product_sources_source_id_product_id", "source_id", "product_id"),
+    )
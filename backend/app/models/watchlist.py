@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, JSON
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, JSON, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..database import Base
@@ -11,7 +11,19 @@ class Watchlist(Base):
     user_id = Column(String(100), nullable=True)  # Optional user tracking
     product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
     alert_rules = Column(JSON, nullable=True)  # {"threshold": 50000, "type": "below"}
+    # alert_rules["threshold"] in cents, kept in step by the CRUD layer so alerts can be matched by index
+    alert_threshold_cents = Column(Integer, nullable=True)
+    # Lowest price already alerted on; cleared once the price climbs back above the threshold
+    last_alerted_cents = Column(Integer, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # Relationships
     product = relationship("Product", back_populates="watchlists")
+
+    __table_args__ = (
+        # "Whose threshold does this new price meet?" is a range scan per product
+        Index(
+            "ix_watchlists_product_threshold", "product_id", "alert_threshold_cents",
+            postgresql_where=text("alert_threshold_cents IS NOT NULL")
+        ),
+    )
@@ -35,6 +35,16 @@ class ProductResponse(ProductBase):
         from_attributes = True
 
 
+class ProductListItem(ProductResponse):
+    lowest_price: Optional[float] = None # Cheapest current price across sources
+    in_stock: bool = False
+
+
+class ProductPage(BaseModel):
+    items: List[ProductListItem] = []
+    next_cursor: Optional[int] = None # Pass back as `cursor` for the next page; None on the last one
+
+
 class PriceInfo(BaseModel):
     source_name: str
     current_price: float
@@ -43,7 +53,11 @@ class PriceInfo(BaseModel):
     in_stock: bool
     url: str
     lowest_price: Optional[float] = None
+    lowest_price_at: Optional[datetime] = None
     highest_price: Optional[float] = None
+    highest_price_at: Optional[datetime] = None
+    lowest_30d_price: Optional[float] = None
+    avg_30d_price: Optional[float] = None
     seller_name: Optional[str] = None
     seller_rating: Optional[str] = None
     seller_review_count: Optional[str] = None
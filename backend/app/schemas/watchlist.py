@@ -21,6 +21,11 @@ class WatchlistResponse(WatchlistBase):
     id: int
     user_id: Optional[str] = None
     created_at: datetime
+    # Product-wide price stats; only filled in by the list endpoint
+    lowest_price: Optional[float] = None
+    highest_price: Optional[float] = None
+    lowest_30d_price: Optional[float] = None
+    avg_30d_price: Optional[float] = None
     
     class Config:
         from_attributes = True
\ No newline at end of file
@@ -0,0 +1,96 @@
+# backend/app/utils/coalesce.py
+import asyncio
+from typing import Callable, Dict, List, Optional, Tuple
+
+# The fields of a PRICE_UPDATE that describe one source's price
+SOURCE_FIELDS = (
+    "source_id", "source_name", "new_price",
+    "seller_name", "seller_rating", "seller_review_count", "avg_review_sentiment",
+)
+
+
+def merge_price_updates(product_id: int, updates: List[dict]) -> dict:
+    """
+    One PRICE_UPDATES message for a run of PRICE_UPDATE events on a product:
+    the latest price per source (a source updated twice appears once, where its
+    last update arrived) and the lowest of those prices.
+    """
+    latest: Dict[object, dict] = {}
+    for update in updates:
+        key = update.get("source_id") if update.get("source_id") is not None else update.get("source_name")
+        latest.pop(key, None)
+        latest[key] = {field: update.get(field) for field in SOURCE_FIELDS}
+    prices = [source["new_price"] for source in latest.values() if source["new_price"] is not None]
+    return {
+        "type": "PRICE_UPDATES",
+        "product_id": product_id,
+        "updates": list(latest.values()),
+        "lowest_price": min(prices) if prices else None,
+        "coalesced": len(updates),
+        "published_at": updates[0].get("published_at"),
+    }
+
+
+class PriceCoalescer:
+    """
+    Leading-and-trailing throttle per product. The first update after a quiet
+    spell goes out at once and opens a window; updates arriving inside it are
+    merged and sent when it closes, which opens the next window. A burst from
+    several sources therefore costs at most one message per window.
+    """
+    def __init__(self, window_ms: int, emit: Callable[[dict, str], None]):
+        self.window_seconds = window_ms / 1000
+        self.emit = emit
+        self.buffers: Dict[int, List[Tuple[str, dict]]] = {}
+        self.windows: Dict[int, asyncio.TimerHandle] = {}
+        self.events_in = 0
+        self.messages_out = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.window_seconds > 0
+
+    def add(self, event_id: str, update: dict):
+        self.events_in += 1
+        product_id = update["product_id"]
+        if product_id in self.windows:
+            self.buffers.setdefault(product_id, []).append((event_id, update))
+            return
+        self._send(product_id, [(event_id, update)])
+        self._open_window(product_id)
+
+    def _open_window(self, product_id: int):
+        self.windows[product_id] = asyncio.get_running_loop().call_later(
+            self.window_seconds, self._close_window, product_id
+        )
+
+    def _close_window(self, product_id: int):
+        self.windows.pop(product_id, None)
+        buffered = self.buffers.pop(product_id, None)
+        if buffered:
+            self._send(product_id, buffered)
+            self._open_window(product_id)
+
+    def _send(self, product_id: int, events: List[Tuple[str, dict]]):
+        self.messages_out += 1
+        # Tagged with the last event merged in; its resume cursor is capped by oldest_buffered()
+        self.emit(merge_price_updates(product_id, [update for _, update in events]), events[-1][0])
+
+    def oldest_buffered(self) -> Optional[str]:
+        """
+        Id of the oldest event still held in a window, or None. Events arrive in
+        stream order and a product's buffer is created by its first event, so
+        the first buffer in insertion order holds the oldest one.
+        """
+        for events in self.buffers.values():
+            return events[0][0]
+        return None
+
+    def stats(self) -> dict:
+        return {
+            "coalesce_window_ms": int(self.window_seconds * 1000),
+            "coalesce_events_in": self.events_in,
+            "coalesce_messages_out": self.messages_out,
+            "coalesce_ratio": round(self.events_in / self.messages_out, 2) if self.messages_out else None,
+            "coalesce_buffered_products": len(self.buffers),
+        }
@@ -0,0 +1,160 @@
+# backend/app/utils/columnar_export.py
+from datetime import datetime
+from typing import Iterator, List, Optional, Sequence
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import select, cast, literal, DateTime, Integer
+
+from ..database import SessionLocal
+from ..models import (
+    Product, ProductSource, Source, Seller,
+    PriceLog, PriceHistoryHourly, PriceHistoryDaily, PriceHistoryMonthly
+)
+
+# Rows per Arrow record batch / Parquet row group, fetched per cursor round trip
+BATCH_ROWS = 50_000
+
+EXPORT_TIERS = ("raw", "hourly", "daily", "monthly")
+
+# One flat schema for every tier. Raw rows carry the same value in avg/min/max/last and samples = 1.
+SCHEMA = pa.schema([
+    ("tier", pa.string()),
+    ("product_id", pa.int32()),
+    ("product_title", pa.string()),
+    ("brand", pa.string()),
+    ("category", pa.string()),
+    ("product_source_id", pa.int32()),
+    ("source_domain", pa.string()),
+    ("seller_name", pa.string()),
+    ("bucket_start", pa.timestamp("us", tz="UTC")),
+    ("avg_cents", pa.int32()),
+    ("min_cents", pa.int32()),
+    ("max_cents", pa.int32()),
+    ("last_cents", pa.int32()),
+    ("samples", pa.int32()),
+    ("currency", pa.string()),
+])
+
+
+def _tier_select(tier: str, start: Optional[datetime], end: Optional[datetime], product_ids: Optional[Sequence[int]]):
+    """The tier's rows joined to product/source/seller metadata, in SCHEMA column order."""
+    if tier == "raw":
+        table, key = PriceLog, PriceLog.scraped_at
+        bucket = PriceLog.scraped_at
+        values = [PriceLog.price_cents] * 4 + [literal(1, Integer)]
+    else:
+        table, key = {
+            "hourly": (PriceHistoryHourly, PriceHistoryHourly.hour),
+            "daily": (PriceHistoryDaily, PriceHistoryDaily.day),
+            "monthly": (PriceHistoryMonthly, PriceHistoryMonthly.month),
+        }[tier]
+        bucket = key if tier == "hourly" else cast(key, DateTime)
+        values = [table.avg_cents, table.min_cents, table.max_cents, table.last_cents, table.samples]
+
+    stmt = select(
+        literal(tier),
+        Product.id,
+        Product.title,
+        Product.brand,
+        Product.category,
+        ProductSource.id,
+        Source.domain,
+        Seller.seller_name,
+        bucket,
+        *values,
+        table.currency,
+    ).join(
+        ProductSource, table.product_source_id == ProductSource.id
+    ).join(
+        Product, ProductSource.product_id == Product.id
+    ).join(
+        Source, ProductSource.source_id == Source.id
+    ).outerjoin(
+        Seller, ProductSource.seller_id == Seller.id
+    )
+
+    # Range predicates on the tier's own key, so partitions and indexes prune the scan
+    if start is not None:
+        stmt = stmt.where(key >= (start if tier in ("raw", "hourly") else start.date()))
+    if end is not None:
+        stmt = stmt.where(key < (end if tier in ("raw", "hourly") else end.date()))
+    if product_ids:
+        stmt = stmt.where(ProductSource.product_id.in_(product_ids))
+    return stmt.order_by(ProductSource.product_id, key)
+
+
+def _record_batch(rows: List[tuple]) -> pa.RecordBatch:
+    columns = zip(*rows)
+    arrays = [pa.array(column, type=field.type) for column, field in zip(columns, SCHEMA)]
+    return pa.RecordBatch.from_arrays(arrays, schema=SCHEMA)
+
+
+def iter_record_batches(
+    tiers: Sequence[str],
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    product_ids: Optional[Sequence[int]] = None,
+    batch_rows: int = BATCH_ROWS,
+) -> Iterator[pa.RecordBatch]:
+    """Streams each requested tier through a server-side cursor, one record batch per fetch."""
+    db = SessionLocal()
+    try:
+        for tier in tiers:
+            result = db.execute(
+                _tier_select(tier, start, end, product_ids).execution_options(yield_per=batch_rows)
+            )
+            for rows in result.partitions(batch_rows):
+                yield _record_batch(rows)
+    finally:
+        db.close()
+
+
+class _ChunkSink:
+    """Write-only file object pyarrow writes into; the generator drains it after every batch."""
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+
+def stream_columnar(export_format: str, batches: Iterator[pa.RecordBatch]) -> Iterator[bytes]:
+    """
+    Encodes record batches as an Arrow IPC stream or a Parquet file while they
+    are produced. Each batch is one Parquet row group, so memory holds a single
+    batch at a time.
+    """
+    sink = _ChunkSink()
+    if export_format == "parquet":
+        writer = pq.ParquetWriter(sink, SCHEMA, compression="zstd")
+    else:
+        writer = pa.ipc.new_stream(sink, SCHEMA)
+
+    try:
+        for batch in batches:
+            writer.write_batch(batch)
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
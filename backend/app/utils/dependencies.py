@@ -1,19 +1,19 @@
 # backend/app/utils/dependencies.py
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import JWTError, jwt
 from typing import Optional
 
 from ..config import settings
-from ..database import get_db
+from ..database import get_async_db
 from ..models.user import User
 from ..schemas.user_schema import TokenData
 from ..crud import user as user_crud
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/users/login", auto_error=False)
 
-def get_current_user(token: Optional[str] = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Optional[User]:
+async def get_current_user(token: Optional[str] = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> Optional[User]:
     if token is None:
         return None # No token provided, user is anonymous
 
@@ -31,7 +31,7 @@ def get_current_user(token: Optional[str] = Depends(oauth2_scheme), db: Session
     except JWTError:
         raise credentials_exception
 
-    user = user_crud.get_user_by_email(db, email=token_data.email)
+    user = await user_crud.get_user_by_email(db, email=token_data.email)
     if user is None:
         raise credentials_exception
     return user
\ No newline at end of file
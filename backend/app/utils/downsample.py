@@ -0,0 +1,86 @@
+# backend/app/utils/downsample.py
+import numpy as np
+
+# MinMax preselection keeps this many candidates per output point before LTTB picks from them
+MINMAX_RATIO = 4
+
+
+def _minmax_candidates(y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Indices of the min and max of each of roughly n_out * MINMAX_RATIO / 2 equal
+    buckets, plus the first and last point. Cheap (one reshape + argmin/argmax)
+    and guarantees every local extreme survives into the LTTB step.
+    """
+    n = len(y)
+    n_buckets = max(1, (n_out * MINMAX_RATIO) // 2)
+    if n <= n_buckets * 2:
+        return np.arange(n)
+
+    # Interior points only; the first and last are always kept
+    interior = y[1:-1]
+    bucket_size = len(interior) // n_buckets
+    usable = bucket_size * n_buckets
+    blocks = interior[:usable].reshape(n_buckets, bucket_size)
+    offsets = np.arange(n_buckets) * bucket_size + 1
+
+    candidates = np.concatenate([
+        [0],
+        offsets + blocks.argmin(axis=1),
+        offsets + blocks.argmax(axis=1),
+        np.arange(usable + 1, n),  # remainder that did not fill a whole bucket
+    ])
+    return np.unique(candidates)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets. Returns the indices of the n_out points that
+    best preserve the visual shape of (x, y). x must be sorted ascending.
+    The per-bucket triangle areas are computed with NumPy; the Python loop runs
+    once per output point, not once per input point.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    # Bucket edges over the interior points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    prev = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        if end <= start:
+            end = start + 1
+
+        # Average point of the next bucket (or the last point)
+        next_start = end
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        if next_end <= next_start:
+            next_end = next_start + 1
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        xs, ys = x[start:end], y[start:end]
+        areas = np.abs((x[prev] - avg_x) * (ys - y[prev]) - (x[prev] - xs) * (avg_y - y[prev]))
+        prev = start + int(areas.argmax())
+        selected[i + 1] = prev
+
+    return selected
+
+
+def downsample(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    MinMax-preselected LTTB. Returns sorted indices into x/y, at most n_out + 2
+    long: the series' lowest and highest price are always included so a price
+    drop is never smoothed away.
+    """
+    n = len(x)
+    if n <= n_out:
+        return np.arange(n)
+
+    candidates = _minmax_candidates(y, n_out)
+    picked = candidates[lttb_indices(x[candidates], y[candidates], n_out)]
+    return np.unique(np.concatenate([picked, [int(y.argmin()), int(y.argmax())]]))
@@ -0,0 +1,82 @@
+# backend/app/utils/export_stream.py
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import Iterable, Iterator
+
+from ..database import SessionLocal
+from ..crud.export import iter_products_with_history, PRODUCT_COLUMNS
+
+# Output is flushed to the client in chunks of roughly this size
+CHUNK_BYTES = 64 * 1024
+
+CSV_HEADER = PRODUCT_COLUMNS + ["date", "price", "source"]
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _ndjson_lines(db) -> Iterator[str]:
+    """One JSON object per product, same shape as the old export's list items."""
+    for product, history in iter_products_with_history(db):
+        yield json.dumps({**product, "price_history": history}, default=_json_default) + "\n"
+
+
+def _csv_lines(db) -> Iterator[str]:
+    """One row per price point; products without history get a single row with empty price fields."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    for product, history in iter_products_with_history(db):
+        product_cells = [
+            product[name].isoformat() if isinstance(product[name], datetime) else product[name]
+            for name in PRODUCT_COLUMNS
+        ]
+        for point in history or [{"date": "", "price": "", "source": ""}]:
+            writer.writerow(product_cells + [point["date"], point["price"], point["source"]])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _chunked(lines: Iterable[str]) -> Iterator[bytes]:
+    """Batches lines into ~CHUNK_BYTES writes. The first line goes out on its own so the client sees bytes at once."""
+    pending, size = [], 0
+    for i, line in enumerate(lines):
+        encoded = line.encode()
+        pending.append(encoded)
+        size += len(encoded)
+        if size >= CHUNK_BYTES or i == 0:
+            yield b"".join(pending)
+            pending, size = [], 0
+    if pending:
+        yield b"".join(pending)
+
+
+def _gzipped(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 writes a gzip header
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def stream_export(export_format: str, gzip: bool = False) -> Iterator[bytes]:
+    """
+    Generator for a StreamingResponse. It owns its database session, because
+    request dependencies are torn down before a streamed body finishes.
+    """
+    db = SessionLocal()
+    try:
+        lines = _csv_lines(db) if export_format == "csv" else _ndjson_lines(db)
+        chunks = _chunked(lines)
+        yield from (_gzipped(chunks) if gzip else chunks)
+    finally:
+        db.close()
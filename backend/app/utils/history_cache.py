@@ -0,0 +1,120 @@
+# backend/app/utils/history_cache.py
+import time
+from typing import Dict, Optional
+import redis.asyncio as aioredis
+from ..config import settings
+
+# --- Key Layout ---
+# Entries embed two counters, so invalidation is a single INCR and a reader that
+# raced with an update can only ever write into a key nobody will read again:
+#   history:gen            bumped by the aggregation job (all products)
+#   history:ver:<product>  bumped by the PRICE_UPDATE listener (one product)
+GENERATION_KEY = "history:gen"
+VERSION_KEY_PREFIX = "history:ver:"
+ENTRY_KEY_PREFIX = "history:entry:"
+STATS_KEY = "history_cache_stats"
+# The lookup sits on the busiest read path; a stalled Redis is treated as a miss, not waited on
+REDIS_TIMEOUT_SECONDS = 1.0
+
+_cache_redis = None
+
+
+def _redis():
+    global _cache_redis
+    if _cache_redis is None:
+        _cache_redis = aioredis.from_url(
+            settings.REDIS_URL,
+            socket_timeout=REDIS_TIMEOUT_SECONDS,
+            socket_connect_timeout=REDIS_TIMEOUT_SECONDS
+        )
+    return _cache_redis
+
+
+def product_version_key(product_id: int) -> str:
+    return f"{VERSION_KEY_PREFIX}{product_id}"
+
+
+async def invalidate_product(product_id: int):
+    try:
+        await _redis().incr(product_version_key(product_id))
+    except Exception as e:
+        print(f"[HistoryCache] Could not invalidate product {product_id}: {e}")
+
+
+async def invalidate_all():
+    try:
+        await _redis().incr(GENERATION_KEY)
+    except Exception as e:
+        print(f"[HistoryCache] Could not invalidate the cache: {e}")
+
+
+async def _record(outcome: str, started: float):
+    elapsed_us = int((time.perf_counter() - started) * 1_000_000)
+    try:
+        async with _redis().pipeline(transaction=False) as pipe:
+            pipe.hincrby(STATS_KEY, outcome, 1)
+            pipe.hincrby(STATS_KEY, f"{outcome}_us_total", elapsed_us)
+            await pipe.execute()
+    except Exception as e:
+        print(f"[HistoryCache] Could not record stats: {e}")
+
+
+class HistoryLookup:
+    """
+    One cache lookup for (product, range, max_points). After `await lookup.load()`,
+    `cached` holds the JSON body on a hit; on a miss the caller builds the body and
+    hands it to `fill`, which stores it under the versions read *before* the
+    database was queried. All Redis calls are awaited on the async client.
+    """
+    def __init__(self, product_id: int, range_option: str, max_points: Optional[int]):
+        self.product_id = product_id
+        self.range_option = range_option
+        self.max_points = max_points
+        self.started = time.perf_counter()
+        self.key: Optional[str] = None
+        self.cached: Optional[bytes] = None
+
+    async def load(self) -> "HistoryLookup":
+        if not settings.HISTORY_CACHE_TTL_SECONDS:
+            return self
+        try:
+            redis = _redis()
+            generation, version = await redis.mget(GENERATION_KEY, product_version_key(self.product_id))
+            self.key = (
+                f"{ENTRY_KEY_PREFIX}{self.product_id}:{self.range_option}:{self.max_points or 0}:"
+                f"{int(generation or 0)}:{int(version or 0)}"
+            )
+            self.cached = await redis.get(self.key)
+        except Exception as e:
+            print(f"[HistoryCache] Lookup failed, reading from the database: {e}")
+            self.key = None
+            return self
+        if self.cached is not None:
+            await _record("hits", self.started)
+        return self
+
+    async def fill(self, body: bytes):
+        if self.key is None:
+            return
+        try:
+            await _redis().set(self.key, body, ex=settings.HISTORY_CACHE_TTL_SECONDS)
+        except Exception as e:
+            print(f"[HistoryCache] Could not store {self.key}: {e}")
+        await _record("misses", self.started)
+
+
+async def get_cache_stats() -> Dict[str, float]:
+    """Hit ratio and average request latency for hits and misses."""
+    try:
+        raw = {k.decode(): int(v) for k, v in (await _redis().hgetall(STATS_KEY)).items()}
+    except Exception as e:
+        print(f"[HistoryCache] Could not read stats: {e}")
+        raw = {}
+    hits, misses = raw.get("hits", 0), raw.get("misses", 0)
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+        "avg_hit_ms": round(raw.get("hits_us_total", 0) / hits / 1000, 3) if hits else 0.0,
+        "avg_miss_ms": round(raw.get("misses_us_total", 0) / misses / 1000, 3) if misses else 0.0,
+    }
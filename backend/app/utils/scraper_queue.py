@@ -1,5 +1,7 @@
 from redis import Redis
 from rq import Queue
+from typing import Dict, List, Tuple
+from collections import defaultdict
 from ..config import settings
 
 redis_conn = Redis.from_url(settings.REDIS_URL)
@@ -9,17 +11,94 @@ alert_queue = Queue("alerts", connection=redis_conn) # <-- ADD THIS
 sales_queue = Queue("sales_discovery", connection=redis_conn) # <-- ADD THIS
 aggregate_queue = Queue("aggregation", connection=redis_conn) # <-- ADD THIS
 
+# --- In-flight deduplication ---
+# A product source is "in flight" from enqueue until the worker finishes it.
+# The worker deletes the key (same prefix in playwright_scraper/runner.py);
+# the TTL only matters if a job dies without cleaning up.
+INFLIGHT_KEY_PREFIX = "scrape:inflight:"
+DEDUP_STATS_KEY = "scrape:dedup"
+
+def _claim_sources(source_ids: List[int]) -> List[int]:
+    """Marks sources as in flight (SET NX) in one pipeline. Returns the ids that were not already queued."""
+    if not source_ids:
+        return []
+    with redis_conn.pipeline() as pipe:
+        for source_id in source_ids:
+            pipe.set(f"{INFLIGHT_KEY_PREFIX}{source_id}", 1, nx=True, ex=settings.SCRAPE_INFLIGHT_TTL_SECONDS)
+        results = pipe.execute()
+    claimed = [sid for sid, ok in zip(source_ids, results) if ok]
+
+    suppressed = len(source_ids) - len(claimed)
+    with redis_conn.pipeline() as pipe:
+        pipe.hincrby(DEDUP_STATS_KEY, "requested", len(source_ids))
+        pipe.hincrby(DEDUP_STATS_KEY, "suppressed", suppressed)
+        pipe.execute()
+    if suppressed:
+        print(f"Dedup: {suppressed} product sources already queued or running, skipped.")
+    return claimed
+
+def _release_sources(source_ids: List[int]):
+    if source_ids:
+        redis_conn.delete(*[f"{INFLIGHT_KEY_PREFIX}{sid}" for sid in source_ids])
+
+def get_dedup_stats() -> Dict[str, int]:
+    raw = redis_conn.hgetall(DEDUP_STATS_KEY)
+    return {k.decode(): int(v) for k, v in raw.items()}
+
 def enqueue_scrape(url: str, product_id: int, source_id: int):
-    """Enqueue a scraping job"""
-    job = scraper_queue.enqueue(
-        'playwright_scraper.runner.scrape_and_save_product',
-        url,
-        product_id,
-        source_id,
-        job_timeout='5m'
-    )
+    """Enqueue a scraping job. Returns None if this source is already queued or running."""
+    if not _claim_sources([source_id]):
+        return None
+    try:
+        job = scraper_queue.enqueue(
+            'playwright_scraper.runner.scrape_and_save_product',
+            url,
+            product_id,
+            source_id,
+            job_timeout='5m'
+        )
+    except Exception:
+        _release_sources([source_id])
+        raise
     return job.id
 
+def enqueue_scrape_batches(items: List[Tuple[str, int, int, str]], batch_size: int = None) -> List[str]:
+    """
+    Enqueue (url, product_id, source_id, domain) items as domain-grouped batch jobs.
+    Every job is written in a single Redis pipeline, so enqueueing thousands of
+    sources costs one round trip instead of one per URL.
+    """
+    batch_size = max(1, batch_size or settings.SCRAPE_BATCH_SIZE)
+
+    # Sources whose previous job is still queued or running are coalesced away
+    claimed = set(_claim_sources([source_id for _, _, source_id, _ in items]))
+
+    by_domain: Dict[str, List[Tuple[str, int, int]]] = defaultdict(list)
+    for url, product_id, source_id, domain in items:
+        if source_id in claimed:
+            by_domain[domain].append((url, product_id, source_id))
+
+    job_datas = []
+    for domain, domain_items in by_domain.items():
+        for i in range(0, len(domain_items), batch_size):
+            job_datas.append(Queue.prepare_data(
+                'playwright_scraper.runner.scrape_and_save_batch',
+                args=(domain_items[i:i + batch_size],),
+                timeout='15m',
+                description=f"scrape batch: {domain} ({len(domain_items[i:i + batch_size])} items)"
+            ))
+
+    if not job_datas:
+        return []
+    try:
+        with redis_conn.pipeline() as pipe:
+            jobs = scraper_queue.enqueue_many(job_datas, pipeline=pipe)
+            pipe.execute()
+    except Exception:
+        _release_sources(list(claimed))
+        raise
+    return [job.id for job in jobs]
+
 def enqueue_scam_check(domain: str):
     """Enqueue a scam check job"""
     job = scam_queue.enqueue(
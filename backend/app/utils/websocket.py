@@ -1,25 +1,473 @@
-from fastapi import WebSocket
-from typing import List
+import asyncio
 import json
+import os
+import re
+import socket
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Set, Tuple
+from fastapi import WebSocket
+import redis.asyncio as aioredis
+from jose import JWTError, jwt
+from ..config import settings
+from .coalesce import PriceCoalescer, merge_price_updates
+
+# --- Fan-out Configuration ---
+# Messages buffered per connection; a client this far behind is dropped instead of slowing anyone else
+SEND_QUEUE_SIZE = 64
+# A single send that takes longer than this marks the client as stalled
+SEND_TIMEOUT_SECONDS = 5.0
+MAX_TOPICS_PER_CONNECTION = 200
+# Close code for dropped slow consumers ("try again later"); clients reconnect and resubscribe
+SLOW_CONSUMER_CLOSE_CODE = 1013
+# Recent publish-to-fan-out delays kept for the percentiles in stats()
+LAG_SAMPLES = 1000
+
+# Every API process (uvicorn worker or replica) has its own sockets and its own subscriber
+REPLICA_ID = f"{socket.gethostname()}:{os.getpid()}"
+REPLICA_METRICS_PREFIX = "ws_replica_metrics:"
+
+# Capped stream the workers append price and alert events to (see worker redis_client.py)
+PRICE_EVENTS_STREAM = "price_events"
+# Entries a resuming client may be behind; further back it is told to refetch instead
+REPLAY_SCAN_LIMIT = 5000
+# Live events held for a connection while its backlog is replayed
+REPLAY_PENDING_LIMIT = 1000
+EVENT_ID_PATTERN = re.compile(r"^\d+-\d+$")
+
+_events_redis = None
+
+
+def _redis():
+    global _events_redis
+    if _events_redis is None:
+        _events_redis = aioredis.from_url(settings.REDIS_URL)
+    return _events_redis
+
+
+async def read_replica_metrics() -> List[dict]:
+    """The last report of every replica, found with an async SCAN and read in one pipeline."""
+    redis = _redis()
+    keys = [key async for key in redis.scan_iter(match=f"{REPLICA_METRICS_PREFIX}*", count=100)]
+    if not keys:
+        return []
+    async with redis.pipeline(transaction=False) as pipe:
+        for key in keys:
+            pipe.hgetall(key)
+        reports = await pipe.execute()
+    # A key can expire between the scan and the read
+    return [{k.decode(): v.decode() for k, v in report.items()} for report in reports if report]
+
+
+def _event_key(event_id: str) -> Tuple[int, int]:
+    ms, seq = event_id.split("-")
+    return int(ms), int(seq)
+
+
+def _previous_event_id(event_id: str) -> str:
+    """The id just before event_id; resuming from it replays event_id itself."""
+    ms, seq = _event_key(event_id)
+    if seq:
+        return f"{ms}-{seq - 1}"
+    return f"{ms - 1}-{2 ** 64 - 1}" if ms else event_id
+
+
+def _with_event_id(event_id: str, payload: str, data: dict, cursor: Optional[str] = None) -> str:
+    """
+    Splices the stream id and resume cursor into the event's JSON as received
+    instead of re-serializing it.
+    """
+    cursor = cursor or event_id
+    if not data:
+        return json.dumps({"event_id": event_id, "cursor": cursor})
+    return '{"event_id": "%s", "cursor": "%s", %s' % (event_id, cursor, payload.lstrip()[1:])
+
+
+def topics_for(message: dict) -> List[str]:
+    """
+    Topics a stream event is delivered to. Alerts go only to the user they are
+    for: they carry that user's id and threshold, and user:<email> topics are
+    the ones guarded by a token. Everything else goes to its product.
+    """
+    if message.get("type") == "PRICE_ALERT":
+        return [f"user:{message['user_id']}"] if message.get("user_id") else []
+    if message.get("product_id") is not None:
+        return [f"product:{message['product_id']}"]
+    return []
+
+
+def _authorized(topic: str, token: Optional[str]) -> bool:
+    """
+    user:<email> topics need the user's JWT. Anonymous ids are unguessable
+    UUIDs, so knowing one is the credential, as it is for the REST API.
+    """
+    if not topic.startswith("user:") or "@" not in topic:
+        return True
+    if not token:
+        return False
+    try:
+        payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
+    except JWTError:
+        return False
+    return payload.get("sub") == topic[len("user:"):]
+
+
+def _percentile(samples: Iterable[float], pct: float) -> Optional[float]:
+    ordered = sorted(samples)
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))], 1)
+
+
+class Connection:
+    """One socket, its topics, and the task that drains its bounded send queue."""
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.topics: Set[str] = set()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
+        self.sender: Optional[asyncio.Task] = None
+        self.closed = False
+        # Live events held back while a resume replays the backlog; None when not resuming
+        self.pending: Optional[List[Tuple[str, str]]] = None
 
 
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
+        self.connections: Set[Connection] = set()
+        self.subscribers: Dict[str, Set[Connection]] = {}
+        self.dropped_slow = 0
+        self.delivered = 0
+        self.received = 0
+        self.replayed = 0
+        self.resyncs = 0
+        self.last_event_id: Optional[str] = None
+        self.coalescer = PriceCoalescer(settings.WS_COALESCE_WINDOW_MS, self._emit_coalesced)
+        self.lag_ms: Deque[float] = deque(maxlen=LAG_SAMPLES)
+        self.fanout_us: Deque[int] = deque(maxlen=LAG_SAMPLES)
 
-    async def connect(self, websocket: WebSocket):
+    async def connect(self, websocket: WebSocket, topics: Iterable[str] = (), token: Optional[str] = None,
+                      since: Optional[str] = None) -> Connection:
         await websocket.accept()
-        self.active_connections.append(websocket)
+        connection = Connection(websocket)
+        self.connections.add(connection)
+        connection.sender = asyncio.create_task(self._send_loop(connection))
+        resuming = self._start_resume(connection, since)
+        self.subscribe(connection, topics, token)
+        if resuming:
+            await self.resume(connection, since)
+        return connection
+
+    def disconnect(self, connection: Connection):
+        if connection.closed:
+            return
+        connection.closed = True
+        self.connections.discard(connection)
+        for topic in connection.topics:
+            subscribers = self.subscribers.get(topic)
+            if subscribers is not None:
+                subscribers.discard(connection)
+                if not subscribers:
+                    del self.subscribers[topic]
+        connection.topics.clear()
+        if connection.sender and connection.sender is not asyncio.current_task():
+            connection.sender.cancel()
+
+    def subscribe(self, connection: Connection, topics: Iterable[str], token: Optional[str] = None) -> List[str]:
+        """Adds the topics the connection may see; returns the ones it was granted."""
+        granted = []
+        for topic in topics:
+            if len(connection.topics) >= MAX_TOPICS_PER_CONNECTION:
+                break
+            if not isinstance(topic, str) or not _authorized(topic, token):
+                continue
+            connection.topics.add(topic)
+            self.subscribers.setdefault(topic, set()).add(connection)
+            granted.append(topic)
+        return granted
+
+    def unsubscribe(self, connection: Connection, topics: Iterable[str]):
+        for topic in topics:
+            connection.topics.discard(topic)
+            subscribers = self.subscribers.get(topic)
+            if subscribers is not None:
+                subscribers.discard(connection)
+                if not subscribers:
+                    del self.subscribers[topic]
+
+    async def handle_client_message(self, connection: Connection, data: str):
+        """
+        Client protocol: {"action": "subscribe" | "unsubscribe", "topics": [...], "token": "...", "since": "..."}.
+        Topics are "product:<id>" and "user:<email or anonymous id>". `since` is the
+        last event_id the client saw; the events after it are replayed before live
+        ones resume. Anything else is echoed back.
+        """
+        try:
+            request = json.loads(data)
+        except json.JSONDecodeError:
+            request = None
+        if not isinstance(request, dict) or request.get("action") not in ("subscribe", "unsubscribe"):
+            self._enqueue(connection, f"Echo: {data}")
+            return
 
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        topics = request.get("topics") or []
+        if not isinstance(topics, list):
+            topics = []
+        if request["action"] == "subscribe":
+            since = request.get("since")
+            resuming = self._start_resume(connection, since)
+            granted = self.subscribe(connection, topics, request.get("token"))
+            # The stream position gives a client that has seen no events yet a point to resume from
+            self._enqueue(connection, json.dumps({
+                "type": "SUBSCRIBED", "topics": granted, "last_event_id": self.cursor_for(self.last_event_id)
+            }))
+            if resuming:
+                await self.resume(connection, since)
+        else:
+            self.unsubscribe(connection, topics)
+            self._enqueue(connection, json.dumps({"type": "UNSUBSCRIBED", "topics": topics}))
 
     async def send_personal_message(self, message: str, websocket: WebSocket):
-        await websocket.send_text(message)
+        for connection in self.connections:
+            if connection.websocket is websocket:
+                self._enqueue(connection, message)
+                return
+
+    def publish(self, message: dict, text: Optional[str] = None, event_id: Optional[str] = None) -> int:
+        """
+        Queues the message for every subscriber of its topics. `text` is the
+        payload as it came off Redis; every queue shares that one string, and
+        publish never awaits a socket, so a slow client only fills its own queue.
+        Returns the number of connections it was queued for.
+        """
+        recipients: Set[Connection] = set()
+        for topic in topics_for(message):
+            recipients.update(self.subscribers.get(topic, ()))
+        if not recipients:
+            return 0
+        if text is None:
+            text = json.dumps(message)
+        for connection in recipients:
+            if connection.pending is not None and event_id is not None:
+                if len(connection.pending) >= REPLAY_PENDING_LIMIT:
+                    self._drop(connection, "too far behind while resuming")
+                else:
+                    connection.pending.append((event_id, text))
+            else:
+                self._enqueue(connection, text)
+        return len(recipients)
+
+    def publish_event(self, event_id: str, payload: str, received_at: float) -> int:
+        """Fans out one price_events stream entry, tagged with its id so clients can resume after it."""
+        started = time.perf_counter()
+        try:
+            data = json.loads(payload)
+        except json.JSONDecodeError:
+            print(f"[WebSocket] Could not decode event {event_id}.")
+            return 0
+        if not isinstance(data, dict):
+            return 0
+        self.last_event_id = event_id
+        if self.coalescer.enabled and data.get("type") == "PRICE_UPDATE" and data.get("product_id") is not None:
+            # Nobody watching this product here: nothing to merge or send
+            sent = 0
+            if f"product:{data['product_id']}" in self.subscribers:
+                self.coalescer.add(event_id, data)
+        else:
+            sent = self.publish(data, _with_event_id(event_id, payload, data, self.cursor_for(event_id)), event_id)
+        self.record_fanout(received_at, data.get("published_at"), started)
+        return sent
+
+    def cursor_for(self, event_id: Optional[str]) -> Optional[str]:
+        """
+        Where a client that has received event_id should resume from. Normally
+        event_id itself, but never past an event still held in a coalescing
+        window: a socket on several topics gets later events (other products,
+        alerts) before that window closes, and resuming after them would skip
+        it. The cursor is per replica, not per socket, so one payload still
+        serves every subscriber; a resume may replay a few events the client
+        already has, which it skips by event_id.
+        """
+        oldest = self.coalescer.oldest_buffered()
+        if event_id is None or oldest is None or _event_key(oldest) > _event_key(event_id):
+            return event_id
+        return _previous_event_id(oldest)
+
+    def _emit_coalesced(self, message: dict, event_id: str):
+        self.publish({"event_id": event_id, "cursor": self.cursor_for(event_id), **message}, event_id=event_id)
+
+    def _replay_messages(self, matched: List[Tuple[str, str, dict]]) -> List[Tuple[str, str]]:
+        """
+        Backlog entries as (event_id, text), with each product's PRICE_UPDATEs
+        merged like live ones. A merged message is placed at its last event, so
+        its cursor stays before the first event of any merged message still to come.
+        """
+        if not self.coalescer.enabled:
+            return [(event_id, _with_event_id(event_id, payload, data)) for event_id, payload, data in matched]
+        entries = []
+        updates: Dict[int, List[Tuple[str, dict]]] = {}
+        for event_id, payload, data in matched:
+            if data.get("type") == "PRICE_UPDATE" and data.get("product_id") is not None:
+                updates.setdefault(data["product_id"], []).append((event_id, data))
+            else:
+                entries.append((event_id, event_id, payload, data))
+        for product_id, events in updates.items():
+            merged = merge_price_updates(product_id, [update for _, update in events])
+            entries.append((events[-1][0], events[0][0], None, merged))
+        entries.sort(key=lambda entry: _event_key(entry[0]))
+
+        messages = []
+        held: Optional[str] = None
+        for event_id, first_id, payload, data in reversed(entries):
+            cursor = event_id
+            if held is not None and _event_key(held) <= _event_key(event_id):
+                cursor = _previous_event_id(held)
+            if payload is None:
+                text = json.dumps({"event_id": event_id, "cursor": cursor, **data})
+            else:
+                text = _with_event_id(event_id, payload, data, cursor)
+            messages.append((event_id, text))
+            if held is None or _event_key(first_id) < _event_key(held):
+                held = first_id
+        messages.reverse()
+        return messages
+
+    def _start_resume(self, connection: Connection, since) -> bool:
+        """Starts holding back live events, before the topics are added, so none slip past the replay."""
+        if not isinstance(since, str) or not EVENT_ID_PATTERN.match(since):
+            return False
+        if connection.pending is None:
+            connection.pending = []
+        return True
+
+    async def resume(self, connection: Connection, since: str):
+        """
+        Replays the stream entries after `since` that match the connection's
+        topics, then releases the live events held back meanwhile, skipping
+        any the replay already covered. A client whose position has been
+        trimmed out of the stream, or is more than REPLAY_SCAN_LIMIT entries
+        behind, gets RESYNC_REQUIRED and refetches instead.
+        """
+        last = since
+        replayed = 0
+        resync = False
+        try:
+            redis = _redis()
+            oldest = await redis.xrange(PRICE_EVENTS_STREAM, "-", "+", count=1)
+            if oldest and _event_key(oldest[0][0].decode()) > _event_key(since):
+                resync = True
+            else:
+                entries = await redis.xrange(PRICE_EVENTS_STREAM, f"({since}", "+", count=REPLAY_SCAN_LIMIT + 1)
+                if len(entries) > REPLAY_SCAN_LIMIT:
+                    resync = True
+                else:
+                    matched = []
+                    for raw_id, fields in entries:
+                        event_id, payload = raw_id.decode(), fields[b"data"].decode()
+                        last = event_id
+                        try:
+                            data = json.loads(payload)
+                        except json.JSONDecodeError:
+                            continue
+                        if isinstance(data, dict) and connection.topics.intersection(topics_for(data)):
+                            matched.append((event_id, payload, data))
+                    for _event_id, text in self._replay_messages(matched):
+                        await self._put(connection, text)
+                        replayed += 1
+        except Exception as e:
+            print(f"[WebSocket] Could not replay events after {since}: {e}")
+            resync = True
+
+        if resync:
+            self.resyncs += 1
+            await self._put(connection, json.dumps({
+                "type": "RESYNC_REQUIRED", "topics": sorted(connection.topics),
+                "cursor": self.cursor_for(self.last_event_id)
+            }))
+        else:
+            self.replayed += replayed
+            await self._put(connection, json.dumps({
+                "type": "RESUMED", "since": since, "replayed": replayed, "cursor": last
+            }))
+
+        # Live events that arrive while this drains are appended to pending, so order holds
+        last_key = _event_key(last)
+        while connection.pending:
+            held, connection.pending = connection.pending, []
+            for event_id, text in held:
+                if _event_key(event_id) > last_key:
+                    await self._put(connection, text)
+        connection.pending = None
+
+    async def _put(self, connection: Connection, text: str):
+        """Queues one replayed message, waiting for room instead of dropping; only this client's resume waits."""
+        if connection.closed:
+            return
+        try:
+            await asyncio.wait_for(connection.queue.put(text), SEND_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            self._drop(connection, "replay stalled")
+
+    def record_fanout(self, received_at: float, published_at: Optional[float], started: float):
+        """published_at is the publisher's wall clock, so lag across hosts includes their clock skew."""
+        self.received += 1
+        self.fanout_us.append(int((time.perf_counter() - started) * 1_000_000))
+        if isinstance(published_at, (int, float)):
+            self.lag_ms.append(max(0.0, (received_at - published_at) * 1000))
+
+    def _enqueue(self, connection: Connection, text: str):
+        if connection.closed:
+            return
+        try:
+            connection.queue.put_nowait(text)
+        except asyncio.QueueFull:
+            self._drop(connection, "send queue full")
+
+    def _drop(self, connection: Connection, reason: str):
+        print(f"[WebSocket] Dropping slow consumer ({reason}).")
+        self.dropped_slow += 1
+        self.disconnect(connection)
+        asyncio.create_task(self._close(connection))
+
+    async def _close(self, connection: Connection):
+        try:
+            await asyncio.wait_for(
+                connection.websocket.close(code=SLOW_CONSUMER_CLOSE_CODE), SEND_TIMEOUT_SECONDS
+            )
+        except Exception:
+            pass
+
+    async def _send_loop(self, connection: Connection):
+        try:
+            while True:
+                text = await connection.queue.get()
+                await asyncio.wait_for(connection.websocket.send_text(text), SEND_TIMEOUT_SECONDS)
+                self.delivered += 1
+        except asyncio.CancelledError:
+            pass
+        except asyncio.TimeoutError:
+            self._drop(connection, "send timed out")
+        except Exception:
+            # The socket went away; the receive loop cleans up
+            self.disconnect(connection)
 
-    async def broadcast(self, message: dict):
-        for connection in self.active_connections:
-            await connection.send_json(message)
+    def stats(self) -> dict:
+        return {
+            "replica": REPLICA_ID,
+            "received": self.received,
+            "lag_ms_p50": _percentile(self.lag_ms, 50),
+            "lag_ms_p95": _percentile(self.lag_ms, 95),
+            "lag_ms_max": round(max(self.lag_ms), 1) if self.lag_ms else None,
+            "fanout_us_p95": _percentile(self.fanout_us, 95),
+            "last_event_id": self.last_event_id,
+            "replayed": self.replayed,
+            "resyncs": self.resyncs,
+            **self.coalescer.stats(),
+            "connections": len(self.connections),
+            "topics": len(self.subscribers),
+            "queued": sum(connection.queue.qsize() for connection in self.connections),
+            "delivered": self.delivered,
+            "dropped_slow_consumers": self.dropped_slow,
+        }
 
 
 manager = ConnectionManager()
@@ -0,0 +1,113 @@
+# backend/scripts/bench_concurrency.py
+"""
+Concurrent-request latency benchmark for the API.
+
+Fires CONCURRENCY requests at a time against a few database-backed endpoints
+and, alongside them, polls /health, which never touches the database. With a
+blocking database layer /health queues behind every query on the event loop;
+with the async layer its latency stays flat while the load runs.
+
+Run it against a live API, once on the old build and once on the new one:
+
+    python backend/scripts/bench_concurrency.py --base-url http://localhost:8000 \
+        --product-id 1 --concurrency 50 --requests 2000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Dict, List
+
+import httpx
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _report(name: str, samples: List[float], errors: int, elapsed: float):
+    if not samples:
+        print(f"{name:<28} no successful requests ({errors} errors)")
+        return
+    print(
+        f"{name:<28} n={len(samples):<6} err={errors:<4} "
+        f"p50={_percentile(samples, 50):8.1f}ms p95={_percentile(samples, 95):8.1f}ms "
+        f"p99={_percentile(samples, 99):8.1f}ms max={max(samples):8.1f}ms "
+        f"rps={len(samples) / elapsed:8.1f}"
+    )
+
+
+async def _load(client: httpx.AsyncClient, paths: List[str], total: int, concurrency: int,
+                latencies: Dict[str, List[float]], errors: Dict[str, int]):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        path = paths[i % len(paths)]
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await client.get(path)
+                response.raise_for_status()
+                latencies[path].append((time.perf_counter() - started) * 1000)
+            except httpx.HTTPError:
+                errors[path] += 1
+
+    await asyncio.gather(*(one(i) for i in range(total)))
+
+
+async def _probe_health(client: httpx.AsyncClient, stop: asyncio.Event, samples: List[float], interval: float):
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            await client.get("/health")
+            samples.append((time.perf_counter() - started) * 1000)
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(interval)
+
+
+async def main(args):
+    paths = [
+        f"/api/products/{args.product_id}",
+        f"/api/products/{args.product_id}/history?range=30d",
+        "/api/products/?limit=50",
+        "/api/stats/dashboard",
+    ]
+    latencies: Dict[str, List[float]] = {path: [] for path in paths}
+    errors: Dict[str, int] = {path: 0 for path in paths}
+    health: List[float] = []
+
+    limits = httpx.Limits(max_connections=args.concurrency + 1, max_keepalive_connections=args.concurrency + 1)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60) as client:
+        # Warm the connection pools on both sides
+        await asyncio.gather(*(client.get(path) for path in paths))
+
+        stop = asyncio.Event()
+        probe = asyncio.create_task(_probe_health(client, stop, health, args.probe_interval))
+        started = time.perf_counter()
+        await _load(client, paths, args.requests, args.concurrency, latencies, errors)
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await probe
+
+    print(f"\n{args.requests} requests, concurrency {args.concurrency}, {elapsed:.2f}s\n")
+    for path in paths:
+        _report(path, latencies[path], errors[path], elapsed)
+    everything = [ms for samples in latencies.values() for ms in samples]
+    _report("all endpoints", everything, sum(errors.values()), elapsed)
+    print()
+    _report("/health during load", health, 0, elapsed)
+    if health:
+        print(f"{'':<28} mean={statistics.mean(health):.1f}ms (event loop responsiveness)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--product-id", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--probe-interval", type=float, default=0.05, help="Seconds between /health probes")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,133 @@
+# backend/scripts/ws_load.py
+"""
+WebSocket fan-out load test.
+
+Opens IDLE sockets spread over PRODUCTS product topics, plus PROBES sockets
+subscribed to one hot product, and optionally SLOW sockets that subscribe to
+the hot product but never read. It then publishes PRICE_UPDATE messages for the
+hot product to the "price_events" Redis stream (exactly what the workers do)
+and reports append-to-receive latency at the probes.
+
+With topic routing, idle sockets on other products cost nothing per message;
+with bounded send queues, the slow sockets are closed instead of holding up
+the probes. With coalescing on (WS_COALESCE_WINDOW_MS), latency includes the
+window; compare the server's coalesce_ratio in /api/stats/websocket.
+
+Raise the file descriptor limit first (ulimit -n 65536), on both ends:
+
+    python backend/scripts/ws_load.py --ws-url ws://localhost:8000/ws/updates \
+        --redis-url redis://localhost:6379/0 --idle 10000 --messages 200
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import List
+
+import redis.asyncio as aioredis
+import websockets
+
+HOT_PRODUCT_ID = 1
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def _open(url: str, topic: str, semaphore: asyncio.Semaphore):
+    async with semaphore:
+        # Subscribing in the URL saves a round trip per socket during the ramp
+        return await websockets.connect(f"{url}?topics={topic}", max_queue=None, open_timeout=60)
+
+
+async def _probe(socket, latencies: List[float], expected: int, done: asyncio.Event):
+    received = 0
+    async for raw in socket:
+        message = json.loads(raw)
+        if message.get("type") not in ("PRICE_UPDATE", "PRICE_UPDATES"):
+            continue
+        # A coalesced message stands for several events; its published_at is the oldest one's
+        latencies.append((time.time() - message["published_at"]) * 1000)
+        received += message.get("coalesced", 1)
+        if received >= expected:
+            break
+    done.set()
+
+
+async def main(args):
+    semaphore = asyncio.Semaphore(args.ramp_concurrency)
+    started = time.perf_counter()
+    idle = await asyncio.gather(*(
+        _open(args.ws_url, f"product:{HOT_PRODUCT_ID + 1 + i % args.products}", semaphore)
+        for i in range(args.idle)
+    ))
+    print(f"Opened {len(idle)} idle sockets over {args.products} topics in {time.perf_counter() - started:.1f}s")
+
+    hot = f"product:{HOT_PRODUCT_ID}"
+    probes = await asyncio.gather(*(_open(args.ws_url, hot, semaphore) for _ in range(args.probes)))
+    # Slow consumers: the client's read buffer is tiny and never drained
+    slow = [
+        await websockets.connect(f"{args.ws_url}?topics={hot}", max_queue=1, read_limit=1024)
+        for _ in range(args.slow)
+    ]
+
+    latencies: List[List[float]] = [[] for _ in probes]
+    events = [asyncio.Event() for _ in probes]
+    readers = [
+        asyncio.create_task(_probe(socket, latencies[i], args.messages, events[i]))
+        for i, socket in enumerate(probes)
+    ]
+
+    redis = aioredis.from_url(args.redis_url)
+    payload_padding = "x" * args.payload_bytes
+    started = time.perf_counter()
+    for _ in range(args.messages):
+        await redis.xadd("price_events", {"data": json.dumps({
+            "type": "PRICE_UPDATE",
+            "product_id": HOT_PRODUCT_ID,
+            "source_name": "loadtest",
+            "new_price": 1.0,
+            "published_at": time.time(),
+            "padding": payload_padding,
+        })}, maxlen=100000, approximate=True)
+        await asyncio.sleep(args.interval)
+    try:
+        await asyncio.wait_for(asyncio.gather(*(event.wait() for event in events)), args.timeout)
+    except asyncio.TimeoutError:
+        print("Timed out waiting for every probe to receive every message")
+    elapsed = time.perf_counter() - started
+
+    samples = [ms for probe in latencies for ms in probe]
+    print(f"\n{args.messages} events to {len(probes)} probes in {elapsed:.2f}s "
+          f"({len(samples)} messages delivered)")
+    if samples:
+        print(f"latency p50={_percentile(samples, 50):.1f}ms p95={_percentile(samples, 95):.1f}ms "
+              f"p99={_percentile(samples, 99):.1f}ms max={max(samples):.1f}ms")
+
+    if slow:
+        await asyncio.sleep(1)
+        closed = sum(1 for socket in slow if socket.close_code is not None)
+        print(f"slow consumers closed by the server: {closed}/{len(slow)}")
+
+    for task in readers:
+        task.cancel()
+    await redis.close()
+    await asyncio.gather(*(socket.close() for socket in [*idle, *probes, *slow]), return_exceptions=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ws-url", default="ws://localhost:8000/ws/updates")
+    parser.add_argument("--redis-url", default="redis://localhost:6379/0")
+    parser.add_argument("--idle", type=int, default=10000, help="Idle sockets subscribed to other products")
+    parser.add_argument("--products", type=int, default=1000, help="Distinct products the idle sockets watch")
+    parser.add_argument("--probes", type=int, default=20, help="Sockets on the hot product measuring latency")
+    parser.add_argument("--slow", type=int, default=5, help="Sockets on the hot product that never read")
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--interval", type=float, default=0.01, help="Seconds between published messages")
+    parser.add_argument("--payload-bytes", type=int, default=16384, help="Padding so slow sockets fill up")
+    parser.add_argument("--ramp-concurrency", type=int, default=200)
+    parser.add_argument("--timeout", type=float, default=60)
+    asyncio.run(main(parser.parse_args()))
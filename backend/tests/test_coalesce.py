@@ -0,0 +1,85 @@
+import asyncio
+
+from app.utils.coalesce import PriceCoalescer, merge_price_updates
+
+WINDOW_MS = 50
+
+
+def update(product_id, source_id, price, published_at=None):
+    return {
+        "type": "PRICE_UPDATE", "product_id": product_id, "source_id": source_id,
+        "source_name": f"source-{source_id}", "new_price": price, "published_at": published_at,
+    }
+
+
+def test_merge_keeps_latest_price_per_source_in_arrival_order():
+    merged = merge_price_updates(1, [
+        update(1, 10, 5.0, published_at=100.0),
+        update(1, 20, 4.0),
+        update(1, 10, 6.0),
+    ])
+    assert merged["type"] == "PRICE_UPDATES"
+    assert merged["product_id"] == 1
+    assert [(u["source_id"], u["new_price"]) for u in merged["updates"]] == [(20, 4.0), (10, 6.0)]
+    assert merged["lowest_price"] == 4.0
+    assert merged["coalesced"] == 3
+    assert merged["published_at"] == 100.0
+
+
+def test_merge_treats_source_id_zero_as_a_source():
+    merged = merge_price_updates(1, [update(1, 0, 3.0), update(1, 0, 2.0)])
+    assert [(u["source_id"], u["new_price"]) for u in merged["updates"]] == [(0, 2.0)]
+
+
+def test_merge_without_prices_has_no_lowest_price():
+    assert merge_price_updates(1, [update(1, 10, None)])["lowest_price"] is None
+
+
+def test_coalescer_sends_leading_update_then_merges_the_window():
+    async def scenario():
+        sent = []
+        coalescer = PriceCoalescer(WINDOW_MS, lambda message, event_id: sent.append((event_id, message)))
+        coalescer.add("1-0", update(1, 10, 5.0))
+        assert [event_id for event_id, _ in sent] == ["1-0"]
+
+        coalescer.add("2-0", update(1, 10, 4.0))
+        coalescer.add("3-0", update(1, 20, 3.0))
+        assert len(sent) == 1
+        assert coalescer.oldest_buffered() == "2-0"
+
+        await asyncio.sleep(WINDOW_MS / 1000 * 1.5)
+        assert [event_id for event_id, _ in sent] == ["1-0", "3-0"]
+        assert sent[1][1]["coalesced"] == 2
+        assert coalescer.oldest_buffered() is None
+
+        # The trailing send opened another window; once it closes quietly the next update leads again
+        await asyncio.sleep(WINDOW_MS / 1000 * 1.5)
+        coalescer.add("4-0", update(1, 10, 2.0))
+        assert [event_id for event_id, _ in sent] == ["1-0", "3-0", "4-0"]
+        return coalescer
+
+    coalescer = asyncio.run(scenario())
+    stats = coalescer.stats()
+    assert stats["coalesce_events_in"] == 4
+    assert stats["coalesce_messages_out"] == 3
+
+
+def test_coalescer_windows_are_per_product():
+    async def scenario():
+        sent = []
+        coalescer = PriceCoalescer(WINDOW_MS, lambda message, event_id: sent.append(event_id))
+        coalescer.add("1-0", update(1, 10, 5.0))
+        coalescer.add("2-0", update(2, 10, 5.0))
+        coalescer.add("3-0", update(1, 10, 4.0))
+        coalescer.add("4-0", update(2, 10, 4.0))
+        assert sent == ["1-0", "2-0"]
+        # The oldest buffer is product 1's, created by its first held event
+        assert coalescer.oldest_buffered() == "3-0"
+        await asyncio.sleep(WINDOW_MS / 1000 * 1.5)
+        assert sent == ["1-0", "2-0", "3-0", "4-0"]
+
+    asyncio.run(scenario())
+
+
+def test_coalescer_with_zero_window_is_disabled():
+    assert not PriceCoalescer(0, lambda message, event_id: None).enabled
@@ -0,0 +1,116 @@
+import asyncio
+import json
+import time
+
+from app.utils.coalesce import PriceCoalescer
+from app.utils.websocket import ConnectionManager, _event_key, _previous_event_id, topics_for
+
+WINDOW_MS = 50
+
+
+def update(product_id, source_id, price):
+    return {"type": "PRICE_UPDATE", "product_id": product_id, "source_id": source_id, "new_price": price}
+
+
+def alert(product_id, user_id):
+    return {"type": "PRICE_ALERT", "product_id": product_id, "user_id": user_id, "alert_price": 1.0}
+
+
+def make_manager(window_ms=WINDOW_MS) -> ConnectionManager:
+    manager = ConnectionManager()
+    manager.coalescer = PriceCoalescer(window_ms, manager._emit_coalesced)
+    return manager
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+
+    async def close(self, code=None):
+        pass
+
+
+def test_previous_event_id():
+    assert _previous_event_id("5-3") == "5-2"
+    assert _previous_event_id("5-0") == f"4-{2 ** 64 - 1}"
+    assert _previous_event_id("0-0") == "0-0"
+    assert _event_key(_previous_event_id("5-0")) < _event_key("5-0")
+
+
+def test_alerts_are_routed_only_to_their_user():
+    assert topics_for(alert(3, "a@example.com")) == ["user:a@example.com"]
+    assert topics_for(alert(3, None)) == []
+    assert topics_for(update(3, 1, 2.0)) == ["product:3"]
+
+
+def test_cursor_for_stays_before_a_buffered_event():
+    async def scenario():
+        manager = make_manager()
+        manager.subscribers["product:1"] = set()
+        manager.publish_event("1-0", json.dumps(update(1, 1, 10.0)), time.time())
+        assert manager.cursor_for("1-0") == "1-0"
+
+        manager.publish_event("2-0", json.dumps(update(1, 1, 9.0)), time.time())
+        assert manager.coalescer.oldest_buffered() == "2-0"
+        assert manager.cursor_for("3-0") == _previous_event_id("2-0")
+        # Ids before the held event are not capped
+        assert manager.cursor_for("1-5") == "1-5"
+        assert manager.cursor_for(None) is None
+
+        await asyncio.sleep(WINDOW_MS / 1000 * 1.5)
+        assert manager.cursor_for("3-0") == "3-0"
+
+    asyncio.run(scenario())
+
+
+def test_live_cursor_never_passes_an_event_held_for_another_topic():
+    async def scenario():
+        manager = make_manager()
+        websocket = FakeWebSocket()
+        await manager.connect(websocket, ["product:1", "product:2", "user:x"])
+
+        def publish(event_id, data):
+            manager.publish_event(event_id, json.dumps(data), time.time())
+
+        publish("1-0", update(1, 1, 10.0))  # leads product 1's window
+        publish("2-0", update(1, 1, 9.0))   # held
+        publish("3-0", update(2, 5, 7.0))   # leads product 2's window
+        publish("4-0", alert(3, "x"))
+        await asyncio.sleep(WINDOW_MS / 1000 * 1.5)
+        return [(m["event_id"], m["cursor"]) for m in websocket.sent if "event_id" in m]
+
+    held = _previous_event_id("2-0")
+    assert asyncio.run(scenario()) == [("1-0", "1-0"), ("3-0", held), ("4-0", held), ("2-0", "2-0")]
+
+
+def test_replay_cursor_is_capped_by_merged_messages_still_to_come():
+    manager = make_manager()
+    events = [
+        ("1-0", update(1, 1, 10.0)),
+        ("2-0", update(2, 1, 10.0)),
+        ("3-0", alert(3, "x")),
+        ("4-0", update(1, 1, 8.0)),
+    ]
+    matched = [(event_id, json.dumps(data), data) for event_id, data in events]
+    messages = [json.loads(text) for _, text in manager._replay_messages(matched)]
+
+    # Product 1 merges 1-0 and 4-0 into the last message, so nothing before it may pass 1-0
+    assert [(m["type"], m["event_id"], m["cursor"]) for m in messages] == [
+        ("PRICE_UPDATES", "2-0", _previous_event_id("1-0")),
+        ("PRICE_ALERT", "3-0", _previous_event_id("1-0")),
+        ("PRICE_UPDATES", "4-0", "4-0"),
+    ]
+    assert messages[2]["coalesced"] == 2
+
+
+def test_replay_without_coalescing_uses_event_ids():
+    manager = make_manager(window_ms=0)
+    data = update(1, 1, 10.0)
+    messages = manager._replay_messages([("1-0", json.dumps(data), data), ("2-0", json.dumps(data), data)])
+    assert [json.loads(text)["cursor"] for _, text in messages] == ["1-0", "2-0"]
@@ -10,8 +10,10 @@ interface LayoutProps {
 
 export default function Layout({ children }: LayoutProps) {
   const location = useLocation();
-  const { user, logout, getAuthIdentifier } = useAuth();
-  const { lastMessage } = useWebSocket();
+  const { user, logout, getAuthIdentifier, token } = useAuth();
+  const identifier = getAuthIdentifier();
+  // Alerts arrive on the user's own topic; a signed-in user's topic needs their token
+  const { lastMessage } = useWebSocket(identifier ? [`user:${identifier}`] : [], token);
 
   useEffect(() => {
     if (lastMessage && lastMessage.type === 'PRICE_ALERT') {
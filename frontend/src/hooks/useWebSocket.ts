@@ -1,47 +1,113 @@
 import { useEffect, useRef, useState } from 'react';
 
 const WS_URL = import.meta.env.VITE_WS_URL || 'ws://localhost:8000';
+const RECONNECT_DELAY_MS = 3000;
 
-export function useWebSocket(url: string = `${WS_URL}/ws/updates`) {
+// Stream ids are "<ms>-<seq>"
+const compareEventIds = (a: string, b: string) => {
+  const [aMs, aSeq] = a.split('-').map(Number);
+  const [bMs, bSeq] = b.split('-').map(Number);
+  return aMs - bMs || aSeq - bSeq;
+};
+
+// Topics: `product:<id>` for price updates, `user:<email or anonymous id>` for alerts.
+// The server only sends messages for subscribed topics. Events carry an `event_id` and
+// a resume `cursor`, which stays behind any event the server still holds for coalescing.
+// After a reconnect the hook resubscribes from the cursor and the server replays what was
+// missed, or sends RESYNC_REQUIRED when the gap is too old to replay. Events replayed
+// that had already arrived are skipped by event_id.
+export function useWebSocket(
+  topics: string[] = [],
+  token: string | null = null,
+  url: string = `${WS_URL}/ws/updates`
+) {
   const [isConnected, setIsConnected] = useState(false);
   const [lastMessage, setLastMessage] = useState<any>(null);
   const ws = useRef<WebSocket | null>(null);
+  const lastEventId = useRef<string | null>(null);
+  // Event ids received after the cursor, which a resume from it would replay
+  const seenEventIds = useRef<Set<string>>(new Set());
+  const resumeFrom = useRef<string | null>(null);
+  const topicsKey = topics.join(',');
 
   useEffect(() => {
-    try {
-      ws.current = new WebSocket(url);
-
-      ws.current.onopen = () => {
-        console.log('WebSocket connected');
-        setIsConnected(true);
-      };
-
-      ws.current.onmessage = (event) => {
-        try {
-          const data = JSON.parse(event.data);
-          setLastMessage(data);
-        } catch {
-          setLastMessage(event.data);
-        }
-      };
-
-      ws.current.onclose = () => {
-        console.log('WebSocket disconnected');
-        setIsConnected(false);
-      };
-
-      ws.current.onerror = (error) => {
-        console.error('WebSocket error:', error);
-      };
-    } catch (error) {
-      console.error('Failed to create WebSocket:', error);
-    }
+    let reconnectTimer: ReturnType<typeof setTimeout> | undefined;
+    let unmounted = false;
+
+    const connect = () => {
+      try {
+        ws.current = new WebSocket(url);
+
+        ws.current.onopen = () => {
+          console.log('WebSocket connected');
+          setIsConnected(true);
+        };
+
+        ws.current.onmessage = (event) => {
+          try {
+            const data = JSON.parse(event.data);
+            if (data.event_id) {
+              if (seenEventIds.current.has(data.event_id)) return;
+              seenEventIds.current.add(data.event_id);
+            }
+            if (data.cursor) {
+              // Live events held back during a resume can carry an older cursor; never move back
+              if (!lastEventId.current || compareEventIds(data.cursor, lastEventId.current) > 0) {
+                lastEventId.current = data.cursor;
+                seenEventIds.current.forEach((id) => {
+                  if (compareEventIds(id, data.cursor) <= 0) seenEventIds.current.delete(id);
+                });
+              }
+            } else if (data.type === 'SUBSCRIBED' && !lastEventId.current) {
+              lastEventId.current = data.last_event_id;
+            }
+            setLastMessage(data);
+          } catch {
+            setLastMessage(event.data);
+          }
+        };
+
+        ws.current.onclose = () => {
+          console.log('WebSocket disconnected');
+          setIsConnected(false);
+          resumeFrom.current = lastEventId.current;
+          // Dropped as a slow consumer or the server restarted: come back and resubscribe
+          if (!unmounted) reconnectTimer = setTimeout(connect, RECONNECT_DELAY_MS);
+        };
+
+        ws.current.onerror = (error) => {
+          console.error('WebSocket error:', error);
+        };
+      } catch (error) {
+        console.error('Failed to create WebSocket:', error);
+      }
+    };
+
+    connect();
 
     return () => {
+      unmounted = true;
+      clearTimeout(reconnectTimer);
       ws.current?.close();
     };
   }, [url]);
 
+  // (Re)subscribe on every (re)connect and whenever the topics change
+  useEffect(() => {
+    const socket = ws.current;
+    if (!isConnected || !socket || !topicsKey) return;
+    const subscribed = topicsKey.split(',');
+    // Only a reconnect resumes; a new set of topics starts from now
+    const since = resumeFrom.current;
+    resumeFrom.current = null;
+    socket.send(JSON.stringify({ action: 'subscribe', topics: subscribed, token, ...(since ? { since } : {}) }));
+    return () => {
+      if (socket.readyState === WebSocket.OPEN) {
+        socket.send(JSON.stringify({ action: 'unsubscribe', topics: subscribed }));
+      }
+    };
+  }, [isConnected, topicsKey, token]);
+
   const sendMessage = (message: any) => {
     if (ws.current && isConnected) {
       ws.current.send(typeof message === 'string' ? message : JSON.stringify(message));
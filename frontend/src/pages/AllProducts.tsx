@@ -1,18 +1,48 @@
 // frontend/src/pages/AllProducts.tsx
-import { useState, useEffect } from 'react';
-import { getProducts, Product } from '../services/api';
+import { useState, useEffect, useCallback } from 'react';
+import { getProducts, ProductListItem, ProductListQuery } from '../services/api';
 import { Link } from 'react-router-dom';
 import { List } from 'lucide-react'; // Example Icon
 
+const PAGE_SIZE = 60;
+
+interface Filters {
+  source: string;
+  brand: string;
+  min_price: string;
+  max_price: string;
+  in_stock: boolean;
+}
+
+const EMPTY_FILTERS: Filters = { source: '', brand: '', min_price: '', max_price: '', in_stock: false };
+
+// Only send the filters that are set
+const toQuery = (filters: Filters, cursor?: number): ProductListQuery => ({
+  limit: PAGE_SIZE,
+  cursor,
+  source: filters.source.trim() || undefined,
+  brand: filters.brand.trim() || undefined,
+  min_price: filters.min_price ? Number(filters.min_price) : undefined,
+  max_price: filters.max_price ? Number(filters.max_price) : undefined,
+  in_stock: filters.in_stock || undefined,
+});
+
 export default function AllProducts() {
-  const [products, setProducts] = useState<Product[]>([]);
+  const [products, setProducts] = useState<ProductListItem[]>([]);
+  const [nextCursor, setNextCursor] = useState<number | null>(null);
+  const [filters, setFilters] = useState<Filters>(EMPTY_FILTERS);
+  const [appliedFilters, setAppliedFilters] = useState<Filters>(EMPTY_FILTERS);
   const [isLoading, setIsLoading] = useState(true);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
 
+  // First page whenever the applied filters change
   useEffect(() => {
     const fetchProducts = async () => {
+      setIsLoading(true);
       try {
-        const productData = await getProducts(0, 500); // Fetch a large number
-        setProducts(productData);
+        const page = await getProducts(toQuery(appliedFilters));
+        setProducts(page.items);
+        setNextCursor(page.next_cursor ?? null);
       } catch (error) {
         console.error("Failed to fetch all products:", error);
       } finally {
@@ -20,41 +50,123 @@ export default function AllProducts() {
       }
     };
     fetchProducts();
-  }, []);
+  }, [appliedFilters]);
+
+  const loadMore = useCallback(async () => {
+    if (nextCursor === null) return;
+    setIsLoadingMore(true);
+    try {
+      const page = await getProducts(toQuery(appliedFilters, nextCursor));
+      setProducts(prev => [...prev, ...page.items]);
+      setNextCursor(page.next_cursor ?? null);
+    } catch (error) {
+      console.error("Failed to fetch more products:", error);
+    } finally {
+      setIsLoadingMore(false);
+    }
+  }, [appliedFilters, nextCursor]);
 
-  if (isLoading) {
-    return <div className="text-center p-8">Loading all tracked products...</div>;
-  }
+  const handleApply = (e: React.FormEvent) => {
+    e.preventDefault();
+    setAppliedFilters({ ...filters });
+  };
+
+  const handleReset = () => {
+    setFilters(EMPTY_FILTERS);
+    setAppliedFilters(EMPTY_FILTERS);
+  };
 
   return (
     <div className="space-y-6">
       <div className="flex items-center space-x-2">
         <List className="w-6 h-6" />
-        <h2 className="text-2xl font-semibold">All Tracked Products ({products.length})</h2>
+        <h2 className="text-2xl font-semibold">All Tracked Products ({products.length}{nextCursor !== null ? '+' : ''})</h2>
       </div>
-      
-      {products.length > 0 ? (
-        <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-4">
-          {products.map((product) => (
-            <div key={product.id} className="card p-4 flex flex-col justify-between">
-              <div>
-                <img src={product.image_url || 'https://via.placeholder.com/150'} alt={product.title} className="rounded-md object-contain h-40 w-full mb-3" />
-                <h3 className="font-medium text-sm mb-1 line-clamp-2">{product.title}</h3>
-                <p className="text-xs text-gray-500 dark:text-gray-400 mb-2">
-                  Tracked on: {new Date(product.created_at).toLocaleDateString()}
-                </p>
+
+      <form onSubmit={handleApply} className="card p-4 flex flex-wrap items-end gap-3">
+        <input
+          type="text"
+          placeholder="Source (e.g. amazon.in)"
+          value={filters.source}
+          onChange={e => setFilters({ ...filters, source: e.target.value })}
+          className="input text-sm"
+        />
+        <input
+          type="text"
+          placeholder="Brand"
+          value={filters.brand}
+          onChange={e => setFilters({ ...filters, brand: e.target.value })}
+          className="input text-sm"
+        />
+        <input
+          type="number"
+          min="0"
+          placeholder="Min ₹"
+          value={filters.min_price}
+          onChange={e => setFilters({ ...filters, min_price: e.target.value })}
+          className="input text-sm w-28"
+        />
+        <input
+          type="number"
+          min="0"
+          placeholder="Max ₹"
+          value={filters.max_price}
+          onChange={e => setFilters({ ...filters, max_price: e.target.value })}
+          className="input text-sm w-28"
+        />
+        <label className="flex items-center space-x-2 text-sm">
+          <input
+            type="checkbox"
+            checked={filters.in_stock}
+            onChange={e => setFilters({ ...filters, in_stock: e.target.checked })}
+          />
+          <span>In stock only</span>
+        </label>
+        <button type="submit" className="btn-primary text-sm">Apply</button>
+        <button type="button" onClick={handleReset} className="btn-secondary text-sm">Reset</button>
+      </form>
+
+      {isLoading ? (
+        <div className="text-center p-8">Loading all tracked products...</div>
+      ) : products.length > 0 ? (
+        <>
+          <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-4">
+            {products.map((product) => (
+              <div key={product.id} className="card p-4 flex flex-col justify-between">
+                <div>
+                  <img src={product.image_url || 'https://via.placeholder.com/150'} alt={product.title} className="rounded-md object-contain h-40 w-full mb-3" />
+                  <h3 className="font-medium text-sm mb-1 line-clamp-2">{product.title}</h3>
+                  <div className="flex items-center justify-between text-sm mb-1">
+                    <span className="font-bold">
+                      {product.lowest_price != null ? `₹${product.lowest_price.toLocaleString()}` : 'N/A'}
+                    </span>
+                    {!product.in_stock && (
+                      <span className="text-xs text-red-500">Out of stock</span>
+                    )}
+                  </div>
+                  <p className="text-xs text-gray-500 dark:text-gray-400 mb-2">
+                    Tracked on: {new Date(product.created_at).toLocaleDateString()}
+                  </p>
+                </div>
+                <Link to={`/product/${product.id}`} className="btn-secondary text-sm mt-3 w-full text-center">
+                  View Details
+                </Link>
               </div>
-              <Link to={`/product/${product.id}`} className="btn-secondary text-sm mt-3 w-full text-center">
-                View Details
-              </Link>
+            ))}
+          </div>
+          {nextCursor !== null && (
+            <div className="text-center">
+              <button onClick={loadMore} disabled={isLoadingMore} className="btn-secondary text-sm">
+                {isLoadingMore ? 'Loading...' : 'Load more'}
+              </button>
             </div>
-          ))}
-        </div>
+          )}
+        </>
       ) : (
         <div className="card text-center py-8">
-          <p className="text-gray-500">No products have been tracked yet.</p>
+          <p className="text-gray-500">No products match these filters.</p>
         </div>
       )}
     </div>
   );
-}
\ No newline at end of file
+}
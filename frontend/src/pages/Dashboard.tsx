@@ -18,14 +18,12 @@ export default function Dashboard() {
       try {
         // Fetch stats and recent products in parallel
         const statsPromise = getDashboardStats();
-        const productsPromise = getProducts();
+        const productsPromise = getProducts({ limit: 3 }); // The listing is newest first
         
-        const [statsData, products] = await Promise.all([statsPromise, productsPromise]);
+        const [statsData, productPage] = await Promise.all([statsPromise, productsPromise]);
         
         setStats(statsData);
-
-        const sortedProducts = [...products].sort((a, b) => new Date(b.created_at).getTime() - new Date(a.created_at).getTime());
-        setRecentActivity(sortedProducts.slice(0, 3));
+        setRecentActivity(productPage.items);
 
       } catch (error) {
         console.error("Failed to fetch dashboard data:", error);
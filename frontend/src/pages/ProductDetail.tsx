@@ -150,6 +150,9 @@ type RangeOption = "1h" | "6h" | "24h" | "7d" | "30d" | "90d" | "1y" | "all";
 // (The constant is now gone)
 // --- END FIX ---
 
+// The chart is a few hundred pixels wide, so more points than this are never visible
+const HISTORY_MAX_POINTS = 600;
+
 
 // --- Main Component ---
 export default function ProductDetail() {
@@ -161,8 +164,9 @@ export default function ProductDetail() {
   const [isLoading, setIsLoading] = useState(true);
   const [isWatchlisted, setIsWatchlisted] = useState(false);
   const [userWatchlist, setUserWatchlist] = useState<Watchlist[]>([]);
-  const { lastMessage } = useWebSocket();
   const numProductId = parseInt(productId || "0");
+  // Only this product's updates are sent to the page
+  const { lastMessage } = useWebSocket(numProductId ? [`product:${numProductId}`] : []);
   const { user } = useAuth();
   const [scamScore, setScamScore] = useState<ScamScore | null>(null);
   const [isScamScoreLoading, setIsScamScoreLoading] = useState(true);
@@ -173,62 +177,78 @@ export default function ProductDetail() {
   
   const [isHistoryLoading, setIsHistoryLoading] = useState(false);
 
-  // Live update WebSocket Effect
+  // Missed more updates than the server can replay: refresh current prices in place
   useEffect(() => {
-    if (lastMessage && lastMessage.type === 'PRICE_UPDATE' && lastMessage.product_id === numProductId) {
-      console.log("Live update received!", lastMessage);
-      
-      // 1. UPDATE CURRENT PRICE
-      setProduct(prevProduct => {
-        if (!prevProduct) return null;
+    if (lastMessage?.type !== 'RESYNC_REQUIRED' || !numProductId) return;
+    getProduct(numProductId)
+      .then(productData => setProduct(productData))
+      .catch(error => console.error("Failed to resync product:", error));
+  }, [lastMessage, numProductId]);
 
+  // Live update WebSocket Effect
+  useEffect(() => {
+    if (!lastMessage || lastMessage.product_id !== numProductId) return;
+    // PRICE_UPDATES carries the latest price per source from one coalescing window
+    const updates: any[] | null =
+      lastMessage.type === 'PRICE_UPDATES' ? lastMessage.updates :
+      lastMessage.type === 'PRICE_UPDATE' ? [lastMessage] : null;
+    if (!updates || updates.length === 0) return;
+    console.log("Live update received!", lastMessage);
+
+    // 1. UPDATE CURRENT PRICES
+    setProduct(prevProduct => {
+      if (!prevProduct) return null;
+
+      let updatedPrices = prevProduct.prices;
+      for (const update of updates) {
         let sourceExists = false;
-        const updatedPrices = prevProduct.prices.map(priceInfo => {
-          if (priceInfo.source_name.toLowerCase() === lastMessage.source_name.toLowerCase()) {
+        updatedPrices = updatedPrices.map(priceInfo => {
+          if (priceInfo.source_name.toLowerCase() === update.source_name?.toLowerCase()) {
             sourceExists = true;
             return {
                 ...priceInfo,
-                current_price: lastMessage.new_price,
-                seller_name: lastMessage.seller_name,
-                seller_rating: lastMessage.seller_rating,
-                seller_review_count: lastMessage.seller_review_count,
-                avg_review_sentiment: lastMessage.avg_review_sentiment,
+                current_price: update.new_price,
+                seller_name: update.seller_name,
+                seller_rating: update.seller_rating,
+                seller_review_count: update.seller_review_count,
+                avg_review_sentiment: update.avg_review_sentiment,
             };
           }
           return priceInfo;
         });
 
-        if (!sourceExists && lastMessage.source_name) {
-            updatedPrices.push({
-                source_name: lastMessage.source_name,
-                current_price: lastMessage.new_price,
+        if (!sourceExists && update.source_name) {
+            updatedPrices = [...updatedPrices, {
+                source_name: update.source_name,
+                current_price: update.new_price,
                 currency: "INR",
                 availability: "In Stock",
                 in_stock: true,
                 url: "",
-                seller_name: lastMessage.seller_name,
-                seller_rating: lastMessage.seller_rating,
-                seller_review_count: lastMessage.seller_review_count,
-                avg_review_sentiment: lastMessage.avg_review_sentiment,
-            });
+                seller_name: update.seller_name,
+                seller_rating: update.seller_rating,
+                seller_review_count: update.seller_review_count,
+                avg_review_sentiment: update.avg_review_sentiment,
+            }];
         }
-
-        const newLowest = Math.min(
-          prevProduct.lowest_ever_price || Infinity,
-          lastMessage.new_price
-        );
-        return { ...prevProduct, prices: updatedPrices, lowest_ever_price: newLowest };
-      });
-
-      // 2. UPDATE PRICE HISTORY (Only if viewing recent data)
-      if (historyRange === '1h' || historyRange === '6h' || historyRange === '24h' || historyRange === '7d' || historyRange === '30d') {
-        const newHistoryItem: PriceHistoryItem = {
-          date: new Date().toISOString(),
-          price: lastMessage.new_price,
-          source: lastMessage.seller_name || lastMessage.source_name || 'Unknown'
-        };
-        setHistory(prevHistory => [...prevHistory, newHistoryItem]);
       }
+
+      const newLowest = Math.min(
+        prevProduct.lowest_ever_price || Infinity,
+        ...updates.map(update => update.new_price)
+      );
+      return { ...prevProduct, prices: updatedPrices, lowest_ever_price: newLowest };
+    });
+
+    // 2. UPDATE PRICE HISTORY (Only if viewing recent data)
+    if (historyRange === '1h' || historyRange === '6h' || historyRange === '24h' || historyRange === '7d' || historyRange === '30d') {
+      const now = new Date().toISOString();
+      const newHistoryItems: PriceHistoryItem[] = updates.map(update => ({
+        date: now,
+        price: update.new_price,
+        source: update.seller_name || update.source_name || 'Unknown'
+      }));
+      setHistory(prevHistory => [...prevHistory, ...newHistoryItems]);
     }
   }, [lastMessage, numProductId, historyRange]);
 
@@ -299,7 +319,7 @@ export default function ProductDetail() {
       setHistory([]);
       try {
         // We pass the new RangeOption type, which is valid
-        const historyData = await getPriceHistory(numProductId, historyRange);
+        const historyData = await getPriceHistory(numProductId, historyRange, HISTORY_MAX_POINTS);
         
         const formattedHistory = historyData.map((h: PriceHistoryItem) => ({
             ...h,
@@ -6,7 +6,6 @@ import {
   deleteAllSales,
   deleteUser,  
   exportAllData, 
-  ProductWithHistory,
   updatePushSubscription,
   VAPID_PUBLIC_KEY
 } from '../services/api';
@@ -260,21 +259,19 @@ export default function Settings({ darkMode, setDarkMode }: SettingsProps) {
     setIsExporting(true);
     alert("Starting data export. This may take a moment...");
     try {
-      const productsWithHistory: ProductWithHistory[] = await exportAllData();
+      const blob = await exportAllData('ndjson');
 
 
-      if (!productsWithHistory || productsWithHistory.length === 0) {
+      if (blob.size === 0) {
         alert("No products found to export.");
         setIsExporting(false);
         return;
       }
 
 
-      const jsonData = JSON.stringify(productsWithHistory, null, 2);
-      const blob = new Blob([jsonData], { type: 'application/json' });
       const link = document.createElement('a');
       link.href = URL.createObjectURL(blob);
-      link.download = `pricetrackr_export_full_${new Date().toISOString().split('T')[0]}.json`;
+      link.download = `pricetrackr_export_full_${new Date().toISOString().split('T')[0]}.ndjson`;
       document.body.appendChild(link);
       link.click();
       document.body.removeChild(link);
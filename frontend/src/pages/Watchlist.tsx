@@ -100,6 +100,10 @@ export default function Watchlist() {
                                 <span className="text-gray-500 dark:text-gray-400">Current Price: </span>
                                 <span className="font-bold">₹{priceInfo?.current_price.toLocaleString() || 'N/A'}</span>
                             </div>
+                            <div>
+                                <span className="text-gray-500 dark:text-gray-400">Lowest Ever: </span>
+                                <span className="font-medium">₹{watchlistItem?.lowest_price?.toLocaleString() || 'N/A'}</span>
+                            </div>
                         </div>
                         <div className="flex items-center space-x-2 text-xs text-gray-500 mt-2">
                           {alertPrice ? (
@@ -47,6 +47,26 @@ export interface Product {
   updated_at?: string;
 }
 
+export interface ProductListItem extends Product {
+  lowest_price?: number | null;
+  in_stock: boolean;
+}
+
+export interface ProductPage {
+  items: ProductListItem[];
+  next_cursor?: number | null;
+}
+
+export interface ProductListQuery {
+  limit?: number;
+  cursor?: number;
+  source?: string;
+  brand?: string;
+  min_price?: number;
+  max_price?: number;
+  in_stock?: boolean;
+}
+
 // --- THIS IS THE UPDATED INTERFACE ---
 // It now correctly reflects the normalized schema
 export interface PriceInfo {
@@ -56,6 +76,12 @@ export interface PriceInfo {
   availability: string;
   in_stock: boolean;
   url: string;
+  lowest_price?: number | null;
+  lowest_price_at?: string | null;
+  highest_price?: number | null;
+  highest_price_at?: string | null;
+  lowest_30d_price?: number | null;
+  avg_30d_price?: number | null;
   seller_name?: string | null;
   seller_rating?: string | null;
   seller_review_count?: string | null; // This now comes from the 'seller' table
@@ -87,6 +113,10 @@ export interface Watchlist {
   product_id: number;
   alert_rules?: any;
   created_at: string;
+  lowest_price?: number | null;
+  highest_price?: number | null;
+  lowest_30d_price?: number | null;
+  avg_30d_price?: number | null;
 }
 
 export interface SpaceStats {
@@ -135,8 +165,8 @@ export interface ScamScore {
 // --- API FUNCTIONS ---
 
 // Products API
-export const getProducts = async (skip = 0, limit = 100): Promise<Product[]> => {
-  const response = await api.get('/products/', { params: { skip, limit } });
+export const getProducts = async (query: ProductListQuery = {}): Promise<ProductPage> => {
+  const response = await api.get('/products/', { params: query });
   return response.data;
 };
 
@@ -146,9 +176,11 @@ export const getProduct = async (productId: number): Promise<ProductDetail> => {
 };
 
 // --- THIS IS THE MODIFIED FUNCTION ---
-export const getPriceHistory = async (productId: number, range = "30d"): Promise<PriceHistoryItem[]> => {
+export const getPriceHistory = async (productId: number, range = "30d", maxPoints?: number): Promise<PriceHistoryItem[]> => {
   // It now takes a 'range' string instead of 'days'
-  const response = await api.get(`/products/${productId}/history`, { params: { range } });
+  // maxPoints lets the server downsample long ranges to what the chart can draw
+  const params = maxPoints ? { range, max_points: maxPoints } : { range };
+  const response = await api.get(`/products/${productId}/history`, { params });
   return response.data;
 };
 // --- END MODIFIED FUNCTION ---
@@ -164,8 +196,9 @@ export const deleteProduct = async (productId: number) => {
 };
 
 // --- NEW EXPORT FUNCTION ---
-export const exportAllData = async (): Promise<ProductWithHistory[]> => {
-  const response = await api.get('/products/export');
+// Streams as NDJSON (one ProductWithHistory per line) or CSV; returned as a Blob ready to download
+export const exportAllData = async (format: 'ndjson' | 'csv' = 'ndjson'): Promise<Blob> => {
+  const response = await api.get('/products/export', { params: { format }, responseType: 'blob' });
   return response.data;
 };
 // --- END NEW FUNCTION ---
@@ -1,143 +1,393 @@
 # worker/playwright_scraper/aggregation.py
-from sqlalchemy import func, cast, Date, Integer
+import os
+from typing import Optional
+from sqlalchemy import func, cast, Date, Integer, BigInteger, literal, select, union_all, update
 from sqlalchemy.orm import Session
-from sqlalchemy.dialects.postgresql import insert
-from datetime import datetime, timedelta, timezone
+from sqlalchemy.dialects.postgresql import insert, array_agg, aggregate_order_by
+from datetime import date, datetime, time, timedelta, timezone
 
 # --- FIX: Import models from the new models.py file ---
 from .models import (
-    PriceLog, 
-    ProductSource, 
-    PriceHistoryDaily, 
-    PriceHistoryMonthly, 
+    PriceLog,
+    PriceHistoryHourly,
+    PriceHistoryDaily,
+    PriceHistoryMonthly,
+    AggregationWatermark,
+    ProductSourcePriceStats,
     SessionLocal
 )
 # --- END FIX ---
+from .partitions import ensure_partitions, drop_partitions_before, next_month
+from .redis_client import get_redis
 
+# --- Watermark Job Names ---
+HOURLY_JOB = "hourly"
+DAILY_JOB = "daily"
+MONTHLY_JOB = "monthly"
 
-def get_last_price_subquery(db: Session, date_trunc_unit: str, alias: str):
+# Bumping this key invalidates the backend's price history cache
+HISTORY_CACHE_GENERATION_KEY = "history:gen"
+
+# --- Hourly Tier Configuration ---
+# Hourly rows must outlive the 30 days that raw logs are served for
+HOURLY_RETENTION_DAYS = int(os.getenv("PRICE_HOURLY_RETENTION_DAYS", "35"))
+# An hour is rolled up only once it ended this long ago, so in-flight inserts are not missed
+HOURLY_GRACE_SECONDS = 300
+
+# Length of the trailing window in product_source_price_stats
+STATS_WINDOW_DAYS = 30
+
+
+def get_watermark(db: Session, job_name: str) -> Optional[date]:
+    """Returns the last bucket the job has fully aggregated, or None if it never ran."""
+    row = db.query(AggregationWatermark.watermark).filter(
+        AggregationWatermark.job_name == job_name
+    ).first()
+    return row[0] if row else None
+
+
+def set_watermark(db: Session, job_name: str, value: date):
+    """Moves the job's high-water mark. The caller commits, together with the bucket it covers."""
+    stmt = insert(AggregationWatermark).values(job_name=job_name, watermark=value)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=['job_name'],
+        set_={'watermark': stmt.excluded.watermark, 'updated_at': func.now()}
+    ))
+
+
+def get_watermark_at(db: Session, job_name: str, for_update: bool = False) -> Optional[datetime]:
+    """
+    Like get_watermark, for jobs that track an instant: everything before it is aggregated.
+    for_update locks the row until commit, which serializes the rollup with late writers.
+    The row is created (empty) first if missing, so even the first run has a row to lock.
+    """
+    query = db.query(AggregationWatermark.watermark_at).filter(
+        AggregationWatermark.job_name == job_name
+    )
+    if for_update:
+        db.execute(insert(AggregationWatermark).values(job_name=job_name).on_conflict_do_nothing(
+            index_elements=['job_name']
+        ))
+        query = query.with_for_update()
+    row = query.first()
+    return row[0] if row else None
+
+
+def set_watermark_at(db: Session, job_name: str, value: datetime):
+    stmt = insert(AggregationWatermark).values(job_name=job_name, watermark_at=value)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=['job_name'],
+        set_={'watermark_at': stmt.excluded.watermark_at, 'updated_at': func.now()}
+    ))
+
+
+def _day_bounds(day: date):
+    """UTC [start, end) timestamps for a day, so scraped_at is compared by range and the index is used."""
+    start = datetime.combine(day, time.min, tzinfo=timezone.utc)
+    return start, start + timedelta(days=1)
+
+
+def aggregate_hours(db: Session, start: datetime, end: datetime, sources=None) -> int:
+    """
+    Rolls the raw price logs in [start, end) into price_history_hourly, one row per source and hour.
+    sources (a select of product source ids) limits it to those sources, for re-rolling late rows.
+    """
+    # Truncated in UTC so buckets line up with the chunk bounds whatever the session time zone
+    hour = func.date_trunc('hour', PriceLog.scraped_at, 'UTC')
+    last_cents = array_agg(
+        aggregate_order_by(PriceLog.price_cents, PriceLog.scraped_at.desc())
+    )[1]
+
+    hourly_query = db.query(
+        PriceLog.product_source_id,
+        hour.label("hour"),
+        func.min(PriceLog.price_cents).label("min_cents"),
+        func.max(PriceLog.price_cents).label("max_cents"),
+        cast(func.avg(PriceLog.price_cents), Integer).label("avg_cents"),
+        last_cents.label("last_cents"),
+        func.max(PriceLog.currency).label("currency"),
+        func.count(PriceLog.id).label("samples")
+    ).filter(
+        PriceLog.scraped_at >= start,
+        PriceLog.scraped_at < end
+    ).group_by(
+        PriceLog.product_source_id,
+        hour
+    )
+    if sources is not None:
+        hourly_query = hourly_query.filter(PriceLog.product_source_id.in_(sources))
+
+    insert_stmt = insert(PriceHistoryHourly).from_select(
+        ['product_source_id', 'hour', 'min_cents', 'max_cents', 'avg_cents', 'last_cents', 'currency', 'samples'],
+        hourly_query
+    )
+    upsert_stmt = insert_stmt.on_conflict_do_update(
+        constraint='_hourly_product_source_hour_uc',
+        set_={
+            'min_cents': insert_stmt.excluded.min_cents,
+            'max_cents': insert_stmt.excluded.max_cents,
+            'avg_cents': insert_stmt.excluded.avg_cents,
+            'last_cents': insert_stmt.excluded.last_cents,
+            'currency': insert_stmt.excluded.currency,
+            'samples': insert_stmt.excluded.samples
+        }
+    )
+    return db.execute(upsert_stmt).rowcount
+
+
+def aggregate_day(db: Session, day: date) -> int:
     """
-    Helper to create a subquery that finds the latest price_cents for each (source_id, time_bucket).
-    This is complex SQL, translated to SQLAlchemy.
+    Rolls one day of raw price logs into price_history_daily.
+    min/max/avg/last/count are all computed in a single GROUP BY over that day only.
+    The raw rows stay until their monthly partition is dropped.
     """
-    # 1. Truncate the scrape time and get the row number, partitioned by source and bucket, ordered by time descending.
-    subq = db.query(
+    start, end = _day_bounds(day)
+
+    # Last price of the day, picked inside the same aggregate pass
+    last_cents = array_agg(
+        aggregate_order_by(PriceLog.price_cents, PriceLog.scraped_at.desc())
+    )[1]
+
+    daily_query = db.query(
         PriceLog.product_source_id,
-        PriceLog.price_cents,
-        func.date_trunc(date_trunc_unit, PriceLog.scraped_at).label("bucket"),
-        func.row_number().over(
-            partition_by=(
-                PriceLog.product_source_id,
-                func.date_trunc(date_trunc_unit, PriceLog.scraped_at)
-            ),
-            order_by=PriceLog.scraped_at.desc()
-        ).label("rn")
+        literal(day, Date).label("day"),
+        func.min(PriceLog.price_cents).label("min_cents"),
+        func.max(PriceLog.price_cents).label("max_cents"),
+        cast(func.avg(PriceLog.price_cents), Integer).label("avg_cents"),
+        last_cents.label("last_cents"),
+        func.max(PriceLog.currency).label("currency"),
+        func.count(PriceLog.id).label("samples")
     ).filter(
-        PriceLog.scraped_at <= datetime.now(timezone.utc) # Ensure we don't grab future timestamps
-    ).subquery('latest_prices_subq') # Added filter
-
-    # 2. Select only the rows where row_number = 1 (the latest price in that bucket)
-    last_price_q = db.query(
-        subq.c.product_source_id,
-        subq.c.bucket,
-        subq.c.price_cents.label(alias)
-    ).filter(subq.c.rn == 1).subquery('last_price_final_subq')
-    
-    return last_price_q
-
-def run_daily_aggregation():
+        PriceLog.scraped_at >= start,
+        PriceLog.scraped_at < end
+    ).group_by(
+        PriceLog.product_source_id
+    )
+
+    insert_stmt = insert(PriceHistoryDaily).from_select(
+        ['product_source_id', 'day', 'min_cents', 'max_cents', 'avg_cents', 'last_cents', 'currency', 'samples'],
+        daily_query
+    )
+    upsert_stmt = insert_stmt.on_conflict_do_update(
+        index_elements=['product_source_id', 'day'],
+        set_={
+            'min_cents': insert_stmt.excluded.min_cents,
+            'max_cents': insert_stmt.excluded.max_cents,
+            'avg_cents': insert_stmt.excluded.avg_cents,
+            'last_cents': insert_stmt.excluded.last_cents,
+            'currency': insert_stmt.excluded.currency,
+            'samples': insert_stmt.excluded.samples
+        }
+    )
+    upserted = db.execute(upsert_stmt).rowcount
+    print(f"[Aggregator] {day}: {upserted} daily rows.")
+    return upserted
+
+
+def aggregate_month(db: Session, month: date) -> int:
+    """Rolls one month of daily rows into price_history_monthly. The daily partition is dropped afterwards."""
+    end = next_month(month)
+
+    last_cents = array_agg(
+        aggregate_order_by(PriceHistoryDaily.last_cents, PriceHistoryDaily.day.desc())
+    )[1]
+
+    monthly_query = db.query(
+        PriceHistoryDaily.product_source_id,
+        literal(month, Date).label("month"),
+        func.min(PriceHistoryDaily.min_cents).label("min_cents"),
+        func.max(PriceHistoryDaily.max_cents).label("max_cents"),
+        cast(func.avg(PriceHistoryDaily.avg_cents), Integer).label("avg_cents"),
+        last_cents.label("last_cents"),
+        func.max(PriceHistoryDaily.currency).label("currency"),
+        func.sum(PriceHistoryDaily.samples).label("samples")
+    ).filter(
+        PriceHistoryDaily.day >= month,
+        PriceHistoryDaily.day < end
+    ).group_by(
+        PriceHistoryDaily.product_source_id
+    )
+
+    insert_stmt = insert(PriceHistoryMonthly).from_select(
+        ['product_source_id', 'month', 'min_cents', 'max_cents', 'avg_cents', 'last_cents', 'currency', 'samples'],
+        monthly_query
+    )
+    upsert_stmt = insert_stmt.on_conflict_do_update(
+        constraint='_monthly_product_source_month_uc',
+        set_={
+            'min_cents': insert_stmt.excluded.min_cents,
+            'max_cents': insert_stmt.excluded.max_cents,
+            'avg_cents': insert_stmt.excluded.avg_cents,
+            'last_cents': insert_stmt.excluded.last_cents,
+            'currency': insert_stmt.excluded.currency,
+            'samples': insert_stmt.excluded.samples
+        }
+    )
+    upserted = db.execute(upsert_stmt).rowcount
+    print(f"[Aggregator] {month:%Y-%m}: {upserted} monthly rows.")
+    return upserted
+
+
+def rebase_price_stats(db: Session, window_start: datetime) -> int:
+    """
+    Recomputes the trailing-window columns of product_source_price_stats from
+    window_start on, in two set-based updates. Hours before the hourly
+    watermark are read from price_history_hourly, the rest from the raw logs.
+    """
+    hourly_end = get_watermark_at(db, HOURLY_JOB) or window_start
+    raw_start = max(window_start, hourly_end)
+
+    hourly_part = select(
+        PriceHistoryHourly.product_source_id,
+        func.min(PriceHistoryHourly.min_cents).label("min_cents"),
+        func.sum(cast(PriceHistoryHourly.avg_cents, BigInteger) * PriceHistoryHourly.samples).label("sum_cents"),
+        func.sum(PriceHistoryHourly.samples).label("samples")
+    ).where(
+        PriceHistoryHourly.hour >= window_start,
+        PriceHistoryHourly.hour < hourly_end
+    ).group_by(PriceHistoryHourly.product_source_id)
+
+    raw_part = select(
+        PriceLog.product_source_id,
+        func.min(PriceLog.price_cents),
+        func.sum(cast(PriceLog.price_cents, BigInteger)),
+        func.count(PriceLog.id)
+    ).where(
+        PriceLog.scraped_at >= raw_start
+    ).group_by(PriceLog.product_source_id)
+
+    parts = union_all(hourly_part, raw_part).subquery()
+    window = select(
+        parts.c.product_source_id,
+        func.min(parts.c.min_cents).label("min_cents"),
+        func.sum(parts.c.sum_cents).label("sum_cents"),
+        func.sum(parts.c.samples).label("samples")
+    ).group_by(parts.c.product_source_id).subquery()
+
+    stats = ProductSourcePriceStats
+    # Sources with no samples left in the window
+    db.execute(update(stats).where(
+        stats.samples_30d > 0,
+        stats.product_source_id.not_in(select(window.c.product_source_id))
+    ).values(min_30d_cents=None, sum_30d_cents=0, samples_30d=0, window_start=window_start))
+
+    return db.execute(update(stats).where(
+        stats.product_source_id == window.c.product_source_id
+    ).values(
+        min_30d_cents=window.c.min_cents,
+        sum_30d_cents=window.c.sum_cents,
+        samples_30d=window.c.samples,
+        window_start=window_start
+    )).rowcount
+
+
+def drop_aggregated_raw(db: Session, watermark: date):
+    """Drops raw partitions whose every day is at or before the daily watermark."""
+    dropped = drop_partitions_before(db, "price_logs", watermark + timedelta(days=1))
+    db.commit()
+    if dropped:
+        print(f"[Aggregator] Retention dropped {dropped} raw partition(s).")
+
+
+def drop_aggregated_daily(db: Session, watermark: date):
+    """Drops daily partitions whose whole month is covered by the monthly watermark."""
+    dropped = drop_partitions_before(db, "price_history_daily", next_month(watermark))
+    db.commit()
+    if dropped:
+        print(f"[Aggregator] Retention dropped {dropped} daily partition(s).")
+
+
+def run_hourly_aggregation() -> bool:
+    """
+    Rolls completed hours of raw price logs into price_history_hourly.
+    Each run only reads the raw rows after the hourly watermark, a day at a time.
+    """
+    print("[Aggregator] Running HOURLY aggregation...")
+    db = SessionLocal()
+    try:
+        now = datetime.now(timezone.utc)
+        end = (now - timedelta(seconds=HOURLY_GRACE_SECONDS)).replace(minute=0, second=0, microsecond=0)
+        oldest_kept = (now - timedelta(days=HOURLY_RETENTION_DAYS)).replace(minute=0, second=0, microsecond=0)
+
+        start = get_watermark_at(db, HOURLY_JOB)
+        if start is None or start < oldest_kept:
+            start = oldest_kept
+
+        if start >= end:
+            print(f"[Aggregator] Hourly rollup already up to date (watermark {start:%Y-%m-%d %H:%M}).")
+            return False
+
+        rows = 0
+        while start < end:
+            chunk_end = min(start + timedelta(days=1), end)
+            # Buffered ingest can land rows behind the watermark; it takes this lock after
+            # inserting and re-rolls their hours itself, so every row is counted by one side
+            get_watermark_at(db, HOURLY_JOB, for_update=True)
+            rows += aggregate_hours(db, start, chunk_end)
+            set_watermark_at(db, HOURLY_JOB, chunk_end)
+            db.commit()
+            start = chunk_end
+
+        # The hourly tier only serves recent ranges; older history lives in the daily table
+        expired = db.query(PriceHistoryHourly).filter(
+            PriceHistoryHourly.hour < oldest_kept
+        ).delete(synchronize_session=False)
+        db.commit()
+        print(f"[Aggregator] Hourly aggregation complete. {rows} rows upserted, {expired} expired, watermark now {end:%Y-%m-%d %H:%M}.")
+        return rows > 0
+
+    except Exception as e:
+        db.rollback()
+        import traceback
+        print(f"❌ CRITICAL ERROR in run_hourly_aggregation: {e}\n{traceback.format_exc()}")
+    finally:
+        db.close()
+    return False
+
+
+def run_daily_aggregation() -> bool:
     """
     Aggregates raw price logs older than 30 days into daily summaries.
+    Only days after the stored watermark are visited, one day per transaction.
+    Raw logs are retired afterwards by dropping whole monthly partitions.
     """
     print("[Aggregator] Running DAILY aggregation...")
     db = SessionLocal()
     try:
         # Aggregate data from 30 days ago and older
-        thirty_days_ago = datetime.now(timezone.utc).date() - timedelta(days=30)
-        
-        print(f"[Aggregator] Aggregating raw data older than or equal to: {thirty_days_ago}")
-
-        # 1. Subquery for daily aggregates (MIN, MAX, AVG, COUNT)
-        agg_subquery = db.query(
-            PriceLog.product_source_id,
-            cast(PriceLog.scraped_at, Date).label("day"),
-            func.min(PriceLog.price_cents).label("min_cents"),
-            func.max(PriceLog.price_cents).label("max_cents"),
-            cast(func.avg(PriceLog.price_cents), Integer).label("avg_cents"),
-            func.max(PriceLog.currency).label("currency"),
-            func.count(PriceLog.id).label("samples")
-        ).filter(
-            cast(PriceLog.scraped_at, Date) <= thirty_days_ago
-        ).group_by(
-            PriceLog.product_source_id,
-            cast(PriceLog.scraped_at, Date)
-        ).subquery('daily_aggregates')
-
-        # 2. Subquery to get the LAST price for each day (most recent price log in that day)
-        last_price_subquery = get_last_price_subquery(db, 'day', 'last_cents')
-
-        # 3. Join aggregates with the last price
-        final_query = db.query(
-            agg_subquery.c.product_source_id,
-            agg_subquery.c.day,
-            agg_subquery.c.min_cents,
-            agg_subquery.c.max_cents,
-            agg_subquery.c.avg_cents,
-            last_price_subquery.c.last_cents,
-            agg_subquery.c.currency,
-            agg_subquery.c.samples
-        ).join(
-            last_price_subquery,
-            (agg_subquery.c.product_source_id == last_price_subquery.c.product_source_id) &
-            (agg_subquery.c.day == last_price_subquery.c.bucket)
-        )
+        cutoff = datetime.now(timezone.utc).date() - timedelta(days=30)
+        watermark = get_watermark(db, DAILY_JOB)
 
-        # 4. Use INSERT... ON CONFLICT (Upsert) to insert this data into price_history_daily
-        insert_stmt = insert(PriceHistoryDaily).from_select(
-            ['product_source_id', 'day', 'min_cents', 'max_cents', 'avg_cents', 'last_cents', 'currency', 'samples'],
-            final_query
-        )
-        
-        # This is the "ON CONFLICT DO UPDATE" part
-        upsert_stmt = insert_stmt.on_conflict_do_update(
-            constraint='_daily_product_source_day_uc', # The unique constraint we created
-            set_={
-                'min_cents': insert_stmt.excluded.min_cents,
-                'max_cents': insert_stmt.excluded.max_cents,
-                'avg_cents': insert_stmt.excluded.avg_cents,
-                'last_cents': insert_stmt.excluded.last_cents,
-                'currency': insert_stmt.excluded.currency,
-                'samples': insert_stmt.excluded.samples
-            }
-        )
-        
-        result = db.execute(upsert_stmt)
-        db.commit()
-        print(f"[Aggregator] Daily aggregation complete. {result.rowcount} rows affected.")
+        if watermark is not None and watermark >= cutoff:
+            print(f"[Aggregator] Daily rollup already up to date (watermark {watermark}).")
+            drop_aggregated_raw(db, watermark)
+            return False
 
-        # 5. Delete the raw logs that were just aggregated
-        print(f"[Aggregator] Deleting aggregated raw logs older than or equal to {thirty_days_ago}...")
-        total_deleted = 0
+        day = watermark + timedelta(days=1) if watermark else None
+        days_done = 0
         while True:
-            # Find rows to delete
-            rows_to_delete = db.query(PriceLog.id).filter(
-                cast(PriceLog.scraped_at, Date) <= thirty_days_ago
-            ).limit(1000).all() # Batch size
-            
-            if not rows_to_delete:
-                break # No more rows to delete
-
-            ids_to_delete = [r[0] for r in rows_to_delete]
-            
-            # Execute delete by IDs
-            delete_stmt = PriceLog.__table__.delete().where(PriceLog.id.in_(ids_to_delete))
-            deleted_rows_count = db.execute(delete_stmt).rowcount
-            db.commit()
+            # Jump straight to the next day that actually has raw data
+            next_log = db.query(func.min(PriceLog.scraped_at))
+            if day is not None:
+                next_log = next_log.filter(PriceLog.scraped_at >= _day_bounds(day)[0])
+            next_log = next_log.scalar()
+
+            if next_log is None or next_log.astimezone(timezone.utc).date() > cutoff:
+                set_watermark(db, DAILY_JOB, cutoff)
+                db.commit()
+                break
 
-            total_deleted += deleted_rows_count
-            print(f"[Aggregator] Deleted {deleted_rows_count} raw rows... Total: {total_deleted}")
+            day = next_log.astimezone(timezone.utc).date()
+            aggregate_day(db, day)
+            # Rollup and watermark commit together, so a crash never aggregates a day twice
+            set_watermark(db, DAILY_JOB, day)
+            db.commit()
+            days_done += 1
+            day += timedelta(days=1)
 
-        print(f"[Aggregator] Raw log cleanup complete. Total deleted: {total_deleted}")
+        print(f"[Aggregator] Daily aggregation complete. {days_done} day(s) processed, watermark now {cutoff}.")
+        drop_aggregated_raw(db, cutoff)
+        return days_done > 0
 
     except Exception as e:
         db.rollback()
@@ -145,120 +395,51 @@ def run_daily_aggregation():
         print(f"❌ CRITICAL ERROR in run_daily_aggregation: {e}\n{traceback.format_exc()}")
     finally:
         db.close()
+    return False
 
-def run_monthly_aggregation():
+def run_monthly_aggregation() -> bool:
     """
     Aggregates daily price logs older than 1 year into monthly summaries.
+    Only months after the stored watermark are visited, one month per transaction.
+    Daily rows are retired afterwards by dropping whole monthly partitions.
     """
     print("[Aggregator] Running MONTHLY aggregation...")
     db = SessionLocal()
     try:
-        # Aggregate data from 1 year ago and older
+        # Aggregate data from 1 year ago and older, by whole months before this one
         one_year_ago = datetime.now(timezone.utc).date() - timedelta(days=365)
-        # Truncate to the first of the month
-        one_year_ago_month = one_year_ago.replace(day=1)
-        
-        print(f"[Aggregator] Aggregating daily data older than: {one_year_ago_month}")
-
-        # 1. Subquery for monthly aggregates from daily table
-        agg_subquery = db.query(
-            PriceHistoryDaily.product_source_id,
-            func.date_trunc('month', PriceHistoryDaily.day).label("month"),
-            func.min(PriceHistoryDaily.min_cents).label("min_cents"),
-            func.max(PriceHistoryDaily.max_cents).label("max_cents"),
-            cast(func.avg(PriceHistoryDaily.avg_cents), Integer).label("avg_cents"),
-            func.max(PriceHistoryDaily.currency).label("currency"),
-            func.sum(PriceHistoryDaily.samples).label("samples")
-        ).filter(
-            PriceHistoryDaily.day < one_year_ago_month
-        ).group_by(
-            PriceHistoryDaily.product_source_id,
-            func.date_trunc('month', PriceHistoryDaily.day)
-        ).subquery('monthly_aggregates')
-
-        # 2. Subquery to get the LAST price for each month (from the daily table)
-        subq_last_day = db.query(
-            PriceHistoryDaily.product_source_id,
-            PriceHistoryDaily.last_cents,
-            func.date_trunc('month', PriceHistoryDaily.day).label("bucket"),
-            func.row_number().over(
-                partition_by=(
-                    PriceHistoryDaily.product_source_id,
-                    func.date_trunc('month', PriceHistoryDaily.day)
-                ),
-                order_by=PriceHistoryDaily.day.desc()
-            ).label("rn")
-        ).filter(
-             PriceHistoryDaily.day < one_year_ago_month
-        ).subquery('latest_daily_subq')
-        
-        last_price_subquery = db.query(
-            subq_last_day.c.product_source_id,
-            subq_last_day.c.bucket,
-            subq_last_day.c.last_cents.label('last_cents')
-        ).filter(subq_last_day.c.rn == 1).subquery('last_price_final_subq')
-
-        # 3. Join aggregates with the last price
-        final_query = db.query(
-            agg_subquery.c.product_source_id,
-            agg_subquery.c.month,
-            agg_subquery.c.min_cents,
-            agg_subquery.c.max_cents,
-            agg_subquery.c.avg_cents,
-            last_price_subquery.c.last_cents,
-            agg_subquery.c.currency,
-            agg_subquery.c.samples
-        ).join(
-            last_price_subquery,
-            (agg_subquery.c.product_source_id == last_price_subquery.c.product_source_id) &
-            (agg_subquery.c.month == last_price_subquery.c.bucket)
-        )
-        
-        # 4. Use INSERT... ON CONFLICT (Upsert)
-        insert_stmt = insert(PriceHistoryMonthly).from_select(
-            ['product_source_id', 'month', 'min_cents', 'max_cents', 'avg_cents', 'last_cents', 'currency', 'samples'],
-            final_query
-        )
-        
-        upsert_stmt = insert_stmt.on_conflict_do_update(
-            constraint='_monthly_product_source_month_uc',
-            set_={
-                'min_cents': insert_stmt.excluded.min_cents,
-                'max_cents': insert_stmt.excluded.max_cents,
-                'avg_cents': insert_stmt.excluded.avg_cents,
-                'last_cents': insert_stmt.excluded.last_cents,
-                'currency': insert_stmt.excluded.currency,
-                'samples': insert_stmt.excluded.samples
-            }
-        )
-        
-        result = db.execute(upsert_stmt)
-        db.commit()
-        print(f"[Aggregator] Monthly aggregation complete. {result.rowcount} rows affected.")
+        cutoff_month = one_year_ago.replace(day=1)
+        last_eligible = (cutoff_month - timedelta(days=1)).replace(day=1)
+        watermark = get_watermark(db, MONTHLY_JOB)
+
+        if watermark is not None and watermark >= last_eligible:
+            print(f"[Aggregator] Monthly rollup already up to date (watermark {watermark:%Y-%m}).")
+            drop_aggregated_daily(db, watermark)
+            return False
 
-        # 5. Delete the daily logs that were just aggregated
-        print(f"[Aggregator] Deleting aggregated daily logs older than {one_year_ago_month}...")
-        total_deleted = 0
+        month = next_month(watermark) if watermark else None
+        months_done = 0
         while True:
-            # Find rows to delete
-            rows_to_delete = db.query(PriceHistoryDaily.id).filter(
-                PriceHistoryDaily.day < one_year_ago_month
-            ).limit(1000).all()
-            
-            if not rows_to_delete:
-                break
+            next_day = db.query(func.min(PriceHistoryDaily.day))
+            if month is not None:
+                next_day = next_day.filter(PriceHistoryDaily.day >= month)
+            next_day = next_day.scalar()
 
-            ids_to_delete = [r[0] for r in rows_to_delete]
+            if next_day is None or next_day >= cutoff_month:
+                set_watermark(db, MONTHLY_JOB, last_eligible)
+                db.commit()
+                break
 
-            # Execute delete by IDs
-            delete_stmt = PriceHistoryDaily.__table__.delete().where(PriceHistoryDaily.id.in_(ids_to_delete))
-            deleted_rows_count = db.execute(delete_stmt).rowcount
+            month = next_day.replace(day=1)
+            aggregate_month(db, month)
+            set_watermark(db, MONTHLY_JOB, month)
             db.commit()
+            months_done += 1
+            month = next_month(month)
 
-            total_deleted += deleted_rows_count
-            print(f"[Aggregator] Deleted {deleted_rows_count} daily rows... Total: {total_deleted}")
-            
-        print(f"[Aggregator] Daily log cleanup complete. Total deleted: {total_deleted}")
+        print(f"[Aggregator] Monthly aggregation complete. {months_done} month(s) processed, watermark now {last_eligible:%Y-%m}.")
+        drop_aggregated_daily(db, last_eligible)
+        return months_done > 0
 
     except Exception as e:
         db.rollback()
@@ -266,11 +447,46 @@ def run_monthly_aggregation():
         print(f"❌ CRITICAL ERROR in run_monthly_aggregation: {e}\n{traceback.format_exc()}")
     finally:
         db.close()
+    return False
+
+
+def run_price_stats_rebase():
+    """Slides the 30-day window of the price stats forward; inserts only ever extend it."""
+    print("[Aggregator] Re-basing 30-day price stats...")
+    db = SessionLocal()
+    try:
+        window_start = (datetime.now(timezone.utc) - timedelta(days=STATS_WINDOW_DAYS)).replace(
+            minute=0, second=0, microsecond=0
+        )
+        rows = rebase_price_stats(db, window_start)
+        db.commit()
+        print(f"[Aggregator] Price stats re-based for {rows} sources (window from {window_start:%Y-%m-%d %H:%M}).")
+    except Exception as e:
+        db.rollback()
+        import traceback
+        print(f"❌ CRITICAL ERROR in run_price_stats_rebase: {e}\n{traceback.format_exc()}")
+    finally:
+        db.close()
 
 
 def run_aggregation_jobs():
     """Main entry point for the aggregation worker task."""
     print("--- 🚀 Starting Price Aggregation Job ---")
-    run_daily_aggregation()
-    run_monthly_aggregation()
-    print("--- ✅ Finished Price Aggregation Job ---")
\ No newline at end of file
+    db = SessionLocal()
+    try:
+        ensure_partitions(db)
+    except Exception as e:
+        db.rollback()
+        print(f"❌ ERROR creating upcoming partitions: {e}")
+    finally:
+        db.close()
+    changed = [run_hourly_aggregation(), run_daily_aggregation(), run_monthly_aggregation()]
+    # After the hourly rollup, so the window reads as few raw rows as possible
+    run_price_stats_rebase()
+    if any(changed):
+        # Rolled-up tiers moved, so every cached history response may be stale
+        try:
+            get_redis().incr(HISTORY_CACHE_GENERATION_KEY)
+        except Exception as e:
+            print(f"[Aggregator] Could not invalidate the history cache: {e}")
+    print("--- ✅ Finished Price Aggregation Job ---")
@@ -0,0 +1,131 @@
+# worker/playwright_scraper/alerts.py
+import os
+import json
+import time
+from typing import Dict, List, NamedTuple, Optional, Sequence
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+from pywebpush import webpush, WebPushException
+
+from .models import ProductSource, ProductSourceLatest, User, Watchlist
+from .redis_client import get_redis, publish_event
+
+
+class TriggeredAlert(NamedTuple):
+    watchlist_id: int
+    product_id: int
+    user_id: str
+    threshold_cents: int
+    price_cents: int
+
+
+def _lowest_prices(product_ids: Optional[Sequence[int]] = None):
+    """Lowest current price per product, straight from product_source_latest."""
+    query = select(
+        ProductSource.product_id.label("product_id"),
+        func.min(ProductSourceLatest.price_cents).label("price_cents")
+    ).join(
+        ProductSourceLatest, ProductSourceLatest.product_source_id == ProductSource.id
+    ).group_by(ProductSource.product_id)
+    if product_ids is not None:
+        query = query.where(ProductSource.product_id.in_(product_ids))
+    return query.subquery("lowest")
+
+
+def _claim(db: Session, lowest) -> List[TriggeredAlert]:
+    """
+    Marks every watchlist entry whose threshold the lowest price now meets,
+    and re-arms the ones the price has climbed back above. An entry fires once
+    per crossing, and again only if the price falls further; because the claim
+    is an UPDATE, a concurrent ingest and sweep can never both send it.
+    The caller commits.
+    """
+    db.execute(update(Watchlist).where(
+        Watchlist.product_id == lowest.c.product_id,
+        Watchlist.last_alerted_cents != None,
+        lowest.c.price_cents > Watchlist.alert_threshold_cents
+    ).values(last_alerted_cents=None).execution_options(synchronize_session=False))
+
+    rows = db.execute(update(Watchlist).where(
+        Watchlist.product_id == lowest.c.product_id,
+        Watchlist.alert_threshold_cents >= lowest.c.price_cents,
+        Watchlist.user_id != None,
+        (Watchlist.last_alerted_cents == None) | (Watchlist.last_alerted_cents > lowest.c.price_cents)
+    ).values(last_alerted_cents=lowest.c.price_cents).returning(
+        Watchlist.id, Watchlist.product_id, Watchlist.user_id,
+        Watchlist.alert_threshold_cents, lowest.c.price_cents
+    ).execution_options(synchronize_session=False)).all()
+    return [TriggeredAlert(*row) for row in rows]
+
+
+def claim_product_alerts(db: Session, product_id: int) -> List[TriggeredAlert]:
+    """Ingest path: only the entries on this product, found through ix_watchlists_product_threshold."""
+    return _claim(db, _lowest_prices([product_id]))
+
+
+def claim_products_alerts(db: Session, product_ids: Sequence[int]) -> List[TriggeredAlert]:
+    """Batched ingest: the entries on every product whose price changed in the batch."""
+    return _claim(db, _lowest_prices(product_ids))
+
+
+def claim_all_alerts(db: Session) -> List[TriggeredAlert]:
+    """Safety-net sweep: every watched product in one statement pair."""
+    watched = select(Watchlist.product_id).where(Watchlist.alert_threshold_cents != None).distinct()
+    return _claim(db, _lowest_prices(watched))
+
+
+def _send_push(db: Session, user: User, alert: TriggeredAlert):
+    try:
+        payload = json.dumps({
+            "title": "Price Alert!",
+            "body": f"Price for Product ID {alert.product_id} dropped to ₹{alert.price_cents / 100}!",
+            "url": f"/product/{alert.product_id}"
+        })
+        webpush(
+            subscription_info=user.push_subscription,
+            data=payload,
+            vapid_private_key=os.getenv("VAPID_PRIVATE_KEY"),
+            vapid_claims={"sub": f"mailto:{os.getenv('VAPID_CLAIMS_EMAIL')}"}
+        )
+        print(f"[Alerts]  ✅ Push notification sent to {user.email}.")
+    except WebPushException as ex:
+        print(f"[Alerts]  ❌ Error sending push: {ex}")
+        if ex.response and ex.response.status_code in [404, 410]:
+            print(f"[Alerts]  Subscription for {user.email} is invalid. Removing.")
+            user.push_subscription = None
+            db.commit()
+    except Exception as e:
+        print(f"[Alerts]  ❌ Unexpected error during webpush: {e}")
+
+
+def notify(db: Session, alerts: List[TriggeredAlert]):
+    """Appends PRICE_ALERT events in one pipeline, then pushes to the users that subscribed."""
+    if not alerts:
+        return
+    try:
+        with get_redis().pipeline(transaction=False) as pipe:
+            for alert in alerts:
+                print(f"[Alerts]  TRIGGER! Product {alert.product_id} is {alert.price_cents / 100}, below alert of {alert.threshold_cents / 100} for user {alert.user_id}")
+                publish_event({
+                    "type": "PRICE_ALERT",
+                    "product_id": alert.product_id,
+                    "user_id": alert.user_id,
+                    "current_price": alert.price_cents / 100,
+                    "alert_price": alert.threshold_cents / 100,
+                    "published_at": time.time()
+                }, pipe)
+            pipe.execute()
+    except Exception as e:
+        print(f"[Alerts] ❌ Failed to publish alerts: {e}")
+
+    # Anonymous watchers have no user row; one query for everyone else
+    users: Dict[str, User] = {
+        user.email: user for user in db.query(User).filter(
+            User.email.in_({alert.user_id for alert in alerts}),
+            User.push_subscription != None
+        ).all()
+    }
+    for alert in alerts:
+        user = users.get(alert.user_id)
+        if user and user.push_subscription:
+            _send_push(db, user, alert)
@@ -0,0 +1,219 @@
+# worker/playwright_scraper/async_engine.py
+import os
+import asyncio
+import atexit
+import threading
+from typing import Dict, List, Optional
+from playwright.async_api import async_playwright
+
+from .base_scraper import BaseScraper, SETTLE_TIMEOUT_MS
+from .browser_pool import BROWSER_MAX_PAGES
+from .fetch_tiers import is_complete, should_try_http, record_browser_result
+from .rate_limiter import acquire_async
+
+# --- Engine Configuration ---
+# WORKER_CONCURRENCY is set per container in infra/docker-compose.yml
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "3"))
+PER_DOMAIN_CONCURRENCY = int(os.getenv("SCRAPER_PER_DOMAIN_CONCURRENCY", "2"))
+PAGE_TIMEOUT_MS = 90000
+
+
+class AsyncScrapeEngine:
+    """
+    Drives many product pages concurrently on one async Chromium.
+
+    The event loop lives on its own daemon thread so the browser stays warm
+    across RQ jobs and never collides with the sync Playwright API that
+    BaseScraper.scrape uses on the main thread. Jobs call scrape_many(),
+    which blocks until the whole batch is done.
+    """
+    def __init__(self, concurrency: int = WORKER_CONCURRENCY, per_domain: int = PER_DOMAIN_CONCURRENCY):
+        self.concurrency = max(1, concurrency)
+        self.per_domain = max(1, per_domain)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._playwright = None
+        self._browser = None
+        self._pages_served = 0
+        self._open_contexts = 0
+        self._browser_lock: Optional[asyncio.Lock] = None
+        self._global_sem: Optional[asyncio.Semaphore] = None
+        self._domain_sems: Dict[str, asyncio.Semaphore] = {}
+
+    # --- Loop management ---
+    def start(self):
+        if self._thread is not None:
+            return
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="async-scrape-engine", daemon=True)
+        self._thread.start()
+        print(f"[AsyncEngine] Started with concurrency={self.concurrency}, per_domain={self.per_domain}")
+
+    def _run(self, coro):
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def close(self):
+        if self._loop is None:
+            return
+        try:
+            self._run(self._shutdown())
+        except Exception as e:
+            print(f"[AsyncEngine] Error during shutdown: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop = None
+        self._thread = None
+
+    # --- Browser management (runs on the engine loop) ---
+    async def _ensure_browser(self):
+        async with self._browser_lock:
+            if self._browser is not None and self._browser.is_connected():
+                # Recycle only when no context is open so in-flight pages are never killed
+                if not (BROWSER_MAX_PAGES and self._pages_served >= BROWSER_MAX_PAGES and self._open_contexts == 0):
+                    return self._browser
+                print(f"[AsyncEngine] Recycling browser after {self._pages_served} pages.")
+                await self._browser.close()
+                self._browser = None
+
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(headless=True)
+            self._pages_served = 0
+            return self._browser
+
+    async def _shutdown(self):
+        if self._browser is not None:
+            await self._browser.close()
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    def _domain_sem(self, domain: str) -> asyncio.Semaphore:
+        if domain not in self._domain_sems:
+            self._domain_sems[domain] = asyncio.Semaphore(self.per_domain)
+        return self._domain_sems[domain]
+
+    # --- Scraping ---
+    async def _scrape_one(self, scraper: BaseScraper, shared: Optional["_SharedContexts"]) -> Optional[Dict]:
+        # Tokens are awaited while holding only the domain slot, so a domain whose
+        # budget is refilling never occupies a global slot other domains could use
+        async with self._domain_sem(scraper.domain):
+            if should_try_http(scraper.domain):
+                await acquire_async(scraper.domain)
+                async with self._global_sem:
+                    # requests is blocking, so the HTTP tier runs on a thread
+                    data = await asyncio.to_thread(scraper.scrape_http)
+                if data:
+                    return data
+
+            await acquire_async(scraper.domain)
+            async with self._global_sem:
+                return await self._scrape_browser(scraper, shared)
+
+    async def _new_context(self, scraper: BaseScraper):
+        browser = await self._ensure_browser()
+        headers = {"Accept-Language": scraper.ACCEPT_LANGUAGE} if scraper.ACCEPT_LANGUAGE else None
+        context = await browser.new_context(user_agent=scraper.user_agent, extra_http_headers=headers)
+        self._open_contexts += 1
+        return context
+
+    async def _close_context(self, context):
+        self._open_contexts -= 1
+        try:
+            await context.close()
+        except Exception:
+            pass
+
+    async def _scrape_browser(self, scraper: BaseScraper, shared: Optional["_SharedContexts"]) -> Optional[Dict]:
+        context = None
+        page = None
+        data = None
+        blocker = scraper.make_resource_blocker()
+        try:
+            if shared is not None:
+                context = await shared.get(scraper)
+            else:
+                context = await self._new_context(scraper)
+            page = await context.new_page()
+            if blocker:
+                await page.route("**/*", blocker.handle_async)
+
+            await page.goto(scraper.url, wait_until='domcontentloaded', timeout=PAGE_TIMEOUT_MS)
+            await page.evaluate("window.scrollBy(0, window.innerHeight);")
+            try:
+                await page.wait_for_load_state('networkidle', timeout=SETTLE_TIMEOUT_MS)
+            except Exception:
+                pass
+
+            data = await scraper.extract_data_async(page)
+            return data
+        except Exception as e:
+            print(f"[AsyncEngine] Scrape failed for {scraper.url}: {e}")
+            return None
+        finally:
+            record_browser_result(scraper.domain, is_complete(data))
+            if blocker:
+                blocker.report(scraper.url)
+            if page is not None:
+                self._pages_served += 1
+            if shared is not None:
+                if page is not None:
+                    try:
+                        await page.close()
+                    except Exception:
+                        pass
+            elif context is not None:
+                await self._close_context(context)
+
+    async def _scrape_all(self, scrapers: List[BaseScraper], share_context: bool) -> List[Optional[Dict]]:
+        if self._global_sem is None:
+            self._global_sem = asyncio.Semaphore(self.concurrency)
+            self._browser_lock = asyncio.Lock()
+        shared = _SharedContexts(self) if share_context else None
+        try:
+            return await asyncio.gather(*(self._scrape_one(s, shared) for s in scrapers))
+        finally:
+            if shared is not None:
+                await shared.close()
+
+    def scrape_many(self, scrapers: List[BaseScraper], share_context: bool = False) -> List[Optional[Dict]]:
+        """
+        Scrapes all pages concurrently. Results are returned in the same order as the scrapers.
+        With share_context, pages of the same domain reuse one BrowserContext for the whole batch.
+        """
+        if not scrapers:
+            return []
+        return self._run(self._scrape_all(scrapers, share_context))
+
+
+class _SharedContexts:
+    """One BrowserContext per domain, kept open for the lifetime of a batch."""
+    def __init__(self, engine: AsyncScrapeEngine):
+        self.engine = engine
+        self.contexts = {}
+        self.lock = asyncio.Lock()
+
+    async def get(self, scraper: BaseScraper):
+        async with self.lock:
+            if scraper.domain not in self.contexts:
+                self.contexts[scraper.domain] = await self.engine._new_context(scraper)
+            return self.contexts[scraper.domain]
+
+    async def close(self):
+        for context in self.contexts.values():
+            await self.engine._close_context(context)
+        self.contexts = {}
+
+
+_engine: Optional[AsyncScrapeEngine] = None
+
+
+def get_async_engine() -> AsyncScrapeEngine:
+    """Returns the process-wide async engine, creating it on first use."""
+    global _engine
+    if _engine is None:
+        _engine = AsyncScrapeEngine()
+        atexit.register(_engine.close)
+    return _engine
@@ -1,15 +1,43 @@
 from abc import ABC, abstractmethod
-from playwright.sync_api import sync_playwright, Page
-import time
-import random
-from typing import Dict, Optional
+import asyncio
+from playwright.sync_api import Page
+from playwright.async_api import Page as AsyncPage
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
 import os
+from . import rate_limiter
+from .browser_pool import get_browser_pool
+from .page_bridge import SyncPageBridge
+from .resource_blocking import ResourceBlocker, BLOCKING_ENABLED
+from .fetch_tiers import fetch_html, is_complete, should_try_http, record_http_result, record_browser_result
+
+# Upper bound on waiting for the page to settle after scrolling
+SETTLE_TIMEOUT_MS = int(os.getenv("SCRAPER_SETTLE_TIMEOUT_MS", "2000"))
 
 class BaseScraper(ABC):
+    # Selector the async engine waits for before reading the DOM (None = don't wait)
+    READY_SELECTOR: Optional[str] = None
+    READY_TIMEOUT_MS: int = 10000
+    # Accept-Language header for sites that serve a different locale by default
+    ACCEPT_LANGUAGE: Optional[str] = None
+    # Resource types ("image") or URL substrings that must NOT be blocked for this site.
+    # Empty by default: every scraper reads image URLs from the DOM, not the image bytes.
+    RESOURCE_ALLOWLIST: Tuple[str, ...] = ()
+
     def __init__(self, url: str):
         self.url = url
         self.user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36"
+
+    @property
+    def domain(self) -> str:
+        return urlparse(self.url).netloc.lower().replace('www.', '')
         
+    def make_resource_blocker(self) -> Optional[ResourceBlocker]:
+        """Route handler that skips images, fonts, media and trackers for this scraper's pages."""
+        if not BLOCKING_ENABLED:
+            return None
+        return ResourceBlocker(allowlist=self.RESOURCE_ALLOWLIST)
+
     @abstractmethod
     def extract_data(self, page: Page) -> Dict:
         pass
@@ -17,34 +45,94 @@ class BaseScraper(ABC):
     @abstractmethod
     def extract_data_fallback(self, html: str) -> Dict:
         pass
+
+    async def extract_data_async(self, page: AsyncPage) -> Dict:
+        """
+        Async counterpart of extract_data, used by the async scrape engine.
+        Runs the scraper's own extract_data on a worker thread against a sync
+        view of the page, so batched scrapes collect exactly what single ones
+        do (every price selector, reviews, seller details). The BeautifulSoup
+        extractor over the rendered DOM is only the last resort when that
+        fails or comes back without a title and price.
+        """
+        if self.READY_SELECTOR:
+            try:
+                await page.wait_for_selector(self.READY_SELECTOR, timeout=self.READY_TIMEOUT_MS)
+            except Exception as e:
+                print(f"[{self.__class__.__name__}] Timed out waiting for core elements: {e}")
+
+        data = None
+        try:
+            bridge = SyncPageBridge(page, asyncio.get_running_loop())
+            data = await asyncio.to_thread(self.extract_data, bridge)
+        except Exception as e:
+            print(f"[{self.__class__.__name__}] Page extraction failed: {e}")
+        if is_complete(data):
+            return data
+
+        fallback = self.scrape_fallback(await page.content())
+        return fallback or data
     
     def scrape(self) -> Optional[Dict]:
+        """
+        Tiered scrape: a plain HTTP GET first, the full browser only when that comes back incomplete.
+        Every request takes a token from the domain's shared bucket; raises RateLimited
+        when the bucket will not refill soon enough, so the caller can requeue the job.
+        """
+        if should_try_http(self.domain):
+            rate_limiter.acquire(self.domain)
+            data = self.scrape_http()
+            if data:
+                return data
+
+        rate_limiter.acquire(self.domain)
+        data = self.scrape_browser()
+        record_browser_result(self.domain, is_complete(data))
+        return data
+
+    def scrape_http(self) -> Optional[Dict]:
+        """Fast path: pooled HTTP GET parsed by the BeautifulSoup extractor. None means escalate."""
+        html = fetch_html(self.url, self.user_agent, self.ACCEPT_LANGUAGE)
+        data = self.scrape_fallback(html) if html else None
+        record_http_result(self.domain, data is not None)
+        if data:
+            print(f"[{self.__class__.__name__}] Served by HTTP tier: {self.url}")
+        return data
+
+    def scrape_browser(self) -> Optional[Dict]:
         try:
-            with sync_playwright() as p:
-                browser = p.chromium.launch(headless=True)
-                context = browser.new_context(user_agent=self.user_agent)
-                page = context.new_page()
-                
-                time.sleep(random.uniform(2, 5))
-                
+            # Pages come from the worker's warm browser pool instead of launching Chromium per job
+            with get_browser_pool().page(user_agent=self.user_agent) as page:
+                blocker = self.make_resource_blocker()
+                if blocker:
+                    page.route("**/*", blocker.handle)
+
                 page.goto(self.url, wait_until='domcontentloaded', timeout=90000)
                 
                 page.evaluate("window.scrollBy(0, window.innerHeight);")
-                time.sleep(random.uniform(1, 3))
+                # Give lazy-loaded content a moment, but don't idle once the network is quiet
+                try:
+                    page.wait_for_load_state('networkidle', timeout=SETTLE_TIMEOUT_MS)
+                except Exception:
+                    pass
 
                 data = self.extract_data(page)
-                
-                browser.close()
+                if blocker:
+                    blocker.report(self.url)
                 return data
                 
         except Exception as e:
             print(f"Playwright scraping failed: {e}")
             return None
     
-    # Fallback and normalize_price methods are no longer needed with the Scraping API model,
-    # but we leave them in case you switch back from the hybrid model.
     def scrape_fallback(self, html: str) -> Optional[Dict]:
-        return None
+        """Runs the BeautifulSoup extractor over raw HTML. Returns None unless both title and price were found."""
+        try:
+            data = self.extract_data_fallback(html)
+        except Exception as e:
+            print(f"[{self.__class__.__name__}] Fallback extraction failed: {e}")
+            return None
+        return data if is_complete(data) else None
     
     @staticmethod
     def normalize_price(price_str: str) -> int:
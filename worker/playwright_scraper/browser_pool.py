@@ -0,0 +1,188 @@
+# worker/playwright_scraper/browser_pool.py
+import os
+import atexit
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from playwright.sync_api import sync_playwright, Browser, Page
+
+from . import metrics
+
+# --- Pool Configuration ---
+# The pool only survives between jobs when RQ runs jobs in-process
+# (rq.worker.SimpleWorker). The default forking Worker throws it away per job.
+BROWSER_POOL_SIZE = int(os.getenv("SCRAPER_BROWSER_POOL_SIZE", "1"))
+BROWSER_MAX_PAGES = int(os.getenv("SCRAPER_BROWSER_MAX_PAGES", "200"))
+BROWSER_MAX_RSS_MB = int(os.getenv("SCRAPER_BROWSER_MAX_RSS_MB", "1500"))
+
+
+def _process_tree_rss_mb() -> Optional[float]:
+    """Sums the resident memory of this process and all its children (Chromium) from /proc."""
+    if not os.path.isdir("/proc"):
+        return None
+    try:
+        parents = {}
+        for pid in os.listdir("/proc"):
+            if not pid.isdigit():
+                continue
+            try:
+                with open(f"/proc/{pid}/stat") as f:
+                    # The comm field can contain spaces, so split after the closing paren
+                    fields = f.read().rsplit(")", 1)[1].split()
+                parents[int(pid)] = int(fields[1])
+            except (OSError, IndexError, ValueError):
+                continue
+
+        tree = {os.getpid()}
+        changed = True
+        while changed:
+            changed = False
+            for pid, ppid in parents.items():
+                if ppid in tree and pid not in tree:
+                    tree.add(pid)
+                    changed = True
+
+        total_kb = 0
+        for pid in tree:
+            try:
+                with open(f"/proc/{pid}/status") as f:
+                    for line in f:
+                        if line.startswith("VmRSS:"):
+                            total_kb += int(line.split()[1])
+                            break
+            except (OSError, ValueError):
+                continue
+        return total_kb / 1024
+    except Exception as e:
+        print(f"[BrowserPool] Could not read process memory: {e}")
+        return None
+
+
+class PooledBrowser:
+    """A warm Chromium instance plus the bookkeeping needed to decide when to recycle it."""
+    def __init__(self, browser: Browser):
+        self.browser = browser
+        self.pages_served = 0
+        self.launched_at = datetime.now(timezone.utc)
+
+
+class BrowserPool:
+    """
+    Keeps a fixed number of Chromium instances alive across jobs.
+    Every lease gets a brand new BrowserContext, so cookies and storage
+    never leak between scrapes, but the expensive browser launch is shared.
+    """
+    def __init__(self, size: int = BROWSER_POOL_SIZE, max_pages: int = BROWSER_MAX_PAGES, max_rss_mb: int = BROWSER_MAX_RSS_MB):
+        self.size = max(1, size)
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self._playwright = None
+        self._slots: List[Optional[PooledBrowser]] = [None] * self.size
+        self._next_slot = 0
+        self._stats = {"hits": 0, "misses": 0, "recycles": 0}
+
+    def _record(self, stat: str):
+        self._stats[stat] += 1
+        metrics.incr(f"browser_pool_{stat}")
+
+    def _launch(self) -> PooledBrowser:
+        if self._playwright is None:
+            self._playwright = sync_playwright().start()
+        browser = self._playwright.chromium.launch(headless=True)
+        print(f"[BrowserPool] Launched new Chromium instance. Stats: {self.stats()}")
+        return PooledBrowser(browser)
+
+    def _acquire(self) -> int:
+        """Picks the next slot round-robin and makes sure it holds a live browser."""
+        slot = self._next_slot
+        self._next_slot = (self._next_slot + 1) % self.size
+
+        pooled = self._slots[slot]
+        if pooled is not None and pooled.browser.is_connected():
+            self._record("hits")
+        else:
+            self._record("misses")
+            self._slots[slot] = self._launch()
+        return slot
+
+    def _recycle(self, slot: int, reason: str):
+        pooled = self._slots[slot]
+        self._slots[slot] = None
+        if pooled is None:
+            return
+        self._record("recycles")
+        print(f"[BrowserPool] Recycling browser in slot {slot} after {pooled.pages_served} pages ({reason}).")
+        try:
+            pooled.browser.close()
+        except Exception as e:
+            print(f"[BrowserPool] Error closing browser: {e}")
+
+    def _maybe_recycle(self, slot: int):
+        pooled = self._slots[slot]
+        if pooled is None:
+            return
+        if not pooled.browser.is_connected():
+            self._recycle(slot, "disconnected")
+            return
+        if self.max_pages and pooled.pages_served >= self.max_pages:
+            self._recycle(slot, "page limit")
+            return
+        if self.max_rss_mb:
+            rss_mb = _process_tree_rss_mb()
+            if rss_mb is not None and rss_mb > self.max_rss_mb:
+                self._recycle(slot, f"memory {rss_mb:.0f}MB > {self.max_rss_mb}MB")
+
+    @contextmanager
+    def page(self, user_agent: str):
+        """Yields a fresh page in an isolated context on a pooled browser."""
+        slot = self._acquire()
+        pooled = self._slots[slot]
+        try:
+            context = pooled.browser.new_context(user_agent=user_agent)
+        except Exception:
+            # A browser that cannot open a context is broken, don't hand it out again
+            self._recycle(slot, "new_context failed")
+            raise
+
+        try:
+            page: Page = context.new_page()
+            yield page
+        finally:
+            try:
+                context.close()
+            except Exception as e:
+                print(f"[BrowserPool] Error closing context: {e}")
+            pooled.pages_served += 1
+            self._maybe_recycle(slot)
+
+    def stats(self) -> Dict[str, int]:
+        live = sum(1 for p in self._slots if p is not None)
+        return {**self._stats, "live_browsers": live}
+
+    def close(self):
+        for slot in range(self.size):
+            pooled = self._slots[slot]
+            self._slots[slot] = None
+            if pooled is not None:
+                try:
+                    pooled.browser.close()
+                except Exception:
+                    pass
+        if self._playwright is not None:
+            try:
+                self._playwright.stop()
+            except Exception:
+                pass
+            self._playwright = None
+
+
+_pool: Optional[BrowserPool] = None
+
+
+def get_browser_pool() -> BrowserPool:
+    """Returns the process-wide browser pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        _pool = BrowserPool()
+        atexit.register(_pool.close)
+    return _pool
@@ -0,0 +1,94 @@
+# worker/playwright_scraper/fetch_tiers.py
+import os
+from typing import Dict, Optional
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import metrics
+from .redis_client import get_redis
+
+# --- Tier Configuration ---
+HTTP_FIRST_ENABLED = os.getenv("SCRAPER_HTTP_FIRST", "true").lower() == "true"
+HTTP_TIMEOUT_SECONDS = float(os.getenv("SCRAPER_HTTP_TIMEOUT", "10"))
+# After this many HTTP misses in a row a domain goes straight to the browser...
+HTTP_SKIP_AFTER_MISSES = int(os.getenv("SCRAPER_HTTP_SKIP_AFTER_MISSES", "3"))
+# ...but every Nth scrape still probes HTTP in case the site stopped needing JS
+HTTP_REPROBE_EVERY = int(os.getenv("SCRAPER_HTTP_REPROBE_EVERY", "50"))
+
+TIER_KEY_PREFIX = "scrape_tiers:"
+
+# One pooled session per worker process, so keep-alive connections are reused across scrapes
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=32, pool_maxsize=32))
+_session.mount("http://", HTTPAdapter(pool_connections=32, pool_maxsize=32))
+
+
+def is_complete(data: Optional[Dict]) -> bool:
+    """A scrape result is good enough to skip the browser when it has both a title and a price."""
+    if not data:
+        return False
+    title = (data.get("title") or "").strip()
+    return bool(data.get("price")) and bool(title) and title != "Unknown Product"
+
+
+def fetch_html(url: str, user_agent: str, accept_language: Optional[str] = None) -> Optional[str]:
+    """Plain HTTP GET through the pooled session. Returns None on any non-200 response."""
+    headers = {
+        "User-Agent": user_agent,
+        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+        "Accept-Language": accept_language or "en-US,en;q=0.9",
+    }
+    try:
+        response = _session.get(url, headers=headers, timeout=HTTP_TIMEOUT_SECONDS)
+        if response.status_code != 200:
+            print(f"[FetchTiers] HTTP {response.status_code} for {url}")
+            return None
+        return response.text
+    except requests.RequestException as e:
+        print(f"[FetchTiers] HTTP fetch failed for {url}: {e}")
+        return None
+
+
+def should_try_http(domain: str) -> bool:
+    """Decides from the domain's history whether the HTTP tier is worth trying."""
+    if not HTTP_FIRST_ENABLED:
+        return False
+    try:
+        r = get_redis()
+        key = TIER_KEY_PREFIX + domain
+        misses = int(r.hget(key, "http_miss_streak") or 0)
+        if misses < HTTP_SKIP_AFTER_MISSES:
+            return True
+        skipped = r.hincrby(key, "http_skipped", 1)
+        return HTTP_REPROBE_EVERY > 0 and skipped % HTTP_REPROBE_EVERY == 0
+    except Exception as e:
+        print(f"[FetchTiers] Could not read tier history for {domain}: {e}")
+        return True
+
+
+def record_http_result(domain: str, success: bool):
+    """Tracks consecutive HTTP misses per domain and counts which tier served the scrape."""
+    try:
+        r = get_redis()
+        key = TIER_KEY_PREFIX + domain
+        if success:
+            r.hset(key, mapping={"http_miss_streak": 0, "last_tier": "http"})
+            r.hincrby(key, "http_ok", 1)
+        else:
+            r.hincrby(key, "http_miss_streak", 1)
+            r.hincrby(key, "http_miss", 1)
+    except Exception as e:
+        print(f"[FetchTiers] Could not record tier result for {domain}: {e}")
+    metrics.incr("scrape_tier_http" if success else "scrape_tier_http_miss")
+
+
+def record_browser_result(domain: str, success: bool):
+    try:
+        r = get_redis()
+        key = TIER_KEY_PREFIX + domain
+        if success:
+            r.hset(key, "last_tier", "browser")
+            r.hincrby(key, "browser_ok", 1)
+    except Exception as e:
+        print(f"[FetchTiers] Could not record tier result for {domain}: {e}")
+    metrics.incr("scrape_tier_browser" if success else "scrape_tier_browser_fail")
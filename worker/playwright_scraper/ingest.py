@@ -0,0 +1,516 @@
+# worker/playwright_scraper/ingest.py
+"""
+Write-behind price ingestion.
+
+With PRICE_INGEST_MODE=buffered, scrape jobs push each result (a "price
+point", see runner.price_point) onto a Redis list and return. The flusher
+(`python -m playwright_scraper.ingest`) takes up to INGEST_BATCH_SIZE points
+at a time, COPYs them into a temporary table and applies the whole batch
+set-wise in one transaction: price logs, sellers, seller links, latest
+prices, price stats, schedules and product details, then alerts and events.
+
+Points keep the time they were scraped, so a backlog can land them behind
+the hourly rollup's watermark; the flush re-rolls those hours itself. Points
+older than the daily watermark are skipped: that day is already rolled up
+and its raw partition may be gone.
+
+A batch that fails INGEST_MAX_ATTEMPTS times is parked in the "ingest:dead"
+list. Once the cause is fixed, put it back on the queue with
+
+    python -m playwright_scraper.ingest replay-dead
+
+Replaying is safe: points that were saved before are skipped.
+"""
+import os
+import io
+import csv
+import json
+import time
+import argparse
+import traceback
+from datetime import datetime, time as day_time, timedelta, timezone
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import (
+    Table, Column, MetaData, Integer, String, Float, Boolean, DateTime, Text,
+    select, update, delete, exists, func, case, cast, or_
+)
+from sqlalchemy.dialects.postgresql import insert, array_agg, aggregate_order_by
+from sqlalchemy.orm import Session
+
+from .models import (
+    SessionLocal, Product, ProductSource, Seller, PriceLog,
+    ProductSourceLatest, ProductSourcePriceStats, Watchlist
+)
+from .redis_client import get_redis, publish_event, release_inflight
+from .alerts import claim_products_alerts, notify
+from .aggregation import (
+    HOURLY_JOB, DAILY_JOB, aggregate_hours, get_watermark, get_watermark_at
+)
+from .scheduling import (
+    INTERVAL_DEFAULT, INTERVAL_MIN, INTERVAL_MAX,
+    WATCHED_INTERVAL_MIN, WATCHED_INTERVAL_MAX, BACKOFF_FACTOR
+)
+from . import metrics
+
+# --- Write-behind Configuration ---
+# "direct" saves every scrape in its own transaction; "buffered" goes through the flusher
+INGEST_MODE = os.getenv("PRICE_INGEST_MODE", "direct")
+INGEST_QUEUE_KEY = "ingest:price_points"
+# Points a flusher has taken but not yet committed; retried first after a crash
+INGEST_PROCESSING_KEY = f"ingest:processing:{os.getenv('INGEST_FLUSHER_ID', 'default')}"
+INGEST_ATTEMPTS_KEY = f"{INGEST_PROCESSING_KEY}:attempts"
+# Batches that keep failing are parked here instead of blocking the queue
+INGEST_DEAD_KEY = "ingest:dead"
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "5000"))
+INGEST_FLUSH_INTERVAL = float(os.getenv("INGEST_FLUSH_INTERVAL", "1.0"))
+INGEST_MAX_ATTEMPTS = int(os.getenv("INGEST_MAX_ATTEMPTS", "5"))
+
+# COPY column order
+POINT_FIELDS = (
+    "product_id", "source_id", "marketplace", "price_cents", "currency", "availability",
+    "in_stock", "avg_review_sentiment", "seller_name", "seller_rating", "seller_review_count",
+    "title", "image_url", "description", "brand", "scraped_at",
+)
+# Widths of the columns these fields end up in; one overlong value must not fail a whole batch
+FIELD_LIMITS = {
+    "marketplace": 100, "currency": 3, "availability": 50, "seller_name": 500,
+    "seller_rating": 100, "seller_review_count": 100, "title": 500, "brand": 200,
+}
+
+# Moves up to ARGV[1] points from the queue to the processing list atomically
+_CLAIM_SCRIPT = """
+local items = redis.call('LRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+if #items > 0 then
+    redis.call('LTRIM', KEYS[1], #items, -1)
+    redis.call('RPUSH', KEYS[2], unpack(items))
+end
+return items
+"""
+
+_temp_metadata = MetaData()
+ingest_points = Table(
+    "ingest_points", _temp_metadata,
+    Column("seq", Integer),
+    Column("product_id", Integer),
+    Column("source_id", Integer),
+    Column("marketplace", Text),
+    Column("price_cents", Integer),
+    Column("currency", Text),
+    Column("availability", Text),
+    Column("in_stock", Boolean),
+    Column("avg_review_sentiment", Float),
+    Column("seller_name", Text),
+    Column("seller_rating", Text),
+    Column("seller_review_count", Text),
+    Column("title", Text),
+    Column("image_url", Text),
+    Column("description", Text),
+    Column("brand", Text),
+    Column("scraped_at", DateTime(timezone=True)),
+    Column("previous_cents", Integer),
+    Column("inserted", Boolean),
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DROP",
+)
+
+
+def enqueue_price_points(points: List[dict]):
+    """Scrape side of the buffer: one RPUSH for a whole batch job."""
+    if points:
+        get_redis().rpush(INGEST_QUEUE_KEY, *[json.dumps(point) for point in points])
+
+
+def _csv_value(field: str, value):
+    if value is None or value == "":
+        return None  # unquoted empty field, which COPY reads as NULL
+    if field in FIELD_LIMITS:
+        return str(value)[:FIELD_LIMITS[field]]
+    return value
+
+
+def _copy_points(db: Session, points: Sequence[dict]):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for seq, point in enumerate(points):
+        writer.writerow([seq] + [_csv_value(field, point.get(field)) for field in POINT_FIELDS])
+    buffer.seek(0)
+    ingest_points.create(db.connection())
+    cursor = db.connection().connection.cursor()
+    cursor.copy_expert(
+        f"COPY ingest_points (seq, {', '.join(POINT_FIELDS)}) FROM STDIN WITH (FORMAT csv)", buffer
+    )
+
+
+def _drop_expired_points(db: Session) -> int:
+    """Removes points on days the daily rollup has already covered; their raw rows would never be aggregated."""
+    watermark = get_watermark(db, DAILY_JOB)
+    if watermark is None:
+        return 0
+    first_open = datetime.combine(watermark + timedelta(days=1), day_time.min, tzinfo=timezone.utc)
+    return db.execute(delete(ingest_points).where(ingest_points.c.scraped_at < first_open)).rowcount
+
+
+def _insert_price_logs(db: Session) -> int:
+    """
+    Inserts the batch into price_logs and keeps only the points that were new.
+    (product_source_id, scraped_at) is unique, so a batch retried after a crash
+    adds nothing twice, and nothing below counts it twice either.
+    """
+    points = ingest_points
+    db.execute(delete(points).where(~exists().where(ProductSource.id == points.c.source_id)))
+    dup = points.alias("dup")
+    db.execute(delete(points).where(exists().where(
+        dup.c.source_id == points.c.source_id,
+        dup.c.scraped_at == points.c.scraped_at,
+        dup.c.seq < points.c.seq
+    )))
+
+    inserted = insert(PriceLog).from_select(
+        ["product_source_id", "price_cents", "currency", "availability", "in_stock", "avg_review_sentiment", "scraped_at"],
+        select(points.c.source_id, points.c.price_cents, points.c.currency, points.c.availability,
+               points.c.in_stock, points.c.avg_review_sentiment, points.c.scraped_at)
+    ).on_conflict_do_nothing(
+        index_elements=["product_source_id", "scraped_at"]
+    ).returning(PriceLog.product_source_id, PriceLog.scraped_at).cte("inserted")
+    db.execute(update(points).values(inserted=True).where(
+        points.c.source_id == inserted.c.product_source_id,
+        points.c.scraped_at == inserted.c.scraped_at
+    ))
+    return db.execute(delete(points).where(points.c.inserted.is_(None))).rowcount
+
+
+def _set_previous_prices(db: Session):
+    """Each point's previous price: the point before it in the batch, or the source's latest price."""
+    points = ingest_points
+    window = dict(partition_by=points.c.source_id, order_by=(points.c.scraped_at, points.c.seq))
+    previous = select(
+        points.c.seq,
+        case(
+            (func.row_number().over(**window) == 1, ProductSourceLatest.price_cents),
+            else_=func.lag(points.c.price_cents).over(**window)
+        ).label("previous_cents")
+    ).select_from(
+        points.outerjoin(ProductSourceLatest, ProductSourceLatest.product_source_id == points.c.source_id)
+    ).subquery()
+    db.execute(update(points).values(previous_cents=previous.c.previous_cents).where(points.c.seq == previous.c.seq))
+
+
+def _upsert_sellers(db: Session):
+    """get_or_create_seller for the whole batch: refresh known sellers, add new ones, relink sources."""
+    points = ingest_points
+    sellers = select(
+        points.c.marketplace, points.c.seller_name, points.c.seller_rating, points.c.seller_review_count
+    ).where(points.c.seller_name != None).distinct(
+        points.c.marketplace, points.c.seller_name
+    ).order_by(points.c.marketplace, points.c.seller_name, points.c.seq.desc()).subquery()
+
+    db.execute(update(Seller).values(
+        seller_rating=func.coalesce(sellers.c.seller_rating, Seller.seller_rating),
+        review_count=func.coalesce(sellers.c.seller_review_count, Seller.review_count),
+        last_seen=func.now()
+    ).where(Seller.marketplace == sellers.c.marketplace, Seller.seller_name == sellers.c.seller_name))
+    db.execute(insert(Seller).from_select(
+        ["marketplace", "seller_name", "seller_rating", "review_count"],
+        select(sellers.c.marketplace, sellers.c.seller_name, sellers.c.seller_rating, sellers.c.seller_review_count).where(
+            ~exists().where(Seller.marketplace == sellers.c.marketplace, Seller.seller_name == sellers.c.seller_name)
+        )
+    ))
+
+    source_sellers = select(
+        points.c.source_id, points.c.marketplace, points.c.seller_name
+    ).where(points.c.seller_name != None).distinct(points.c.source_id).order_by(
+        points.c.source_id, points.c.seq.desc()
+    ).subquery()
+    seller_id = select(Seller.id).where(
+        Seller.marketplace == source_sellers.c.marketplace,
+        Seller.seller_name == source_sellers.c.seller_name
+    ).order_by(Seller.id).limit(1).scalar_subquery()
+    links = select(source_sellers.c.source_id, seller_id.label("seller_id")).subquery()
+    db.execute(update(ProductSource).values(seller_id=links.c.seller_id).where(
+        ProductSource.id == links.c.source_id,
+        ProductSource.seller_id.is_distinct_from(links.c.seller_id)
+    ))
+
+
+def _upsert_latest_prices(db: Session):
+    """upsert_latest_price with the newest point of each source."""
+    points = ingest_points
+    newest = select(
+        points.c.source_id, points.c.price_cents, points.c.currency, points.c.availability,
+        points.c.in_stock, points.c.avg_review_sentiment, points.c.scraped_at, points.c.previous_cents
+    ).distinct(points.c.source_id).order_by(points.c.source_id, points.c.scraped_at.desc(), points.c.seq.desc())
+    stmt = insert(ProductSourceLatest).from_select(
+        ["product_source_id", "price_cents", "currency", "availability", "in_stock",
+         "avg_review_sentiment", "scraped_at", "previous_price_cents"],
+        newest
+    )
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["product_source_id"],
+        set_={
+            "previous_price_cents": stmt.excluded.previous_price_cents,
+            "price_cents": stmt.excluded.price_cents,
+            "currency": stmt.excluded.currency,
+            "availability": stmt.excluded.availability,
+            "in_stock": stmt.excluded.in_stock,
+            "avg_review_sentiment": stmt.excluded.avg_review_sentiment,
+            "scraped_at": stmt.excluded.scraped_at
+        },
+        where=ProductSourceLatest.scraped_at <= stmt.excluded.scraped_at
+    ))
+
+
+def _upsert_price_stats(db: Session):
+    """upsert_price_stats with each source's batch folded into one row first."""
+    points = ingest_points
+    batch = select(
+        points.c.source_id,
+        func.min(points.c.price_cents).label("min_cents"),
+        array_agg(aggregate_order_by(points.c.scraped_at, points.c.price_cents, points.c.scraped_at))[1].label("min_at"),
+        func.max(points.c.price_cents).label("max_cents"),
+        array_agg(aggregate_order_by(points.c.scraped_at, points.c.price_cents.desc(), points.c.scraped_at))[1].label("max_at"),
+        func.sum(points.c.price_cents).label("sum_cents"),
+        func.count().label("samples")
+    ).group_by(points.c.source_id).subquery()
+    stmt = insert(ProductSourcePriceStats).from_select(
+        ["product_source_id", "min_cents", "min_at", "max_cents", "max_at",
+         "min_30d_cents", "sum_30d_cents", "samples_30d"],
+        select(batch.c.source_id, batch.c.min_cents, batch.c.min_at, batch.c.max_cents, batch.c.max_at,
+               batch.c.min_cents, batch.c.sum_cents, batch.c.samples)
+    )
+    stats = ProductSourcePriceStats
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["product_source_id"],
+        set_={
+            "min_at": case((stmt.excluded.min_cents < stats.min_cents, stmt.excluded.min_at), else_=stats.min_at),
+            "min_cents": func.least(stats.min_cents, stmt.excluded.min_cents),
+            "max_at": case((stmt.excluded.max_cents > stats.max_cents, stmt.excluded.max_at), else_=stats.max_at),
+            "max_cents": func.greatest(stats.max_cents, stmt.excluded.max_cents),
+            "min_30d_cents": func.least(stats.min_30d_cents, stmt.excluded.min_30d_cents),
+            "sum_30d_cents": stats.sum_30d_cents + stmt.excluded.sum_30d_cents,
+            "samples_30d": stats.samples_30d + stmt.excluded.samples_30d,
+            "updated_at": func.now()
+        }
+    ))
+
+
+def _apply_schedules(db: Session):
+    """apply_schedule for every source in the batch, once, with "changed" meaning any point changed."""
+    points = ingest_points
+    changed = points.c.previous_cents.is_distinct_from(points.c.price_cents)
+    per_source = select(
+        points.c.source_id,
+        func.bool_or(changed).label("changed"),
+        func.count().label("points")
+    ).group_by(points.c.source_id).subquery()
+
+    watched = exists().where(
+        Watchlist.product_id == ProductSource.product_id,
+        Watchlist.alert_threshold_cents != None
+    )
+    current = func.coalesce(func.nullif(ProductSource.scrape_interval_seconds, 0), INTERVAL_DEFAULT)
+    proposed = func.floor(case(
+        (per_source.c.changed, current / BACKOFF_FACTOR),
+        else_=current * BACKOFF_FACTOR
+    ))
+    low = case((watched, WATCHED_INTERVAL_MIN), else_=INTERVAL_MIN)
+    high = case((watched, WATCHED_INTERVAL_MAX), else_=INTERVAL_MAX)
+    interval = cast(func.least(high, func.greatest(low, proposed)), Integer)
+
+    db.execute(update(ProductSource).values(
+        scrape_interval_seconds=interval,
+        unchanged_scrapes=case(
+            (per_source.c.changed, 0),
+            else_=func.coalesce(ProductSource.unchanged_scrapes, 0) + per_source.c.points
+        ),
+        next_scrape_at=func.now() + func.make_interval(0, 0, 0, 0, 0, 0, interval)
+    ).where(ProductSource.id == per_source.c.source_id))
+
+
+def _update_products(db: Session):
+    """Product details from each product's newest point; blank fields keep the stored value."""
+    points = ingest_points
+    newest = select(
+        points.c.product_id, points.c.title, points.c.image_url, points.c.description, points.c.brand
+    ).distinct(points.c.product_id).order_by(points.c.product_id, points.c.seq.desc()).subquery()
+    values = {
+        column: func.coalesce(newest.c[column], getattr(Product, column))
+        for column in ("title", "image_url", "description", "brand")
+    }
+    db.execute(update(Product).values(**values).where(
+        Product.id == newest.c.product_id,
+        or_(*[newest.c[column].is_distinct_from(getattr(Product, column)) & (newest.c[column] != None)
+              for column in values])
+    ))
+
+
+def _reaggregate_late_hours(db: Session) -> int:
+    """
+    Re-rolls the hours of new points that landed behind the hourly watermark,
+    for the batch's sources only (the rollup is an upsert). The watermark row
+    stays locked until commit, so the rollup either waits and sees these rows
+    or has already moved the watermark past them and they are re-rolled here.
+    """
+    watermark = get_watermark_at(db, HOURLY_JOB, for_update=True)
+    if watermark is None:
+        return 0
+    points = ingest_points
+    hour = func.date_trunc('hour', points.c.scraped_at, 'UTC')
+    hours = db.execute(select(hour).where(points.c.scraped_at < watermark).distinct()).scalars().all()
+    for start in hours:
+        aggregate_hours(db, start, start + timedelta(hours=1), select(points.c.source_id).where(hour == start))
+    return len(hours)
+
+
+def flush_points(db: Session, points: Sequence[dict], publish: bool = True) -> int:
+    """
+    Applies a batch of price points in one transaction and returns how many
+    were new. Events and alerts go out after the commit.
+    """
+    if not points:
+        return 0
+    _copy_points(db, points)
+    expired = _drop_expired_points(db)
+    duplicates = _insert_price_logs(db)
+    _set_previous_prices(db)
+    _upsert_sellers(db)
+    _upsert_latest_prices(db)
+    _upsert_price_stats(db)
+    _apply_schedules(db)
+    _update_products(db)
+
+    changed_products = db.execute(select(ingest_points.c.product_id).where(
+        ingest_points.c.previous_cents.is_distinct_from(ingest_points.c.price_cents)
+    ).distinct()).scalars().all()
+    alerts = claim_products_alerts(db, changed_products) if changed_products else []
+    events = db.execute(select(
+        ingest_points.c.product_id, ingest_points.c.source_id, ingest_points.c.marketplace,
+        ingest_points.c.price_cents, ingest_points.c.seller_name, ingest_points.c.seller_rating,
+        ingest_points.c.seller_review_count, ingest_points.c.avg_review_sentiment
+    ).order_by(ingest_points.c.seq)).all()
+    # Last, as it holds the hourly watermark lock until the commit
+    late_hours = _reaggregate_late_hours(db)
+    db.commit()  # also drops ingest_points
+
+    if expired:
+        print(f"[Ingest] Skipped {expired} points older than the daily rollup.")
+        metrics.incr("ingest_expired_points", expired)
+    if duplicates:
+        print(f"[Ingest] Skipped {duplicates} points that were already saved.")
+    if late_hours:
+        print(f"[Ingest] Re-rolled {late_hours} hour(s) behind the hourly watermark.")
+    if publish:
+        _publish(events)
+        notify(db, alerts)
+    return len(events)
+
+
+def _publish(events):
+    try:
+        with get_redis().pipeline(transaction=False) as pipe:
+            for event in events:
+                publish_event({
+                    "type": "PRICE_UPDATE",
+                    "product_id": event.product_id,
+                    "new_price": event.price_cents / 100,
+                    "source_id": event.source_id,
+                    "source_name": event.marketplace,
+                    "seller_name": event.seller_name,
+                    "seller_rating": event.seller_rating,
+                    "seller_review_count": event.seller_review_count,
+                    "avg_review_sentiment": event.avg_review_sentiment,
+                    "published_at": time.time()
+                }, pipe)
+            pipe.execute()
+    except Exception as e:
+        print(f"[Ingest] ❌ Failed to publish {len(events)} updates: {e}")
+
+
+def claim_batch(limit: int = INGEST_BATCH_SIZE) -> List[bytes]:
+    """The points left by a flush that failed or died come back first; otherwise the next batch."""
+    redis = get_redis()
+    pending = redis.lrange(INGEST_PROCESSING_KEY, 0, -1)
+    if pending:
+        return pending
+    return redis.eval(_CLAIM_SCRIPT, 2, INGEST_QUEUE_KEY, INGEST_PROCESSING_KEY, limit)
+
+
+def flush_once() -> int:
+    """Claims and flushes one batch. Returns the number of points claimed."""
+    raw = claim_batch()
+    if not raw:
+        return 0
+    redis = get_redis()
+    started = time.perf_counter()
+    source_ids = set()
+    db = SessionLocal()
+    try:
+        points = [json.loads(item) for item in raw]
+        source_ids = {point.get("source_id") for point in points}
+        saved = flush_points(db, points)
+    except Exception as e:
+        db.rollback()
+        attempts = redis.incr(INGEST_ATTEMPTS_KEY)
+        print(f"[Ingest] ❌ Flush of {len(raw)} points failed (attempt {attempts}): {e}\n{traceback.format_exc()}")
+        if attempts >= INGEST_MAX_ATTEMPTS:
+            print(f"[Ingest] Parking the batch in '{INGEST_DEAD_KEY}'.")
+            with redis.pipeline() as pipe:
+                pipe.rpush(INGEST_DEAD_KEY, *raw)
+                pipe.delete(INGEST_PROCESSING_KEY, INGEST_ATTEMPTS_KEY)
+                pipe.execute()
+            metrics.incr("ingest_dead_points", len(raw))
+            # Not saved, so let the scheduler pick these sources up again
+            release_inflight(source_ids)
+        return len(raw)
+    finally:
+        db.close()
+
+    redis.delete(INGEST_PROCESSING_KEY, INGEST_ATTEMPTS_KEY)
+    # The scrape jobs kept these markers so the sources were not re-enqueued before their
+    # next_scrape_at moved; a flusher that is down longer than their TTL still lets them through
+    release_inflight(source_ids)
+    elapsed = time.perf_counter() - started
+    metrics.incr("ingest_flushes")
+    metrics.incr("ingest_rows", saved)
+    print(f"[Ingest] Flushed {saved}/{len(raw)} points in {elapsed * 1000:.0f}ms ({len(raw) / elapsed:.0f} rows/s).")
+    return len(raw)
+
+
+def run_flusher():
+    """Flushes continuously: back to back while the queue is full, every INGEST_FLUSH_INTERVAL otherwise."""
+    print(f"[Ingest] Flusher started (batch {INGEST_BATCH_SIZE}, interval {INGEST_FLUSH_INTERVAL}s).")
+    while True:
+        try:
+            claimed = flush_once()
+        except Exception as e:
+            # Redis unavailable; the points stay where they are
+            print(f"[Ingest] ❌ Flusher error: {e}")
+            claimed = 0
+        if claimed < INGEST_BATCH_SIZE:
+            time.sleep(INGEST_FLUSH_INTERVAL)
+
+
+def replay_dead(limit: Optional[int] = None) -> int:
+    """Moves parked points back onto the ingest queue, oldest first. Returns how many were moved."""
+    redis = get_redis()
+    moved = 0
+    while limit is None or moved < limit:
+        chunk = INGEST_BATCH_SIZE if limit is None else min(INGEST_BATCH_SIZE, limit - moved)
+        items = redis.eval(_CLAIM_SCRIPT, 2, INGEST_DEAD_KEY, INGEST_QUEUE_KEY, chunk)
+        if not items:
+            break
+        moved += len(items)
+    print(f"[Ingest] Replayed {moved} points from '{INGEST_DEAD_KEY}', {redis.llen(INGEST_DEAD_KEY)} left.")
+    return moved
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write-behind price ingestion.")
+    parser.add_argument("command", nargs="?", default="run", choices=["run", "replay-dead"],
+                        help="run the flusher (default), or put parked batches back on the queue")
+    parser.add_argument("--limit", type=int, default=None, help="replay-dead: points to move (default all)")
+    args = parser.parse_args()
+    if args.command == "replay-dead":
+        replay_dead(args.limit)
+    else:
+        run_flusher()
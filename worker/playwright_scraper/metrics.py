@@ -0,0 +1,26 @@
+# worker/playwright_scraper/metrics.py
+from typing import Dict
+from .redis_client import get_redis
+
+# --- Constants ---
+METRICS_KEY = "worker_metrics"
+
+
+def incr(field: str, amount: int = 1):
+    """Adds to a shared worker counter. Metrics must never break a scrape, so errors are swallowed."""
+    if not amount:
+        return
+    try:
+        get_redis().hincrby(METRICS_KEY, field, amount)
+    except Exception as e:
+        print(f"[Metrics] Could not record '{field}': {e}")
+
+
+def snapshot() -> Dict[str, int]:
+    """Returns all shared worker counters as a plain dict."""
+    try:
+        raw = get_redis().hgetall(METRICS_KEY)
+        return {k.decode(): int(v) for k, v in raw.items()}
+    except Exception as e:
+        print(f"[Metrics] Could not read metrics: {e}")
+        return {}
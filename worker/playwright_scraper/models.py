@@ -1,6 +1,6 @@
 # worker/playwright_scraper/models.py
 import os
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text, Boolean, ForeignKey, Float, JSON, desc, func, Index, UniqueConstraint, Date
+from sqlalchemy import create_engine, Column, Integer, BigInteger, String, DateTime, Text, Boolean, ForeignKey, Float, JSON, desc, func, Index, UniqueConstraint, Date
 from sqlalchemy.orm import sessionmaker, relationship, declarative_base
 from sqlalchemy.sql import func
 
@@ -60,32 +60,67 @@ class Seller(Base):
 class ProductSource(Base):
     __tablename__ = "product_sources"
     id = Column(Integer, primary_key=True, index=True)
-    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False, index=True)
     source_id = Column(Integer, ForeignKey("sources.id", ondelete="CASCADE"), nullable=False)
     seller_id = Column(Integer, ForeignKey("sellers.id", ondelete="SET NULL"), nullable=True)
     url = Column(Text, nullable=False)
+    # Adaptive scheduling: when this source is due again and how its interval has evolved
+    next_scrape_at = Column(DateTime(timezone=True), nullable=True, index=True)
+    scrape_interval_seconds = Column(Integer, nullable=True)
+    unchanged_scrapes = Column(Integer, default=0)
     product = relationship("Product", back_populates="product_sources")
     source = relationship("Source", back_populates="product_sources")
     seller = relationship("Seller", back_populates="product_sources")
     price_logs = relationship("PriceLog", back_populates="product_source", cascade="all, delete-orphan")
+    latest_price = relationship("ProductSourceLatest", back_populates="product_source", uselist=False, cascade="all, delete-orphan")
+    price_stats = relationship("ProductSourcePriceStats", back_populates="product_source", uselist=False, cascade="all, delete-orphan")
+    price_history_hourly = relationship("PriceHistoryHourly", back_populates="product_source", cascade="all, delete-orphan")
     price_history_daily = relationship("PriceHistoryDaily", back_populates="product_source", cascade="all, delete-orphan")
     price_history_monthly = relationship("PriceHistoryMonthly", back_populates="product_source", cascade="all, delete-orphan")
 
 class PriceLog(Base):
     __tablename__ = "price_logs"
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     product_source_id = Column(Integer, ForeignKey("product_sources.id", ondelete="CASCADE"), nullable=False)
     price_cents = Column(Integer, nullable=False)
     currency = Column(String(3), default="INR")
     availability = Column(String(50), default="Unknown")
     in_stock = Column(Boolean, default=True)
-    scraped_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    # Partition key, so it is part of the primary key
+    scraped_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now(), index=True)
     avg_review_sentiment = Column(Float, nullable=True)
     product_source = relationship("ProductSource", back_populates="price_logs")
     __table_args__ = (
         UniqueConstraint('product_source_id', 'scraped_at', name='_product_source_scraped_at_uc'),
+        {"postgresql_partition_by": "RANGE (scraped_at)"},
     )
 
+class ProductSourceLatest(Base):
+    __tablename__ = "product_source_latest"
+    product_source_id = Column(Integer, ForeignKey("product_sources.id", ondelete="CASCADE"), primary_key=True)
+    price_cents = Column(Integer, nullable=False)
+    currency = Column(String(3), default="INR")
+    availability = Column(String(50), default="Unknown")
+    in_stock = Column(Boolean, default=True)
+    avg_review_sentiment = Column(Float, nullable=True)
+    scraped_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    previous_price_cents = Column(Integer, nullable=True)
+    product_source = relationship("ProductSource", back_populates="latest_price")
+
+class ProductSourcePriceStats(Base):
+    __tablename__ = "product_source_price_stats"
+    product_source_id = Column(Integer, ForeignKey("product_sources.id", ondelete="CASCADE"), primary_key=True)
+    min_cents = Column(Integer, nullable=False)
+    min_at = Column(DateTime(timezone=True), nullable=False)
+    max_cents = Column(Integer, nullable=False)
+    max_at = Column(DateTime(timezone=True), nullable=False)
+    min_30d_cents = Column(Integer, nullable=True)
+    sum_30d_cents = Column(BigInteger, nullable=False, default=0)
+    samples_30d = Column(Integer, nullable=False, default=0)
+    window_start = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    product_source = relationship("ProductSource", back_populates="price_stats")
+
 class ScamScore(Base):
     __tablename__ = "scam_scores"
     id = Column(Integer, primary_key=True, index=True)
@@ -102,12 +137,30 @@ class Watchlist(Base):
     user_id = Column(String(100), nullable=True)
     product_id = Column(Integer, nullable=False)
     alert_rules = Column(JSON, nullable=True)
+    alert_threshold_cents = Column(Integer, nullable=True)
+    last_alerted_cents = Column(Integer, nullable=True)
+
+class PriceHistoryHourly(Base):
+    __tablename__ = "price_history_hourly"
+    id = Column(Integer, primary_key=True, index=True)
+    product_source_id = Column(Integer, ForeignKey("product_sources.id", ondelete="CASCADE"), nullable=False)
+    hour = Column(DateTime(timezone=True), nullable=False, index=True)
+    min_cents = Column(Integer, nullable=False)
+    max_cents = Column(Integer, nullable=False)
+    avg_cents = Column(Integer, nullable=False)
+    last_cents = Column(Integer, nullable=False)
+    currency = Column(String(3), default="INR")
+    samples = Column(Integer)
+    product_source = relationship("ProductSource", back_populates="price_history_hourly")
+    __table_args__ = (
+        UniqueConstraint('product_source_id', 'hour', name='_hourly_product_source_hour_uc'),
+    )
 
 class PriceHistoryDaily(Base):
     __tablename__ = "price_history_daily"
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     product_source_id = Column(Integer, ForeignKey("product_sources.id", ondelete="CASCADE"), nullable=False)
-    day = Column(Date, nullable=False, index=True)
+    day = Column(Date, primary_key=True, index=True)
     min_cents = Column(Integer, nullable=False)
     max_cents = Column(Integer, nullable=False)
     avg_cents = Column(Integer, nullable=False)
@@ -117,6 +170,7 @@ class PriceHistoryDaily(Base):
     product_source = relationship("ProductSource", back_populates="price_history_daily")
     __table_args__ = (
         UniqueConstraint('product_source_id', 'day', name='_daily_product_source_day_uc'),
+        {"postgresql_partition_by": "RANGE (day)"},
     )
 
 class PriceHistoryMonthly(Base):
@@ -133,4 +187,11 @@ class PriceHistoryMonthly(Base):
     product_source = relationship("ProductSource", back_populates="price_history_monthly")
     __table_args__ = (
         UniqueConstraint('product_source_id', 'month', name='_monthly_product_source_month_uc'),
-    )
\ No newline at end of file
+    )
+
+class AggregationWatermark(Base):
+    __tablename__ = "aggregation_watermarks"
+    job_name = Column(String(50), primary_key=True)
+    watermark = Column(Date, nullable=True)
+    watermark_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
\ No newline at end of file
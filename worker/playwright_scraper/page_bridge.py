@@ -0,0 +1,41 @@
+# worker/playwright_scraper/page_bridge.py
+import asyncio
+import inspect
+from typing import Any
+
+
+class SyncPageBridge:
+    """
+    Sync-API view of an async Playwright object, so a scraper's extract_data
+    can run unchanged against a page owned by the async engine.
+
+    extract_data runs on a worker thread; every call it makes (locator,
+    inner_text, get_attribute, all, ...) is executed on the engine's event
+    loop and the thread blocks for the result, just as the sync API would.
+    Playwright objects in results (locators, handles, the context, lists of
+    them) come back wrapped, everything else is returned as is.
+    """
+    def __init__(self, target: Any, loop: asyncio.AbstractEventLoop):
+        self._target = target
+        self._loop = loop
+
+    def __getattr__(self, name: str):
+        value = getattr(self._target, name)
+        if not callable(value):
+            return self._wrap(value)
+
+        def call(*args, **kwargs):
+            async def run():
+                result = value(*args, **kwargs)
+                if inspect.isawaitable(result):
+                    result = await result
+                return result
+            return self._wrap(asyncio.run_coroutine_threadsafe(run(), self._loop).result())
+        return call
+
+    def _wrap(self, value: Any) -> Any:
+        if isinstance(value, list):
+            return [self._wrap(item) for item in value]
+        if type(value).__module__.startswith("playwright."):
+            return SyncPageBridge(value, self._loop)
+        return value
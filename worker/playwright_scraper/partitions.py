@@ -0,0 +1,103 @@
+# worker/playwright_scraper/partitions.py
+import os
+import re
+from datetime import date, datetime, time, timezone, timedelta
+from typing import List, Tuple
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+# --- Partition Configuration ---
+# Monthly partitions are created this many months ahead, so inserts never land in the default partition
+MONTHS_AHEAD = int(os.getenv("PRICE_PARTITION_MONTHS_AHEAD", "3"))
+
+# Range-partitioned tables and their partition key
+PARTITIONED_TABLES = {
+    "price_logs": "scraped_at",
+    "price_history_daily": "day",
+}
+
+_PARTITION_NAME = re.compile(r"_p(\d{4})(\d{2})$")
+
+
+def month_start(d: date) -> date:
+    return d.replace(day=1)
+
+
+def next_month(month: date) -> date:
+    return (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def _bound(table: str, month: date) -> str:
+    # price_logs is keyed on a timestamptz, so pin the bound to UTC midnight
+    if PARTITIONED_TABLES[table] == "scraped_at":
+        return f"'{month:%Y-%m-%d} 00:00:00+00'"
+    return f"'{month:%Y-%m-%d}'"
+
+
+def create_partition(db: Session, table: str, month: date):
+    """Creates the monthly partition for `month` if it does not exist yet."""
+    db.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {partition_name(table, month)} PARTITION OF {table} "
+        f"FOR VALUES FROM ({_bound(table, month)}) TO ({_bound(table, next_month(month))})"
+    ))
+
+
+def list_partitions(db: Session, table: str) -> List[Tuple[str, date]]:
+    """Monthly partitions of a table as (name, first day of month), oldest first. The default partition is skipped."""
+    rows = db.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = CAST(:parent AS regclass)"
+    ), {"parent": table}).fetchall()
+
+    partitions = []
+    for (name,) in rows:
+        match = _PARTITION_NAME.search(name)
+        if match:
+            partitions.append((name, date(int(match.group(1)), int(match.group(2)), 1)))
+    return sorted(partitions, key=lambda p: p[1])
+
+
+def ensure_partitions(db: Session, months_ahead: int = MONTHS_AHEAD):
+    """Creates the current month's partition and the next `months_ahead` for every partitioned table."""
+    current = month_start(datetime.now(timezone.utc).date())
+    for table in PARTITIONED_TABLES:
+        month = current
+        for _ in range(months_ahead + 1):
+            try:
+                with db.begin_nested():
+                    create_partition(db, table, month)
+            except Exception as e:
+                # Usually rows for that month already sit in the default partition
+                print(f"[Partitions] Could not create {partition_name(table, month)}: {e}")
+            month = next_month(month)
+    db.commit()
+
+
+def drop_partitions_before(db: Session, table: str, boundary: date) -> int:
+    """
+    Retention for data that has been rolled up: every monthly partition that ends
+    on or before `boundary` is detached and dropped, which is a catalog change
+    instead of a row-by-row delete. Stray rows in the default partition are
+    deleted by range. The caller commits.
+    """
+    dropped = 0
+    for name, month in list_partitions(db, table):
+        if next_month(month) > boundary:
+            break
+        db.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+        db.execute(text(f"DROP TABLE {name}"))
+        dropped += 1
+        print(f"[Partitions] Dropped {name}")
+
+    key = PARTITIONED_TABLES[table]
+    cutoff = datetime.combine(boundary, time.min, tzinfo=timezone.utc) if key == "scraped_at" else boundary
+    db.execute(
+        text(f"DELETE FROM {table}_default WHERE {key} < :cutoff"),
+        {"cutoff": cutoff}
+    )
+    return dropped
@@ -0,0 +1,131 @@
+# worker/playwright_scraper/rate_limiter.py
+import os
+import time
+import asyncio
+from typing import Dict, Tuple
+
+from . import metrics
+from .redis_client import get_redis
+
+# --- Rate Limit Configuration ---
+# Per-domain limits as "domain=rate:burst" pairs, rate in requests per second.
+# Example: SCRAPER_RATE_LIMITS="amazon.in=0.2:2,flipkart.com=0.5:3"
+DEFAULT_RATE = float(os.getenv("SCRAPER_DEFAULT_RATE", "0.5"))
+DEFAULT_BURST = int(os.getenv("SCRAPER_DEFAULT_BURST", "2"))
+RATE_LIMITS_SPEC = os.getenv("SCRAPER_RATE_LIMITS", "")
+# A sync job waits at most this long for a token before handing the work back to the queue
+MAX_SYNC_WAIT_SECONDS = float(os.getenv("SCRAPER_MAX_RATE_WAIT", "10"))
+
+BUCKET_KEY_PREFIX = "rate_bucket:"
+
+# Token bucket refilled lazily on each call. Redis TIME is used so every
+# container agrees on the clock. Returns 0 when a token was taken, otherwise
+# the number of milliseconds until one will be available.
+TOKEN_BUCKET_LUA = """
+local key = KEYS[1]
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now_ms = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+
+local state = redis.call('HMGET', key, 'tokens', 'ts')
+local tokens = tonumber(state[1])
+local ts = tonumber(state[2])
+if tokens == nil then
+    tokens = burst
+    ts = now_ms
+end
+
+tokens = math.min(burst, tokens + (now_ms - ts) * rate / 1000)
+local wait_ms = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait_ms = math.ceil((1 - tokens) * 1000 / rate)
+end
+
+redis.call('HSET', key, 'tokens', tostring(tokens), 'ts', now_ms)
+redis.call('PEXPIRE', key, math.ceil(burst * 1000 / rate) + 60000)
+return wait_ms
+"""
+
+
+class RateLimited(Exception):
+    """Raised when a domain's budget will not refill within the allowed wait."""
+    def __init__(self, domain: str, retry_after: float):
+        super().__init__(f"Rate limit for {domain}, retry in {retry_after:.1f}s")
+        self.domain = domain
+        self.retry_after = retry_after
+
+
+def _parse_limits(spec: str) -> Dict[str, Tuple[float, int]]:
+    limits = {}
+    for entry in spec.split(","):
+        entry = entry.strip()
+        if not entry or "=" not in entry:
+            continue
+        domain, values = entry.split("=", 1)
+        try:
+            rate, burst = values.split(":", 1)
+            limits[domain.strip().lower()] = (float(rate), int(burst))
+        except ValueError:
+            print(f"[RateLimiter] Ignoring malformed limit '{entry}'")
+    return limits
+
+
+DOMAIN_LIMITS = _parse_limits(RATE_LIMITS_SPEC)
+
+_script = None
+
+
+def limits_for(domain: str) -> Tuple[float, int]:
+    """Most specific configured limit for a domain (subdomains inherit), else the default."""
+    domain = domain.lower()
+    for configured, limit in sorted(DOMAIN_LIMITS.items(), key=lambda item: -len(item[0])):
+        if domain == configured or domain.endswith("." + configured):
+            return limit
+    return DEFAULT_RATE, DEFAULT_BURST
+
+
+def try_acquire(domain: str) -> float:
+    """Takes a token for the domain. Returns 0.0 on success, otherwise seconds until the next token."""
+    global _script
+    rate, burst = limits_for(domain)
+    try:
+        if _script is None:
+            _script = get_redis().register_script(TOKEN_BUCKET_LUA)
+        wait_ms = int(_script(keys=[BUCKET_KEY_PREFIX + domain], args=[rate, burst]))
+    except Exception as e:
+        # Never stall scraping because Redis is briefly unavailable
+        print(f"[RateLimiter] Could not check bucket for {domain}: {e}")
+        return 0.0
+    return wait_ms / 1000
+
+
+def acquire(domain: str, max_wait: float = MAX_SYNC_WAIT_SECONDS):
+    """Blocks until a token is available. Raises RateLimited if that would take longer than max_wait."""
+    waited = 0.0
+    while True:
+        wait = try_acquire(domain)
+        if wait <= 0:
+            if waited:
+                metrics.incr("rate_limit_wait_ms", int(waited * 1000))
+            return
+        if waited + wait > max_wait:
+            metrics.incr("rate_limit_deferred")
+            raise RateLimited(domain, wait)
+        time.sleep(wait)
+        waited += wait
+
+
+async def acquire_async(domain: str):
+    """Waits for a token without blocking the event loop, so other domains keep scraping."""
+    waited = 0.0
+    while True:
+        wait = await asyncio.to_thread(try_acquire, domain)
+        if wait <= 0:
+            if waited:
+                metrics.incr("rate_limit_wait_ms", int(waited * 1000))
+            return
+        await asyncio.sleep(wait)
+        waited += wait
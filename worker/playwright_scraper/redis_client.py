@@ -0,0 +1,46 @@
+# worker/playwright_scraper/redis_client.py
+import os
+import json
+from redis import Redis
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# Price and alert events for the API's WebSockets. Capped, so clients can resume
+# from a recent event id; anything older than the cap needs a full refetch.
+PRICE_EVENTS_STREAM = "price_events"
+PRICE_EVENTS_MAXLEN = int(os.getenv("PRICE_EVENTS_MAXLEN", "100000"))
+
+# Set by the backend when a scrape is enqueued (see backend/app/utils/scraper_queue.py)
+# so the same product source is never queued twice while a job is pending.
+INFLIGHT_KEY_PREFIX = "scrape:inflight:"
+
+_redis_conn = None
+
+
+def get_redis() -> Redis:
+    """Lazily-created Redis connection shared by the scraper helpers (metrics, tiers, rate limits)."""
+    global _redis_conn
+    if _redis_conn is None:
+        _redis_conn = Redis.from_url(REDIS_URL)
+    return _redis_conn
+
+
+def release_inflight(source_ids):
+    """
+    Clears the enqueue-time dedup markers once these sources have been processed:
+    by the scrape job, or for buffered points by the ingest flusher after its commit.
+    """
+    if not source_ids:
+        return
+    try:
+        get_redis().delete(*[f"{INFLIGHT_KEY_PREFIX}{sid}" for sid in source_ids])
+    except Exception as e:
+        print(f"[Worker] Could not clear in-flight markers: {e}")
+
+
+def publish_event(event: dict, pipe=None):
+    """Appends an event to the price_events stream, on `pipe` when batching."""
+    (pipe if pipe is not None else get_redis()).xadd(
+        PRICE_EVENTS_STREAM, {"data": json.dumps(event)},
+        maxlen=PRICE_EVENTS_MAXLEN, approximate=True
+    )
@@ -0,0 +1,107 @@
+# worker/playwright_scraper/resource_blocking.py
+import os
+from typing import Dict, Iterable, Optional
+from urllib.parse import urlparse
+
+from . import metrics
+
+# --- Blocking Configuration ---
+BLOCKING_ENABLED = os.getenv("SCRAPER_BLOCK_RESOURCES", "true").lower() == "true"
+
+# Resource types none of the scrapers read. Image *URLs* still come from the
+# DOM (e.g. the src of #landingImage), only the downloads are skipped.
+DEFAULT_BLOCKED_TYPES = frozenset({"image", "font", "media"})
+
+# Ads, analytics and tag managers seen on the supported retailers
+TRACKER_DOMAINS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "googlesyndication.com",
+    "doubleclick.net",
+    "adservice.google.com",
+    "amazon-adsystem.com",
+    "facebook.net",
+    "facebook.com/tr",
+    "scorecardresearch.com",
+    "criteo.com",
+    "criteo.net",
+    "hotjar.com",
+    "clarity.ms",
+    "bat.bing.com",
+    "taboola.com",
+    "outbrain.com",
+    "nr-data.net",
+    "newrelic.com",
+)
+
+# Aborted requests are never downloaded, so their real size is unknown.
+# Savings are reported with these typical per-request sizes instead.
+ESTIMATED_BYTES = {
+    "image": 60_000,
+    "font": 40_000,
+    "media": 500_000,
+    "tracker": 30_000,
+}
+
+
+class ResourceBlocker:
+    """
+    Playwright route handler that aborts requests the scrapers never use.
+    One instance per page, so the counters describe a single scrape.
+    """
+    def __init__(self, allowlist: Iterable[str] = (), blocked_types: Iterable[str] = DEFAULT_BLOCKED_TYPES):
+        # Allowlist entries are either resource types ("image") or URL substrings ("m.media-amazon.com")
+        self.allowlist = tuple(allowlist)
+        self.blocked_types = frozenset(blocked_types) - set(self.allowlist)
+        self.blocked: Dict[str, int] = {}
+
+    def _is_allowed_url(self, url: str) -> bool:
+        return any(entry in url for entry in self.allowlist if "." in entry or "/" in entry)
+
+    def category_for(self, resource_type: str, url: str) -> Optional[str]:
+        """Returns why a request should be blocked, or None to let it through."""
+        if self._is_allowed_url(url):
+            return None
+        host_and_path = urlparse(url).netloc + urlparse(url).path
+        if any(tracker in host_and_path for tracker in TRACKER_DOMAINS):
+            return "tracker"
+        if resource_type in self.blocked_types:
+            return resource_type
+        return None
+
+    def _count(self, category: str):
+        self.blocked[category] = self.blocked.get(category, 0) + 1
+
+    def handle(self, route):
+        """Sync API route handler."""
+        category = self.category_for(route.request.resource_type, route.request.url)
+        if category:
+            self._count(category)
+            route.abort()
+        else:
+            route.continue_()
+
+    async def handle_async(self, route):
+        """Async API route handler."""
+        category = self.category_for(route.request.resource_type, route.request.url)
+        if category:
+            self._count(category)
+            await route.abort()
+        else:
+            await route.continue_()
+
+    @property
+    def requests_blocked(self) -> int:
+        return sum(self.blocked.values())
+
+    @property
+    def estimated_bytes_saved(self) -> int:
+        return sum(ESTIMATED_BYTES.get(cat, 0) * n for cat, n in self.blocked.items())
+
+    def report(self, label: str):
+        """Logs and records what this page did not download."""
+        if not self.blocked:
+            return
+        print(f"[ResourceBlocker] {label}: blocked {self.requests_blocked} requests {self.blocked}, ~{self.estimated_bytes_saved // 1024} KB saved")
+        metrics.incr("resources_blocked", self.requests_blocked)
+        metrics.incr("resource_bytes_saved_estimate", self.estimated_bytes_saved)
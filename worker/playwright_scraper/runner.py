@@ -2,34 +2,42 @@
 import os
 import sys
 import json
+import time
 from redis import Redis
-from rq import Worker, Queue
+from rq import Worker, Queue, get_current_job
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, desc, func
+from sqlalchemy import create_engine, desc, func, case
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.dialects.postgresql import insert
 from contextlib import contextmanager
 import whois
 from datetime import datetime, timezone, timedelta
-from typing import List, Optional 
+from typing import List, Optional, Tuple
 from playwright_scraper.sales_discovery import discover_all_sales 
-from pywebpush import webpush, WebPushException
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 from playwright_scraper.scrapers import get_scraper
+from playwright_scraper.async_engine import get_async_engine
+from playwright_scraper.rate_limiter import RateLimited
 import traceback # <--- 1. IMPORT TRACEBACK
 
 # --- FIX: Import from aggregation.py ---
 from .aggregation import run_aggregation_jobs
+from .scheduling import apply_schedule, schedule_retry
+from .alerts import claim_product_alerts, claim_all_alerts, notify
+from .redis_client import publish_event, release_inflight, PRICE_EVENTS_STREAM
+from .ingest import INGEST_MODE, enqueue_price_points
 
 # --- FIX: Import all models from models.py ---
 from .models import (
     Base,
     SessionLocal,
-    User,
     Product,
     Source,
     Seller,
     ProductSource,
     PriceLog,
+    ProductSourceLatest,
+    ProductSourcePriceStats,
     ScamScore,
     Watchlist,
     PriceHistoryDaily,
@@ -45,7 +53,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 load_dotenv()
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 
-# Redis connection for Pub/Sub
+# Redis connection for in-flight markers and job retries
 redis_conn = Redis.from_url(REDIS_URL)
 
 # Context manager for database sessions
@@ -98,127 +106,323 @@ def get_or_create_seller(db: Session, marketplace: str, seller_name: str, seller
 
 
 # --- 4. The UPDATED Product Scraper Task ---
+def compute_review_sentiment(reviews) -> Optional[float]:
+    """Average VADER compound score over the scraped review snippets."""
+    if not reviews or not isinstance(reviews, list):
+        return None
+    analyzer = SentimentIntensityAnalyzer()
+    total_compound_score = 0
+    valid_reviews_count = 0
+    for review_text in reviews:
+        if isinstance(review_text, str) and review_text.strip():
+            vs = analyzer.polarity_scores(review_text)
+            total_compound_score += vs['compound']
+            valid_reviews_count += 1
+    if valid_reviews_count > 0:
+        return total_compound_score / valid_reviews_count
+    return None
+
+
+def upsert_latest_price(db: Session, price_log: PriceLog):
+    """
+    Writes a new PriceLog's values into product_source_latest, moving the old
+    price into previous_price_cents. scraped_at is now(), which is the same
+    transaction timestamp the PriceLog gets from its server default.
+    """
+    values = {
+        column: getattr(price_log, column)
+        for column in ('product_source_id', 'price_cents', 'currency', 'availability', 'in_stock', 'avg_review_sentiment')
+        if getattr(price_log, column) is not None  # unset fields fall back to the column defaults
+    }
+    stmt = insert(ProductSourceLatest).values(**values, scraped_at=func.now())
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=['product_source_id'],
+        set_={
+            'previous_price_cents': ProductSourceLatest.price_cents,
+            'price_cents': stmt.excluded.price_cents,
+            'currency': stmt.excluded.currency,
+            'availability': stmt.excluded.availability,
+            'in_stock': stmt.excluded.in_stock,
+            'avg_review_sentiment': stmt.excluded.avg_review_sentiment,
+            'scraped_at': stmt.excluded.scraped_at
+        },
+        # Never let an older write overtake a newer one
+        where=ProductSourceLatest.scraped_at <= stmt.excluded.scraped_at
+    ))
+
+
+def upsert_price_stats(db: Session, price_log: PriceLog):
+    """
+    Folds a new PriceLog into product_source_price_stats. Every SET expression
+    sees the row as it was before the statement, so the *_at columns are
+    compared against the old extremes.
+    """
+    price = price_log.price_cents
+    stmt = insert(ProductSourcePriceStats).values(
+        product_source_id=price_log.product_source_id,
+        min_cents=price, min_at=func.now(),
+        max_cents=price, max_at=func.now(),
+        min_30d_cents=price, sum_30d_cents=price, samples_30d=1
+    )
+    stats = ProductSourcePriceStats
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=['product_source_id'],
+        set_={
+            'min_at': case((stmt.excluded.min_cents < stats.min_cents, stmt.excluded.min_at), else_=stats.min_at),
+            'min_cents': func.least(stats.min_cents, stmt.excluded.min_cents),
+            'max_at': case((stmt.excluded.max_cents > stats.max_cents, stmt.excluded.max_at), else_=stats.max_at),
+            'max_cents': func.greatest(stats.max_cents, stmt.excluded.max_cents),
+            # LEAST ignores NULL, so an empty window simply takes the new price
+            'min_30d_cents': func.least(stats.min_30d_cents, stmt.excluded.min_30d_cents),
+            'sum_30d_cents': stats.sum_30d_cents + stmt.excluded.sum_30d_cents,
+            'samples_30d': stats.samples_30d + 1,
+            'updated_at': func.now()
+        }
+    ))
+
+
+def price_point(scraper, data: dict, product_id: int, source_id: int) -> dict:
+    """
+    One scrape result as plain values: what the direct path saves right away and
+    what the write-behind path buffers for the ingest flusher (see ingest.py).
+    """
+    return {
+        "product_id": product_id,
+        "source_id": source_id,
+        "marketplace": scraper.__class__.__name__.replace("Scraper", ""),
+        "price_cents": data.get("price", 0),
+        "currency": data.get("currency", "INR"),
+        "availability": data.get("availability", "Unknown"),
+        "in_stock": data.get("in_stock", True),
+        "avg_review_sentiment": compute_review_sentiment(data.get("recent_reviews", [])),
+        "seller_name": data.get("seller_name"),
+        "seller_rating": data.get("seller_rating"),
+        "seller_review_count": data.get("seller_review_count"),
+        "title": data.get("title"),
+        "image_url": data.get("image_url"),
+        "description": data.get("description"),
+        "brand": data.get("brand"),
+        # The flusher logs the scrape time, so a batch retried after a crash is recognised
+        "scraped_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def save_scraped_product(db: Session, scraper, data: dict, product_id: int, source_id: int) -> bool:
+    """Updates the seller, saves a PriceLog, refreshes the Product and publishes the update."""
+    return save_price_point(db, price_point(scraper, data, product_id, source_id))
+
+
+def save_price_point(db: Session, point: dict, publish: bool = True) -> bool:
+    """The direct path: one scrape, one transaction."""
+    product_id, source_id = point["product_id"], point["source_id"]
+    avg_sentiment_score = point["avg_review_sentiment"]
+
+    # --- NEW SELLER LOGIC ---
+    product_source = db.query(ProductSource).filter(ProductSource.id == source_id).first()
+    if not product_source:
+         print(f"[Worker] ProductSource {source_id} not found. Aborting.")
+         return False
+
+    marketplace_name = point["marketplace"]
+    seller = get_or_create_seller(
+        db,
+        marketplace=marketplace_name,
+        seller_name=point["seller_name"],
+        seller_rating=point["seller_rating"],
+        review_count=point["seller_review_count"]
+    )
+    
+    # Link ProductSource to the Seller if not already linked or if changed
+    if seller and product_source.seller_id != seller.id:
+        product_source.seller_id = seller.id
+        # db.commit() # Commit will happen below
+        print(f"[Worker] Linked ProductSource {source_id} to Seller {seller.id} ({seller.seller_name})")
+    # --- END SELLER LOGIC ---
+
+    # --- CHECK IF PRICE CHANGED (FOR LOGGING ONLY) ---
+    last_price = db.query(ProductSourceLatest.price_cents).filter(
+        ProductSourceLatest.product_source_id == source_id
+    ).scalar()
+
+    new_price_cents = point["price_cents"]
+    
+    price_changed = last_price != new_price_cents
+    if not price_changed:
+        print(f"[Worker] Price for {product_id} is unchanged (₹{new_price_cents / 100}). Logging anyway for history.")
+    else:
+        last_price_cents = last_price if last_price is not None else 'N/A'
+        print(f"[Worker] Price changed (or is new). Old: {last_price_cents}, New: {new_price_cents}. Saving new log.")
+
+    # Volatile sources come back sooner, stable ones drift towards the max interval
+    apply_schedule(db, product_source, price_changed)
+
+    # Step 1: Create the new PriceLog (always, so history has every sample)
+    new_price_log = PriceLog(
+        product_source_id=source_id,
+        price_cents=new_price_cents,
+        currency=point["currency"],
+        availability=point["availability"],
+        in_stock=point["in_stock"],
+        avg_review_sentiment=avg_sentiment_score # Save calculated sentiment
+    )
+    db.add(new_price_log)
+    # ...and keep the per-source latest price and price stats in step, in the same transaction
+    upsert_latest_price(db, new_price_log)
+    upsert_price_stats(db, new_price_log)
+    
+    # Step 2: Update the main Product entry (if needed)
+    product = db.query(Product).filter(Product.id == product_id).first()
+    if product:
+        product.title = point["title"] or product.title
+        product.image_url = point["image_url"] or product.image_url
+        product.description = point["description"] or product.description
+        product.brand = point["brand"] or product.brand
+    
+    db.commit()
+    print(f"[Worker] ✅ Success. DB updated for {product.title if product else 'product_id ' + str(product_id)}")
+
+    # Step 3: Append the update to the price event stream
+    if publish:
+        try:
+            # Refresh seller from the product_source relationship
+            db.refresh(product_source)
+            seller_info = product_source.seller
+        
+            publish_event({
+                "type": "PRICE_UPDATE",
+                "product_id": product_id,
+                "new_price": new_price_cents / 100,
+                "source_id": source_id,
+                "source_name": marketplace_name,
+                # --- UPDATED: Pull seller info from the seller object ---
+                "seller_name": seller_info.seller_name if seller_info else None,
+                "seller_rating": seller_info.seller_rating if seller_info else None,
+                "seller_review_count": seller_info.review_count if seller_info else None,
+                "avg_review_sentiment": avg_sentiment_score,
+                # Lets every API replica measure its delivery lag
+                "published_at": time.time()
+            })
+            print(f"[Worker] 📢 Appended update to the '{PRICE_EVENTS_STREAM}' stream.")
+        except Exception as e:
+            print(f"[Worker] ❌ Failed to publish to Redis: {e}")
+
+    # Step 4: Only a new price can cross someone's threshold
+    if price_changed:
+        try:
+            alerts = claim_product_alerts(db, product_id)
+            db.commit()
+            if publish:
+                notify(db, alerts)
+        except Exception as e:
+            db.rollback()
+            print(f"[Worker] ❌ Failed to evaluate alerts for product {product_id}: {e}")
+    return True
+
+
 def scrape_and_save_product(url: str, product_id: int, source_id: int):
     """Worker task to scrape a product, update seller, save price IF changed, and publish."""
     print(f"[Worker] Scraping: {url} (ProductID: {product_id})")
     
     scraper = None
+    # Re-enqueued or handed to the ingest flusher: still in flight, keep the dedup marker
+    keep_marker = False
     try:
         scraper = get_scraper(url)
-        data = scraper.scrape() 
+        try:
+            data = scraper.scrape()
+        except RateLimited as e:
+            # The domain's budget is empty. Hand the work back instead of idling this worker.
+            job = get_current_job()
+            if job is not None:
+                Queue(job.origin, connection=redis_conn).enqueue_in(
+                    timedelta(seconds=e.retry_after),
+                    scrape_and_save_product, url, product_id, source_id,
+                    job_timeout='5m'
+                )
+                keep_marker = True
+                print(f"[Worker] {e}. Re-enqueued {url}.")
+            return None
         
         if not data or not data.get("price") or data.get("price") == 0:
             print(f"[Worker] Scrape failed for {url}: No data or price.")
+            with get_db_session() as db:
+                schedule_retry(db, source_id)
             return None
 
-        # ... (Sentiment Analysis logic remains the same) ...
-        avg_sentiment_score = None
-        reviews = data.get("recent_reviews", [])
-        if reviews and isinstance(reviews, list) and len(reviews) > 0:
-            analyzer = SentimentIntensityAnalyzer()
-            total_compound_score = 0
-            valid_reviews_count = 0
-            for review_text in reviews:
-                if isinstance(review_text, str) and review_text.strip():
-                    vs = analyzer.polarity_scores(review_text)
-                    total_compound_score += vs['compound']
-                    valid_reviews_count += 1
-            if valid_reviews_count > 0:
-                avg_sentiment_score = total_compound_score / valid_reviews_count
-        # --- End Sentiment Analysis ---
-
+        if INGEST_MODE == "buffered":
+            # Write-behind: the ingest flusher saves it with the rest of its batch and clears
+            # the marker after its commit, so the source is not due again before then
+            enqueue_price_points([price_point(scraper, data, product_id, source_id)])
+            keep_marker = True
+            return data
 
         with get_db_session() as db:
-            # --- NEW SELLER LOGIC ---
-            product_source = db.query(ProductSource).filter(ProductSource.id == source_id).first()
-            if not product_source:
-                 print(f"[Worker] ProductSource {source_id} not found. Aborting.")
-                 return None
-
-            marketplace_name = scraper.__class__.__name__.replace("Scraper", "")
-            seller = get_or_create_seller(
-                db,
-                marketplace=marketplace_name,
-                seller_name=data.get("seller_name"),
-                seller_rating=data.get("seller_rating"),
-                review_count=data.get("seller_review_count")
-            )
-            
-            # Link ProductSource to the Seller if not already linked or if changed
-            if seller and product_source.seller_id != seller.id:
-                product_source.seller_id = seller.id
-                # db.commit() # Commit will happen below
-                print(f"[Worker] Linked ProductSource {source_id} to Seller {seller.id} ({seller.seller_name})")
-            # --- END SELLER LOGIC ---
-
-            # --- CHECK IF PRICE CHANGED (FOR LOGGING ONLY) ---
-            last_price_log = db.query(PriceLog).filter(
-                PriceLog.product_source_id == source_id
-            ).order_by(desc(PriceLog.scraped_at)).first()
-
-            new_price_cents = data.get("price", 0)
-            
-            if last_price_log and last_price_log.price_cents == new_price_cents:
-                print(f"[Worker] Price for {product_id} is unchanged (₹{new_price_cents / 100}). Logging anyway for history.")
-            else:
-                last_price_cents = last_price_log.price_cents if last_price_log else 'N/A'
-                print(f"[Worker] Price changed (or is new). Old: {last_price_cents}, New: {new_price_cents}. Saving new log.")
-            
-            # --- START CORRECTION ---
-            # These lines are now OUTSIDE the if/else block, so they
-            # will run every single time, fixing the UnboundLocalError.
-
-            # Step 1: Create the new PriceLog
-            new_price_log = PriceLog(
-                product_source_id=source_id,
-                price_cents=new_price_cents,
-                currency=data.get("currency", "INR"),
-                availability=data.get("availability", "Unknown"),
-                in_stock=data.get("in_stock", True),
-                avg_review_sentiment=avg_sentiment_score # Save calculated sentiment
-            )
-            db.add(new_price_log)
-            # --- END CORRECTION ---
-            
-            # Step 2: Update the main Product entry (if needed)
-            product = db.query(Product).filter(Product.id == product_id).first()
-            if product:
-                product.title = data.get("title") or product.title
-                product.image_url = data.get("image_url") or product.image_url
-                product.description = data.get("description") or product.description
-                product.brand = data.get("brand") or product.brand
-            
-            db.commit()
-            print(f"[Worker] ✅ Success. DB updated for {product.title if product else 'product_id ' + str(product_id)}")
-            
-            # Step 3: Publish update to Redis
-            try:
-                # Refresh seller from the product_source relationship
-                db.refresh(product_source)
-                seller_info = product_source.seller
-                
-                update_message = json.dumps({
-                    "type": "PRICE_UPDATE",
-                    "product_id": product_id,
-                    "new_price": new_price_cents / 100,
-                    "source_id": source_id,
-                    "source_name": marketplace_name,
-                    # --- UPDATED: Pull seller info from the seller object ---
-                    "seller_name": seller_info.seller_name if seller_info else None,
-                    "seller_rating": seller_info.seller_rating if seller_info else None,
-                    "seller_review_count": seller_info.review_count if seller_info else None,
-                    "avg_review_sentiment": avg_sentiment_score
-                })
-                redis_conn.publish("price_updates", update_message)
-                print(f"[Worker] 📢 Published update to 'price_updates' channel.")
-            except Exception as e:
-                print(f"[Worker] ❌ Failed to publish to Redis: {e}")
+            if not save_scraped_product(db, scraper, data, product_id, source_id):
+                return None
                 
         return data # Return original scraped data
     
     except Exception as e:
         print(f"[Worker] ❌ CRITICAL ERROR scraping {url}: {e}\n{traceback.format_exc()}")
         return None
+    finally:
+        if not keep_marker:
+            release_inflight([source_id])
+
+
+def scrape_and_save_batch(items: List[Tuple[str, int, int]]):
+    """
+    Worker task for a domain-batched scrape job. All (url, product_id, source_id)
+    items are scraped concurrently on the async engine, sharing one browser context,
+    then saved through a single DB session. A failing item is rolled back and
+    skipped without affecting the rest of the batch. Returns the number saved.
+    """
+    print(f"[Worker] Batch scrape of {len(items)} product sources...")
+    # Sources whose points went to the ingest flusher, which clears their markers after its commit
+    handed_off = set()
+    try:
+        scrapers, scrape_items = [], []
+        for url, product_id, source_id in items:
+            try:
+                scrapers.append(get_scraper(url))
+                scrape_items.append((url, product_id, source_id))
+            except ValueError as e:
+                print(f"[Worker] Skipping {url}: {e}")
+
+        results = get_async_engine().scrape_many(scrapers, share_context=True)
+
+        saved = 0
+        failed = 0
+        buffered = []
+        with get_db_session() as db:
+            for scraper, (url, product_id, source_id), data in zip(scrapers, scrape_items, results):
+                if not data or not data.get("price"):
+                    print(f"[Worker] Scrape failed for {url}: No data or price.")
+                    schedule_retry(db, source_id)
+                    failed += 1
+                    continue
+                if INGEST_MODE == "buffered":
+                    buffered.append(price_point(scraper, data, product_id, source_id))
+                    continue
+                try:
+                    if save_scraped_product(db, scraper, data, product_id, source_id):
+                        saved += 1
+                except Exception as e:
+                    db.rollback()
+                    failed += 1
+                    print(f"[Worker] ❌ Error saving {url}: {e}\n{traceback.format_exc()}")
+
+        if buffered:
+            # One RPUSH for the batch; the ingest flusher saves it
+            enqueue_price_points(buffered)
+            handed_off.update(point["source_id"] for point in buffered)
+            saved = len(buffered)
+
+        print(f"[Worker] Batch finished. Saved {saved}/{len(items)}, failed {failed}.")
+        return saved
+    finally:
+        # Even when the scrape or the saves raise, so the sources can be enqueued again
+        release_inflight([source_id for _, _, source_id in items if source_id not in handed_off])
 
 
 # --- 5. Scam Check Task (FIXED) ---
@@ -305,73 +509,17 @@ def compute_scam_score(domain: str):
 # --- 6. Price Alert Check Task (remains the same) ---
 def check_price_alerts():
     """
-    Worker task to check all active price alerts against the latest prices.
+    Periodic safety net for price alerts. Ingest already evaluates the alerts of
+    each product whose price changed; this sweep catches anything it missed
+    (e.g. thresholds edited since) with one set-based statement pair.
     """
-    print("[Worker] Checking all active price alerts...")
-    triggered_alerts = 0
+    print("[Worker] Sweeping price alerts...")
     with get_db_session() as db:
-        items_to_check = db.query(Watchlist).filter(
-            Watchlist.alert_rules != None
-        ).all()
-        print(f"[Worker] Found {len(items_to_check)} watchlist items with alert rules.")
-        for item in items_to_check:
-            try:
-                alert_price = item.alert_rules.get("threshold")
-                user_email = item.user_id 
-                if not alert_price or not user_email:
-                    continue
-                product_sources = db.query(ProductSource).filter(ProductSource.product_id == item.product_id).all()
-                if not product_sources: continue
-                lowest_current_price = None
-                for ps in product_sources:
-                    latest_price_log = db.query(PriceLog).filter(
-                        PriceLog.product_source_id == ps.id
-                    ).order_by(desc(PriceLog.scraped_at)).first()
-                    if latest_price_log:
-                        current_price = latest_price_log.price_cents / 100
-                        if lowest_current_price is None or current_price < lowest_current_price:
-                            lowest_current_price = current_price
-                if lowest_current_price and lowest_current_price <= alert_price:
-                    print(f"[Worker]  TRIGGER! Product {item.product_id} is {lowest_current_price}, below alert of {alert_price} for user {item.user_id}")
-                    alert_message = json.dumps({
-                        "type": "PRICE_ALERT",
-                        "product_id": item.product_id,
-                        "user_id": user_email,
-                        "current_price": lowest_current_price,
-                        "alert_price": alert_price
-                    })
-                    redis_conn.publish("price_updates", alert_message)
-                    triggered_alerts += 1
-                    user = db.query(User).filter(User.email == user_email).first()
-                    if user and user.push_subscription:
-                        print(f"[Worker]  Found push subscription for {user_email}. Sending push...")
-                        try:
-                            vapid_private_key = os.getenv("VAPID_PRIVATE_KEY")
-                            vapid_claims = {"sub": f"mailto:{os.getenv('VAPID_CLAIMS_EMAIL')}"}
-                            payload = json.dumps({
-                                "title": "Price Alert!",
-                                "body": f"Price for Product ID {item.product_id} dropped to ₹{lowest_current_price}!",
-                                "url": f"/product/{item.product_id}"
-                            })
-                            webpush(
-                                subscription_info=user.push_subscription,
-                                data=payload,
-                                vapid_private_key=vapid_private_key,
-                                vapid_claims=vapid_claims
-                            )
-                            print(f"[Worker]  ✅ Push notification sent.")
-                        except WebPushException as ex:
-                            print(f"[Worker]  ❌ Error sending push: {ex}")
-                            if ex.response and ex.response.status_code in [404, 410]:
-                                print(f"[Worker]  Subscription for {user_email} is invalid. Removing.")
-                                user.push_subscription = None
-                                db.commit()
-                        except Exception as e:
-                            print(f"[Worker]  ❌ Unexpected error during webpush: {e}")
-            except Exception as e:
-                print(f"[Worker] Error checking alert for item {item.id}: {e}")
-    print(f"[Worker] Finished alert check. Triggered {triggered_alerts} alerts.")
-    return triggered_alerts
+        alerts = claim_all_alerts(db)
+        db.commit()
+        notify(db, alerts)
+    print(f"[Worker] Finished alert sweep. Triggered {len(alerts)} alerts.")
+    return len(alerts)
 
 
 # --- 7. Sales Discovery Task (UPDATED) ---
@@ -0,0 +1,72 @@
+# worker/playwright_scraper/scheduling.py
+import os
+from datetime import datetime, timezone, timedelta
+from sqlalchemy import case, exists, func
+from sqlalchemy.orm import Session
+
+from .models import ProductSource, Watchlist
+
+# --- Adaptive Schedule Configuration (seconds) ---
+INTERVAL_DEFAULT = int(os.getenv("SCRAPE_INTERVAL_DEFAULT", "1800"))
+INTERVAL_MIN = int(os.getenv("SCRAPE_INTERVAL_MIN", "900"))
+INTERVAL_MAX = int(os.getenv("SCRAPE_INTERVAL_MAX", "86400"))
+# Sources someone has a price alert on are never allowed to drift this far
+WATCHED_INTERVAL_MIN = int(os.getenv("SCRAPE_WATCHED_INTERVAL_MIN", "300"))
+WATCHED_INTERVAL_MAX = int(os.getenv("SCRAPE_WATCHED_INTERVAL_MAX", "3600"))
+# Multiplicative step: back off by this factor when unchanged, speed up by it on a change
+BACKOFF_FACTOR = float(os.getenv("SCRAPE_INTERVAL_BACKOFF", "1.5"))
+
+
+def interval_bounds(watched: bool):
+    if watched:
+        return WATCHED_INTERVAL_MIN, WATCHED_INTERVAL_MAX
+    return INTERVAL_MIN, INTERVAL_MAX
+
+
+def next_interval(current: int, price_changed: bool, watched: bool) -> int:
+    """Lengthens the interval while the price holds still and shortens it after a change."""
+    low, high = interval_bounds(watched)
+    current = current or INTERVAL_DEFAULT
+    if price_changed:
+        proposed = current / BACKOFF_FACTOR
+    else:
+        proposed = current * BACKOFF_FACTOR
+    return int(min(high, max(low, proposed)))
+
+
+def has_active_alert(db: Session, product_id: int) -> bool:
+    return db.query(Watchlist.id).filter(
+        Watchlist.product_id == product_id,
+        Watchlist.alert_threshold_cents != None
+    ).first() is not None
+
+
+def apply_schedule(db: Session, product_source: ProductSource, price_changed: bool):
+    """Sets the next due time after a successful scrape. The caller commits."""
+    watched = has_active_alert(db, product_source.product_id)
+    interval = next_interval(product_source.scrape_interval_seconds, price_changed, watched)
+
+    product_source.unchanged_scrapes = 0 if price_changed else (product_source.unchanged_scrapes or 0) + 1
+    product_source.scrape_interval_seconds = interval
+    product_source.next_scrape_at = datetime.now(timezone.utc) + timedelta(seconds=interval)
+
+
+def schedule_retry(db: Session, source_id: int):
+    """
+    After a failed scrape, try again after the minimum interval instead of on every cycle.
+    Sources with an alert on them use the watched minimum, as apply_schedule does.
+    """
+    watched = exists().where(
+        Watchlist.product_id == ProductSource.product_id,
+        Watchlist.alert_threshold_cents != None
+    )
+    retry_after = case((watched, WATCHED_INTERVAL_MIN), else_=INTERVAL_MIN)
+    try:
+        db.query(ProductSource).filter(ProductSource.id == source_id).update(
+            {ProductSource.next_scrape_at: func.now() + func.make_interval(0, 0, 0, 0, 0, 0, retry_after)},
+            synchronize_session=False
+        )
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"[Scheduler] Could not reschedule source {source_id}: {e}")
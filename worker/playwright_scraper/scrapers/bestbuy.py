@@ -6,6 +6,8 @@ import re
 import json
 
 class BestBuyScraper(BaseScraper):
+    READY_SELECTOR = '.priceView-hero-price span[aria-hidden="true"]'
+
     def extract_data(self, page: Page) -> Dict:
         """Extract data using Playwright"""
         
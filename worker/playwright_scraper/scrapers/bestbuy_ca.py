@@ -6,6 +6,9 @@ import re
 import json
 
 class BestBuyCAScraper(BaseScraper):
+    READY_SELECTOR = 'span[data-testid="price-current-value"]'
+    ACCEPT_LANGUAGE = "en-CA"
+
     def extract_data(self, page: Page) -> Dict:
         """Extract data using Playwright for BestBuy.ca"""
         
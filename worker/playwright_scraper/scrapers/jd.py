@@ -6,6 +6,10 @@ import re
 import json
 
 class JDScraper(BaseScraper):
+    READY_SELECTOR = 'div.sku-name, .price'
+    READY_TIMEOUT_MS = 15000
+    ACCEPT_LANGUAGE = "zh-CN,zh;q=0.9,en;q=0.8"
+
     def extract_data(self, page: Page) -> Dict:
         """Extract data using Playwright for JD.com"""
         
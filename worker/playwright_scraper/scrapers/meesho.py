@@ -6,6 +6,9 @@ import re
 import time
 
 class MeeshoScraper(BaseScraper):
+    READY_SELECTOR = 'h4[class*="Price__PriceValue"], h4.sc-eDV5Ve, .NewProductCard__PriceRow-sc'
+    READY_TIMEOUT_MS = 20000
+
     def extract_data(self, page: Page) -> Dict:
         """Extract data using Playwright"""
         
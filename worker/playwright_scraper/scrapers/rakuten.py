@@ -6,6 +6,9 @@ import re
 import json
 
 class RakutenScraper(BaseScraper):
+    READY_SELECTOR = '.price'
+    ACCEPT_LANGUAGE = "ja-JP,ja;q=0.9,en;q=0.8"
+
     def extract_data(self, page: Page) -> Dict:
         """Extract data using Playwright for Rakuten.co.jp"""
         
@@ -0,0 +1,102 @@
+# worker/scripts/bench_ingest.py
+"""
+Price ingestion throughput, direct vs write-behind.
+
+Builds --rows synthetic price points spread over --sources existing product
+sources and saves them twice. First point by point through the direct path
+(save_price_point, one transaction each), then through the flusher's bulk
+path (flush_points: COPY plus set-wise statements, --batch points per
+transaction). Reports rows per second for both. Events and alert
+notifications are off in both runs.
+
+It writes real rows; run it against a scratch copy of the database:
+
+    cd worker && python scripts/bench_ingest.py --rows 20000 --sources 500 --batch 5000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from playwright_scraper.models import SessionLocal, ProductSource
+from playwright_scraper.ingest import flush_points
+from playwright_scraper.runner import save_price_point
+
+
+def _points(sources, rows: int, start: datetime):
+    sellers = [f"Bench Seller {i}" for i in range(50)]
+    points = []
+    for i in range(rows):
+        product_id, source_id = sources[i % len(sources)]
+        points.append({
+            "product_id": product_id,
+            "source_id": source_id,
+            "marketplace": "Bench",
+            "price_cents": random.randint(50_000, 60_000),
+            "currency": "INR",
+            "availability": "In Stock",
+            "in_stock": True,
+            "avg_review_sentiment": None,
+            "seller_name": random.choice(sellers),
+            "seller_rating": "4.2",
+            "seller_review_count": "120",
+            "title": None,
+            "image_url": None,
+            "description": None,
+            "brand": None,
+            # Distinct per source, so nothing collides on (product_source_id, scraped_at)
+            "scraped_at": (start + timedelta(microseconds=i)).isoformat(),
+        })
+    return points
+
+
+def _report(name: str, rows: int, elapsed: float, transactions: int):
+    print(f"{name:<12} {rows:>8} rows in {elapsed:8.2f}s  {rows / elapsed:10.0f} rows/s  "
+          f"({transactions} transactions)")
+
+
+def main(args):
+    db = SessionLocal()
+    try:
+        sources = db.query(ProductSource.product_id, ProductSource.id).order_by(ProductSource.id).limit(args.sources).all()
+    finally:
+        db.close()
+    if not sources:
+        print("No product sources in this database; track a few products first.")
+        return
+
+    start = datetime.now(timezone.utc)
+    direct_rows = min(args.rows, args.direct_rows) if args.direct_rows else args.rows
+    points = _points(sources, direct_rows, start)
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        for point in points:
+            save_price_point(db, point, publish=False)
+        _report("direct", len(points), time.perf_counter() - started, len(points))
+    finally:
+        db.close()
+
+    points = _points(sources, args.rows, start + timedelta(seconds=1))
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        for i in range(0, len(points), args.batch):
+            flush_points(db, points[i:i + args.batch], publish=False)
+        batches = (len(points) + args.batch - 1) // args.batch
+        _report("write-behind", len(points), time.perf_counter() - started, batches)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--sources", type=int, default=500, help="Existing product sources to spread the rows over")
+    parser.add_argument("--batch", type=int, default=5000, help="Points per flush transaction")
+    parser.add_argument("--direct-rows", type=int, default=2000, help="Cap for the (slow) direct run; 0 = --rows")
+    main(parser.parse_args())